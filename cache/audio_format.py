@@ -0,0 +1,152 @@
+"""
+Compact storage format for cached audio prompts.
+
+A prompt is stored as ONE Redis string: a 20-byte header followed by raw PCM.
+
+    offset  size  field
+    0       4     magic b"PCM1"
+    4       1     format version (1)
+    5       1     sample width, bytes (2 = s16le)
+    6       1     channels
+    7       1     reserved (0)
+    8       4     sample rate, Hz
+    12      4     frame size, bytes (320 = 20 ms of 8 kHz s16 mono)
+    16      4     frame count
+
+The PCM payload is always `frame_size * frame_count` bytes: the last frame is
+padded with silence on encode, so every frame is a full transport frame.
+Decoding does not copy: frames are `memoryview` slices over the fetched blob.
+
+The legacy layout (a Redis list of per-20 ms WAV files produced by pydub) is
+still readable through `pcm_from_wav_chunks`, which the migration script uses.
+"""
+from __future__ import annotations
+
+import io
+import struct
+import wave
+from dataclasses import dataclass
+from typing import Iterator, List, Sequence, Tuple, Union
+
+MAGIC = b"PCM1"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBBIII")
+HEADER_SIZE = HEADER.size
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class AudioFormatError(ValueError):
+    """Blob is not a valid PCM1 audio record."""
+
+
+@dataclass(frozen=True)
+class PcmAudio:
+    sample_rate: int
+    sample_width: int
+    channels: int
+    frame_bytes: int
+    frame_count: int
+    data: memoryview  # raw PCM, frame_bytes * frame_count bytes
+
+    @property
+    def bytes_per_ms(self) -> float:
+        return self.sample_rate * self.sample_width * self.channels / 1000
+
+    @property
+    def frame_ms(self) -> float:
+        return self.frame_bytes / self.bytes_per_ms
+
+    @property
+    def duration_ms(self) -> float:
+        return self.frame_count * self.frame_ms
+
+    def frame(self, index: int) -> memoryview:
+        start = index * self.frame_bytes
+        return self.data[start:start + self.frame_bytes]
+
+    def iter_frames(self, start: int = 0, stop: int | None = None) -> Iterator[memoryview]:
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+        step = self.frame_bytes
+        data = self.data
+        for offset in range(start * step, stop * step, step):
+            yield data[offset:offset + step]
+
+    def frames(self) -> List[memoryview]:
+        return list(self.iter_frames())
+
+
+def encode_pcm(
+    pcm: BytesLike,
+    sample_rate: int = 8000,
+    sample_width: int = 2,
+    channels: int = 1,
+    frame_ms: int = 20,
+) -> bytes:
+    """Pack raw PCM into a PCM1 blob, padding the last frame with silence."""
+    frame_bytes = sample_rate * frame_ms // 1000 * sample_width * channels
+    if frame_bytes <= 0:
+        raise AudioFormatError(f"invalid frame size for {sample_rate} Hz / {frame_ms} ms")
+    pcm = memoryview(pcm).cast("B")
+    frame_count = -(-len(pcm) // frame_bytes)
+    padding = frame_count * frame_bytes - len(pcm)
+    header = HEADER.pack(MAGIC, VERSION, sample_width, channels, 0, sample_rate, frame_bytes, frame_count)
+    return b"".join((header, pcm, b"\x00" * padding))
+
+
+def is_pcm_blob(blob: BytesLike) -> bool:
+    return len(blob) >= HEADER_SIZE and bytes(blob[:4]) == MAGIC
+
+
+def read_header(blob: BytesLike) -> Tuple[int, int, int, int, int]:
+    """
+    Parse only the header; `blob` may be just its prefix (a ranged read).
+    Returns (sample_rate, sample_width, channels, frame_bytes, frame_count).
+    """
+    if len(blob) < HEADER_SIZE:
+        raise AudioFormatError(f"blob too short: {len(blob)} bytes")
+    magic, version, sample_width, channels, _, sample_rate, frame_bytes, frame_count = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise AudioFormatError(f"bad magic {magic!r}")
+    if version != VERSION:
+        raise AudioFormatError(f"unsupported version {version}")
+    if frame_bytes <= 0:
+        raise AudioFormatError(f"invalid frame size {frame_bytes}")
+    return sample_rate, sample_width, channels, frame_bytes, frame_count
+
+
+def decode_pcm(blob: BytesLike) -> PcmAudio:
+    """Parse a PCM1 blob without copying the payload."""
+    sample_rate, sample_width, channels, frame_bytes, frame_count = read_header(blob)
+    data = memoryview(blob)[HEADER_SIZE:]
+    if len(data) != frame_bytes * frame_count:
+        raise AudioFormatError(f"payload is {len(data)} bytes, header says {frame_count} x {frame_bytes}")
+    return PcmAudio(sample_rate, sample_width, channels, frame_bytes, frame_count, data)
+
+
+def pcm_from_wav_chunks(chunks: Sequence[BytesLike]) -> Tuple[bytes, int, int, int]:
+    """
+    Concatenate the PCM of legacy list-of-WAV chunks.
+    Returns (pcm, sample_rate, sample_width, channels); all chunks must share the format.
+    """
+    parts = []
+    params = None
+    for chunk in chunks:
+        with wave.open(io.BytesIO(bytes(chunk)), "rb") as w:
+            chunk_params = (w.getframerate(), w.getsampwidth(), w.getnchannels())
+            if params is None:
+                params = chunk_params
+            elif chunk_params != params:
+                raise AudioFormatError(f"mixed WAV formats in chunks: {params} vs {chunk_params}")
+            parts.append(w.readframes(w.getnframes()))
+    if params is None:
+        raise AudioFormatError("no chunks")
+    return (b"".join(parts), *params)
+
+
+def pcm_from_wav_file(wav_filepath: str) -> Tuple[bytes, int, int, int]:
+    """Read a WAV file with pydub (handles any WAV flavour). Returns (pcm, sample_rate, sample_width, channels)."""
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_wav(wav_filepath)
+    return audio.raw_data, audio.frame_rate, audio.sample_width, audio.channels
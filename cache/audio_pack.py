@@ -0,0 +1,238 @@
+"""
+Read-only local pack of static audio prompts, memory-mapped by every worker.
+
+File layout:
+
+    offset  size  field
+    0       4     magic b"APK1"
+    4       2     version (1)
+    6       2     reserved
+    8       8     index offset
+    16      8     index length
+    24      ...   PCM1 blobs (cache/audio_format.py), each aligned to 16 bytes
+    ...           index: UTF-8 JSON {"keys": {key: [offset, length, sample_rate, frame_bytes, frame_count]}, ...}
+
+Workers open the file with mmap(ACCESS_READ), so all processes on a host share
+one copy through the page cache and a lookup is a dict access plus a memoryview
+slice: no network I/O, no copying. Keys not in the pack go to the fallback cache
+(normally the L1 in front of Redis).
+
+The builder writes to a temporary file and renames it into place, so a rebuild
+never corrupts a pack that running workers have mapped; they pick up the new one
+on restart.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from cache.audio_format import AudioFormatError, BytesLike, PcmAudio, decode_pcm
+from domain.interfaces.cache import AbstractCache
+
+logger = logging.getLogger(__name__)
+
+PACK_MAGIC = b"APK1"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<4sHHQQ")
+ALIGNMENT = 16
+
+
+class AudioPackError(ValueError):
+    """File is not a valid APK1 audio pack."""
+
+
+def build_audio_pack(path: str, blobs: Iterable[Tuple[str, BytesLike]], metadata: Optional[dict] = None) -> Dict[str, int]:
+    """
+    Write (key, PCM1 blob) pairs into a pack at `path` atomically.
+    Returns counters: keys, bytes.
+    """
+    index: Dict[str, List[int]] = {}
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, 0, 0))
+            offset = PACK_HEADER.size
+            for key, blob in blobs:
+                audio = decode_pcm(blob)  # validate before it gets into the pack
+                padding = -offset % ALIGNMENT
+                f.write(b"\x00" * padding)
+                offset += padding
+                f.write(blob)
+                index[key] = [offset, len(blob), audio.sample_rate, audio.frame_bytes, audio.frame_count]
+                offset += len(blob)
+            index_bytes = json.dumps(
+                {"keys": index, "built_at": time.time(), **(metadata or {})}, ensure_ascii=False
+            ).encode("utf-8")
+            f.write(index_bytes)
+            f.seek(0)
+            f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, offset, len(index_bytes)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return {"keys": len(index), "bytes": offset}
+
+
+class AudioPackCache(AbstractCache):
+    """
+    AbstractCache over a memory-mapped audio pack. Read-only for the keys it
+    contains; everything else (misses, writes, text) goes to `fallback`.
+    """
+
+    def __init__(self, path: str, fallback: Optional[AbstractCache] = None):
+        self.path = path
+        self.fallback = fallback
+        self.metadata: dict = {}
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._audio: Dict[str, PcmAudio] = {}
+        self.hits = 0
+        self.fallback_lookups = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def keys(self) -> List[str]:
+        return list(self._index)
+
+    async def connect(self) -> None:
+        if self.fallback is not None:
+            await self.fallback.connect()
+        if self._mmap is None:
+            self._open()
+
+    def _open(self) -> None:
+        f = open(self.path, "rb")
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:  # empty file
+            f.close()
+            raise AudioPackError(f"{self.path}: {e}") from e
+        try:
+            if len(mm) < PACK_HEADER.size:
+                raise AudioPackError(f"{self.path}: file too short")
+            magic, version, _, index_offset, index_length = PACK_HEADER.unpack_from(mm)
+            if magic != PACK_MAGIC or version != PACK_VERSION:
+                raise AudioPackError(f"{self.path}: bad magic/version {magic!r}/{version}")
+            if index_offset + index_length > len(mm):
+                raise AudioPackError(f"{self.path}: index is out of bounds (truncated file?)")
+            meta = json.loads(mm[index_offset:index_offset + index_length].decode("utf-8"))
+        except BaseException:
+            mm.close()
+            f.close()
+            raise
+        self._index = {key: (entry[0], entry[1]) for key, entry in meta.pop("keys").items()}
+        self.metadata = meta
+        self._file, self._mmap = f, mm
+        logger.info(f"Audio pack '{self.path}' mapped: {len(self._index)} keys, {len(mm)} bytes.")
+
+    async def close(self) -> None:
+        self._audio.clear()
+        self._index = {}
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Frames of a call that is still playing reference the mapping; GC unmaps it later
+                logger.warning(f"Audio pack '{self.path}' still has live frame views; leaving unmap to GC.")
+            self._file.close()
+            self._mmap = self._file = None
+        if self.fallback is not None:
+            await self.fallback.close()
+
+    def _lookup(self, key: str) -> PcmAudio | None:
+        audio = self._audio.get(key)
+        if audio is None:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            offset, length = entry
+            try:
+                audio = decode_pcm(memoryview(self._mmap)[offset:offset + length])
+            except AudioFormatError as e:
+                logger.error(f"Corrupt entry '{key}' in audio pack '{self.path}': {e}")
+                return None
+            self._audio[key] = audio
+        self.hits += 1
+        return audio
+
+    async def get_audio(self, key: str) -> PcmAudio | None:
+        audio = self._lookup(key)
+        if audio is not None or self.fallback is None:
+            return audio
+        self.fallback_lookups += 1
+        return await self.fallback.get_audio(key)
+
+    async def get_audio_many(self, keys: Sequence[str]) -> Dict[str, PcmAudio | None]:
+        result: Dict[str, PcmAudio | None] = {key: self._lookup(key) for key in dict.fromkeys(keys)}
+        rest = [key for key, audio in result.items() if audio is None]
+        if rest and self.fallback is not None:
+            self.fallback_lookups += len(rest)
+            result.update(await self.fallback.get_audio_many(rest))
+        return result
+
+    async def stream_audio(self, key: str) -> AsyncIterator[memoryview]:
+        audio = self._lookup(key)
+        if audio is not None:
+            for frame in audio.iter_frames():
+                yield frame
+            return
+        if self.fallback is not None:
+            self.fallback_lookups += 1
+            async for frame in self.fallback.stream_audio(key):
+                yield frame
+
+    async def get_audio_chunks(self, key: str) -> List[memoryview] | None:
+        audio = await self.get_audio(key)
+        return audio.frames() if audio is not None else None
+
+    def _writable(self, key: str) -> bool:
+        if key in self._index:
+            logger.warning(f"Key '{key}' is served from audio pack '{self.path}'; the write is not visible until the pack is rebuilt.")
+        if self.fallback is None:
+            logger.error(f"Cannot write key '{key}': audio pack is read-only and has no fallback.")
+            return False
+        return True
+
+    async def set_audio_pcm(
+        self,
+        key: str,
+        pcm: bytes,
+        sample_rate: int = 8000,
+        sample_width: int = 2,
+        channels: int = 1,
+        frame_ms: int = 20,
+        ttl_seconds: Optional[int] = None,
+    ) -> bool:
+        if not self._writable(key):
+            return False
+        return await self.fallback.set_audio_pcm(key, pcm, sample_rate, sample_width, channels, frame_ms, ttl_seconds)
+
+    async def set_audio_chunks(self, key: str, audio_chunks: List[bytes]) -> bool:
+        if not self._writable(key):
+            return False
+        return await self.fallback.set_audio_chunks(key, audio_chunks)
+
+    async def load_and_set_audio(self, key: str, wav_filepath: str, chunk_size_ms: int = 20) -> bool:
+        if not self._writable(key):
+            return False
+        return await self.fallback.load_and_set_audio(key, wav_filepath, chunk_size_ms)
+
+    async def set_text(self, key: str, text: str, ttl_seconds: int) -> bool:
+        if self.fallback is None:
+            return False
+        return await self.fallback.set_text(key, text, ttl_seconds)
+
+    async def get_text(self, key: str) -> str | None:
+        if self.fallback is None:
+            return None
+        return await self.fallback.get_text(key)
@@ -1,29 +1,57 @@
 from __future__ import annotations
 
 import asyncio
-import io
 import logging
-from typing import ClassVar, List, Optional
+import wave
+from collections import deque
+from typing import AsyncIterator, Callable, ClassVar, Dict, List, Optional, Sequence
 
 import redis.asyncio as redis
-from pydub import AudioSegment
 
+from cache.audio_format import (
+    HEADER_SIZE,
+    AudioFormatError,
+    PcmAudio,
+    decode_pcm,
+    encode_pcm,
+    pcm_from_wav_chunks,
+    pcm_from_wav_file,
+)
+from cache.codecs import PCM, AudioCodec, codec_for
 from domain.interfaces.cache import AbstractCache
 from infra.redis_config import RedisConfig
 
 logger = logging.getLogger(__name__)
 
+# Every audio write publishes the key here so in-process L1 caches (cache/l1.py) drop their copy
+AUDIO_INVALIDATION_CHANNEL = "cache:audio:invalidate"
+INVALIDATE_ALL = "*"
+# 20 ms of 8 kHz s16 mono: sizes the first ranged read before the header is known
+DEFAULT_FRAME_BYTES = 320
+
+
+def _same_codec(a: AudioCodec, b: AudioCodec) -> bool:
+    return type(a) is type(b) and vars(a) == vars(b)
+
 
 class RedisCacheManager(AbstractCache):
     _instance: ClassVar[Optional[RedisCacheManager]] = None
     _lock: ClassVar[asyncio.Lock] = asyncio.Lock()
 
-    def __init__(self, config: RedisConfig | None = None):
+    def __init__(self, config: RedisConfig | None = None, codec: AudioCodec | None = None):
+        """`codec` is used for writes (PCM1 by default); reads detect the codec of each blob."""
         if not hasattr(self, "_initialized"):
             self.config: RedisConfig = config or RedisConfig()
+            self.codec: AudioCodec = codec or PCM
             self.redis_client: redis.Redis | None = None
             self._initialized: bool = True
-            logger.info("RedisCacheManager initialized.")
+            logger.info(f"RedisCacheManager initialized (audio codec: {self.codec.name}).")
+        elif codec is not None and not _same_codec(codec, self.codec):
+            # Process-wide singleton: a second constructor call cannot switch the write codec
+            raise ValueError(
+                f"RedisCacheManager is already initialized with audio codec '{self.codec.name}' "
+                f"({vars(self.codec)}), cannot switch to '{codec.name}' ({vars(codec)})"
+            )
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -58,64 +86,262 @@ class RedisCacheManager(AbstractCache):
             finally:
                 self.redis_client = None
 
-    @staticmethod
-    def _read_and_chunk_wav(wav_filepath: str, chunk_size_ms: int) -> list[bytes]:
+    def _write_codec(self, sample_rate: int, sample_width: int, frame_ms: int) -> AudioCodec:
+        # Formats the configured codec cannot hold (e.g. 22.05 kHz for Opus) are stored as PCM1
+        return self.codec if self.codec.supports(sample_rate, sample_width, frame_ms) else PCM
+
+    def _read_wav_blob(self, wav_filepath: str, chunk_size_ms: int) -> bytes | None:
         try:
-            audio = AudioSegment.from_wav(wav_filepath)
-            chunks = []
-            for i in range(0, len(audio), chunk_size_ms):
-                chunk_segment = audio[i:i + chunk_size_ms]
-                buffer = io.BytesIO()
-                chunk_segment.export(buffer, format="wav")
-                chunks.append(buffer.getvalue())
-            return chunks
+            pcm, sample_rate, sample_width, channels = pcm_from_wav_file(wav_filepath)
+            codec = self._write_codec(sample_rate, sample_width, chunk_size_ms)
+            return codec.encode(pcm, sample_rate, sample_width, channels, frame_ms=chunk_size_ms)
         except FileNotFoundError:
             logger.error(f"WAV file not found at path: {wav_filepath}")
-            return []
+            return None
         except Exception as e:
-            logger.error(f"Failed to read and chunk WAV file {wav_filepath}: {e}", exc_info=True)
-            return []
+            logger.error(f"Failed to read WAV file {wav_filepath}: {e}", exc_info=True)
+            return None
 
     async def load_and_set_audio(self, key: str, wav_filepath: str, chunk_size_ms: int = 20) -> bool:
         logger.info(f"Loading audio from '{wav_filepath}' for key '{key}'.")
         try:
-            audio_chunks = await asyncio.to_thread(
-                self._read_and_chunk_wav, wav_filepath, chunk_size_ms
-            )
-            if not audio_chunks:
+            blob = await asyncio.to_thread(self._read_wav_blob, wav_filepath, chunk_size_ms)
+            if blob is None:
                 return False
-            return await self.set_audio_chunks(key, audio_chunks)
+            return await self._set_audio_blob(key, blob)
         except Exception as e:
             logger.error(f"Error in load_and_set_audio for key '{key}': {e}", exc_info=True)
             return False
 
+    async def set_audio_pcm(
+        self,
+        key: str,
+        pcm: bytes,
+        sample_rate: int = 8000,
+        sample_width: int = 2,
+        channels: int = 1,
+        frame_ms: int = 20,
+        ttl_seconds: int | None = None,
+    ) -> bool:
+        """Store raw PCM as a single blob in the write codec (see cache.codecs). No TTL by default."""
+        codec = self._write_codec(sample_rate, sample_width, frame_ms)
+        try:
+            if codec.cpu_bound:
+                blob = await asyncio.to_thread(codec.encode, pcm, sample_rate, sample_width, channels, frame_ms)
+            else:
+                blob = codec.encode(pcm, sample_rate, sample_width, channels, frame_ms)
+        except AudioFormatError as e:
+            logger.error(f"Cannot encode audio for key '{key}': {e}")
+            return False
+        return await self._set_audio_blob(key, blob, ttl_seconds)
+
     async def set_audio_chunks(self, key: str, audio_chunks: list[bytes]) -> bool:
+        """
+        Store a sequence of raw PCM chunks (8 kHz s16 mono) as one blob.
+        Legacy callers that still pass per-chunk WAV files are converted on the fly.
+        """
+        if not audio_chunks:
+            return False
+        if bytes(audio_chunks[0][:4]) == b"RIFF":
+            try:
+                pcm, sample_rate, sample_width, channels = pcm_from_wav_chunks(audio_chunks)
+            except (AudioFormatError, wave.Error, EOFError) as e:
+                logger.error(f"Cannot convert WAV chunks for key '{key}': {e}")
+                return False
+            return await self.set_audio_pcm(key, pcm, sample_rate, sample_width, channels)
+        return await self.set_audio_pcm(key, b"".join(audio_chunks))
+
+    async def _set_audio_blob(self, key: str, blob: bytes, ttl_seconds: int | None = None) -> bool:
         if not self.redis_client:
-            logger.error("Cannot set audio chunks: Redis client is not connected.")
+            logger.error("Cannot set audio: Redis client is not connected.")
             return False
         try:
+            # SET also replaces a legacy list under the same key atomically
             async with self.redis_client.pipeline(transaction=True) as pipe:
-                await pipe.delete(key).rpush(key, *audio_chunks).execute()
-            logger.info(f"Successfully set {len(audio_chunks)} audio chunks for key '{key}'.")
+                await pipe.set(key, blob, ex=ttl_seconds).publish(AUDIO_INVALIDATION_CHANNEL, key).execute()
+            logger.info(f"Successfully set audio for key '{key}' ({len(blob)} bytes).")
             return True
         except redis.RedisError as e:
-            logger.error(f"Redis error setting audio chunks for key '{key}': {e}", exc_info=True)
+            logger.error(f"Redis error setting audio for key '{key}': {e}", exc_info=True)
             return False
 
-    async def get_audio_chunks(self, key: str) -> list[bytes] | None:
+    async def get_audio(self, key: str) -> PcmAudio | None:
+        """One GET; frames are zero-copy memoryview slices of the fetched blob."""
         if not self.redis_client:
-            logger.error("Cannot get audio chunks: Redis client is not connected.")
+            logger.error("Cannot get audio: Redis client is not connected.")
             return None
         try:
-            chunks = await self.redis_client.lrange(key, 0, -1)
-            if not chunks:
-                logger.debug(f"Cache miss for audio chunks with key '{key}'.")
+            blob = await self.redis_client.get(key)
+        except redis.ResponseError as e:
+            if "WRONGTYPE" not in str(e):
+                logger.error(f"Redis error getting audio for key '{key}': {e}", exc_info=True)
                 return None
-            logger.info(f"Cache hit for audio chunks with key '{key}'. Found {len(chunks)} chunks.")
-            return chunks
+            return await self._get_legacy_audio(key)
+        except redis.RedisError as e:
+            logger.error(f"Redis error getting audio for key '{key}': {e}", exc_info=True)
+            return None
+        if blob is None:
+            logger.debug(f"Cache miss for audio with key '{key}'.")
+            return None
+        audio = await self._decode(key, blob)
+        if audio is not None:
+            logger.debug(f"Cache hit for audio with key '{key}': {audio.frame_count} frames.")
+        return audio
+
+    async def _decode(self, key: str, blob: bytes) -> PcmAudio | None:
+        try:
+            codec = codec_for(blob)
+            if codec.cpu_bound:
+                return await asyncio.to_thread(codec.decode, blob)
+            return codec.decode(blob)
+        except AudioFormatError as e:
+            logger.error(f"Corrupt audio blob for key '{key}': {e}")
+            return None
+
+    async def get_audio_many(self, keys: Sequence[str]) -> Dict[str, PcmAudio | None]:
+        """All keys in one pipelined round trip; missing or broken keys map to None."""
+        unique = list(dict.fromkeys(keys))
+        result: Dict[str, PcmAudio | None] = dict.fromkeys(unique)
+        if not unique:
+            return result
+        if not self.redis_client:
+            logger.error("Cannot get audio: Redis client is not connected.")
+            return result
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key in unique:
+                    pipe.get(key)
+                values = await pipe.execute(raise_on_error=False)
+        except redis.RedisError as e:
+            logger.error(f"Redis error getting {len(unique)} audio keys: {e}", exc_info=True)
+            return result
+        for key, value in zip(unique, values):
+            if isinstance(value, redis.ResponseError) and "WRONGTYPE" in str(value):
+                result[key] = await self._get_legacy_audio(key)
+            elif isinstance(value, Exception):
+                logger.error(f"Redis error getting audio for key '{key}': {value}")
+            elif value is not None:
+                result[key] = await self._decode(key, value)
+        logger.debug(f"Batch audio fetch: {sum(v is not None for v in result.values())}/{len(unique)} hits.")
+        return result
+
+    async def _get_legacy_audio(self, key: str) -> PcmAudio | None:
+        # Key not migrated yet (scripts/migrate_audio_cache.py): a list of WAV chunks
+        try:
+            chunks = await self.redis_client.lrange(key, 0, -1)
+        except redis.RedisError as e:
+            logger.error(f"Redis error getting legacy audio for key '{key}': {e}", exc_info=True)
+            return None
+        if not chunks:
+            return None
+        try:
+            pcm, sample_rate, sample_width, channels = pcm_from_wav_chunks(chunks)
+            audio = decode_pcm(encode_pcm(pcm, sample_rate, sample_width, channels))
+        except (AudioFormatError, wave.Error, EOFError) as e:
+            logger.error(f"Cannot parse legacy audio chunks for key '{key}': {e}")
+            return None
+        logger.warning(f"Key '{key}' uses the legacy list-of-WAV layout; run scripts/migrate_audio_cache.py.")
+        return audio
+
+    async def stream_audio(
+        self,
+        key: str,
+        first_window_frames: int = 10,
+        window_frames: int = 50,
+        prefetch_windows: int = 2,
+        on_complete: Callable[[PcmAudio], None] | None = None,
+    ) -> AsyncIterator[memoryview]:
+        """
+        Yield frames of `key` while the rest of the blob is still being fetched.
+
+        The first GETRANGE covers the header and `first_window_frames`, so time to
+        first frame does not depend on prompt length; the following windows are
+        requested `prefetch_windows` ahead while earlier frames play. Compressed
+        blobs are decoded frame by frame as their bytes arrive. If the whole
+        prompt was read, `on_complete` receives it as PcmAudio (used by the L1).
+        Yields nothing on a miss or error; legacy list keys are read in full.
+        """
+        if not self.redis_client:
+            logger.error("Cannot stream audio: Redis client is not connected.")
+            return
+        client = self.redis_client
+        try:
+            head = await client.getrange(key, 0, HEADER_SIZE + first_window_frames * DEFAULT_FRAME_BYTES - 1)
+        except redis.ResponseError as e:
+            if "WRONGTYPE" not in str(e):
+                logger.error(f"Redis error streaming audio for key '{key}': {e}", exc_info=True)
+                return
+            audio = await self._get_legacy_audio(key)
+            if audio is not None:
+                if on_complete is not None:
+                    on_complete(audio)
+                for frame in audio.iter_frames():
+                    yield frame
+            return
         except redis.RedisError as e:
-            logger.error(f"Redis error getting audio chunks for key '{key}': {e}", exc_info=True)
+            logger.error(f"Redis error streaming audio for key '{key}': {e}", exc_info=True)
+            return
+        if not head:
+            logger.debug(f"Cache miss for audio with key '{key}'.")
+            return
+        try:
+            codec = codec_for(head)
+            total, decoder = codec.open_stream(head)
+        except AudioFormatError as e:
+            logger.error(f"Corrupt audio blob for key '{key}': {e}")
+            return
+
+        # Windows are sized in stored bytes: a window of a compressed blob holds several times more audio
+        window_bytes = max(1, window_frames) * decoder.frame_bytes
+        ranges = deque((start, min(start + window_bytes, total)) for start in range(len(head), total, window_bytes))
+        pending: deque = deque()
+        frames = [] if on_complete is not None else None
+
+        def schedule() -> None:
+            while ranges and len(pending) < max(1, prefetch_windows):
+                start, end = ranges.popleft()
+                pending.append((end - start, asyncio.ensure_future(client.getrange(key, start, end - 1))))
+
+        try:
+            schedule()
+            data = memoryview(head)[codec.header_size:]
+            while True:
+                try:
+                    for frame in decoder.feed(data):
+                        if frames is not None:
+                            frames.append(frame)
+                        yield frame
+                except AudioFormatError as e:
+                    logger.error(f"Corrupt audio blob for key '{key}': {e}")
+                    return
+                if not pending:
+                    break
+                expected, task = pending.popleft()
+                try:
+                    data = await task
+                except redis.RedisError as e:
+                    logger.error(f"Redis error streaming audio for key '{key}': {e}", exc_info=True)
+                    return
+                schedule()
+                if len(data) != expected:
+                    # Key rewritten or deleted mid-read: the tail would belong to another value
+                    logger.warning(f"Audio key '{key}' changed while streaming; stopping early.")
+                    return
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+        if frames is not None:
+            try:
+                on_complete(decoder.to_audio(frames))
+            except AudioFormatError as e:
+                logger.error(f"Streamed audio for key '{key}' is inconsistent: {e}")
+
+    async def get_audio_chunks(self, key: str) -> list[memoryview] | None:
+        audio = await self.get_audio(key)
+        if audio is None:
             return None
+        return audio.frames()
 
     async def set_text(self, key: str, text: str, ttl_seconds: int) -> bool:
         if not self.redis_client:
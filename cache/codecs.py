@@ -0,0 +1,274 @@
+"""
+Storage codecs for cached audio prompts.
+
+RedisCacheManager encodes every write with one codec (chosen at construction)
+and decodes whatever it reads: the codec is picked by the blob's magic, so PCM1
+and OPS1 keys can coexist while a store is being converted.
+
+PCM1 (cache/audio_format.py) is raw PCM: no decode cost, 16 KB per second of
+8 kHz s16 mono.
+
+OPS1 stores the same transport frames as Opus packets, one packet per frame:
+
+    offset  size  field
+    0       4     magic b"OPS1"
+    4       1     format version (1)
+    5       1     sample width of the decoded PCM, bytes (always 2)
+    6       1     channels
+    7       1     reserved (0)
+    8       4     sample rate, Hz (8000, 12000, 16000, 24000 or 48000)
+    12      4     decoded frame size, bytes
+    16      4     frame count
+    20      4     payload size, bytes
+    24      ...   frame_count x (u16le packet length, packet)
+
+At 16 kbit/s that is about 2 KB per second of speech, ~8x smaller than PCM1.
+Opus packets depend on the decoder state, so frames are decoded strictly in
+order, one packet at a time: the first frame is ready as soon as its packet
+has arrived, long before the rest of the prompt is decoded (or even fetched).
+
+Opus needs `opuslib` and the system libopus; both are imported only when an
+OPS1 blob is actually encoded or decoded.
+"""
+from __future__ import annotations
+
+import abc
+import struct
+from typing import ClassVar, Dict, Iterator, List, Tuple
+
+from cache.audio_format import (
+    HEADER_SIZE,
+    MAGIC as PCM_MAGIC,
+    AudioFormatError,
+    BytesLike,
+    PcmAudio,
+    decode_pcm,
+    encode_pcm,
+    read_header,
+)
+
+OPUS_MAGIC = b"OPS1"
+OPUS_VERSION = 1
+OPUS_HEADER = struct.Struct("<4sBBBBIIII")
+PACKET_LENGTH = struct.Struct("<H")
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+OPUS_FRAME_MS = (10, 20, 40, 60)
+
+
+class CodecUnavailableError(AudioFormatError):
+    """The blob's codec needs a library that is not installed here."""
+
+
+def _opuslib():
+    try:
+        import opuslib
+    except Exception as e:  # opuslib raises a bare Exception when libopus itself is missing
+        raise CodecUnavailableError(f"Opus codec is unavailable: {e}") from e
+    return opuslib
+
+
+class FrameDecoder(abc.ABC):
+    """
+    Incremental decoder of one blob. `feed()` takes consecutive pieces of the
+    payload (everything after the header) and yields whole PCM frames as soon
+    as they can be decoded.
+    """
+
+    def __init__(self, sample_rate: int, sample_width: int, channels: int, frame_bytes: int, frame_count: int):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.channels = channels
+        self.frame_bytes = frame_bytes
+        self.frame_count = frame_count
+        self.frames_decoded = 0
+
+    @abc.abstractmethod
+    def feed(self, data: BytesLike) -> Iterator[BytesLike]: ...
+
+    def to_audio(self, frames: List[BytesLike]) -> PcmAudio:
+        if len(frames) != self.frame_count:
+            raise AudioFormatError(f"decoded {len(frames)} frames, header says {self.frame_count}")
+        data = memoryview(b"".join(frames))
+        return PcmAudio(self.sample_rate, self.sample_width, self.channels, self.frame_bytes, self.frame_count, data)
+
+
+class AudioCodec(abc.ABC):
+    name: ClassVar[str]
+    magic: ClassVar[bytes]
+    header_size: ClassVar[int]
+    # Encoding/decoding a whole prompt costs enough CPU to be moved off the event loop
+    cpu_bound: ClassVar[bool] = False
+
+    def supports(self, sample_rate: int, sample_width: int, frame_ms: int) -> bool:
+        return True
+
+    @abc.abstractmethod
+    def encode(self, pcm: BytesLike, sample_rate: int = 8000, sample_width: int = 2,
+               channels: int = 1, frame_ms: int = 20) -> bytes: ...
+
+    @abc.abstractmethod
+    def open_stream(self, head: BytesLike) -> Tuple[int, FrameDecoder]:
+        """
+        Parse the header from a prefix of the blob (a ranged read).
+        Returns (total blob size, decoder for the payload).
+        """
+
+    def decode(self, blob: BytesLike) -> PcmAudio:
+        total, decoder = self.open_stream(blob)
+        if len(blob) != total:
+            raise AudioFormatError(f"blob is {len(blob)} bytes, header says {total}")
+        return decoder.to_audio(list(decoder.feed(memoryview(blob)[self.header_size:])))
+
+
+class _PcmFrameDecoder(FrameDecoder):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._carry = memoryview(b"")
+
+    def feed(self, data: BytesLike) -> Iterator[memoryview]:
+        # Window boundaries need not fall on frame boundaries: the partial tail waits for the next piece
+        data = memoryview(bytes(self._carry) + bytes(data)) if self._carry else memoryview(data)
+        step = self.frame_bytes
+        usable = len(data) - len(data) % step
+        self._carry = data[usable:]
+        for offset in range(0, usable, step):
+            self.frames_decoded += 1
+            yield data[offset:offset + step]
+
+
+class PcmCodec(AudioCodec):
+    name = "pcm"
+    magic = PCM_MAGIC
+    header_size = HEADER_SIZE
+
+    def encode(self, pcm: BytesLike, sample_rate: int = 8000, sample_width: int = 2,
+               channels: int = 1, frame_ms: int = 20) -> bytes:
+        return encode_pcm(pcm, sample_rate, sample_width, channels, frame_ms)
+
+    def decode(self, blob: BytesLike) -> PcmAudio:
+        return decode_pcm(blob)  # zero-copy, no need to go through the frame decoder
+
+    def open_stream(self, head: BytesLike) -> Tuple[int, FrameDecoder]:
+        sample_rate, sample_width, channels, frame_bytes, frame_count = read_header(head)
+        decoder = _PcmFrameDecoder(sample_rate, sample_width, channels, frame_bytes, frame_count)
+        return HEADER_SIZE + frame_bytes * frame_count, decoder
+
+
+class _OpusFrameDecoder(FrameDecoder):
+    def __init__(self, *args):
+        super().__init__(*args)
+        opuslib = _opuslib()
+        self._decoder = opuslib.Decoder(self.sample_rate, self.channels)
+        self._opus_error = opuslib.OpusError
+        self._samples = self.frame_bytes // (self.sample_width * self.channels)
+        self._buffer = bytearray()
+
+    def feed(self, data: BytesLike) -> Iterator[bytes]:
+        self._buffer += data
+        buffer = self._buffer
+        offset = 0
+        try:
+            while len(buffer) - offset >= PACKET_LENGTH.size and self.frames_decoded < self.frame_count:
+                (length,) = PACKET_LENGTH.unpack_from(buffer, offset)
+                end = offset + PACKET_LENGTH.size + length
+                if end > len(buffer):
+                    break
+                try:
+                    frame = self._decoder.decode(bytes(buffer[offset + PACKET_LENGTH.size:end]), self._samples)
+                except self._opus_error as e:
+                    raise AudioFormatError(f"corrupt Opus packet #{self.frames_decoded}: {e}") from e
+                if len(frame) != self.frame_bytes:
+                    raise AudioFormatError(f"Opus packet decoded to {len(frame)} bytes, expected {self.frame_bytes}")
+                offset = end
+                self.frames_decoded += 1
+                yield frame
+        finally:
+            del buffer[:offset]
+
+
+class OpusCodec(AudioCodec):
+    """
+    Opus in VoIP mode. `bitrate` is per channel; 16 kbit/s is transparent enough
+    for 8 kHz telephony, 24 kbit/s for 16 kHz wideband prompts.
+    """
+
+    name = "opus"
+    magic = OPUS_MAGIC
+    header_size = OPUS_HEADER.size
+    cpu_bound = True
+
+    def __init__(self, bitrate: int = 16000, complexity: int = 10):
+        self.bitrate = bitrate
+        self.complexity = complexity
+
+    def supports(self, sample_rate: int, sample_width: int, frame_ms: int) -> bool:
+        return sample_width == 2 and sample_rate in OPUS_SAMPLE_RATES and frame_ms in OPUS_FRAME_MS
+
+    def encode(self, pcm: BytesLike, sample_rate: int = 8000, sample_width: int = 2,
+               channels: int = 1, frame_ms: int = 20) -> bytes:
+        if not self.supports(sample_rate, sample_width, frame_ms):
+            raise AudioFormatError(f"Opus cannot store {sample_rate} Hz / {sample_width * 8} bit / {frame_ms} ms frames")
+        opuslib = _opuslib()
+        encoder = opuslib.Encoder(sample_rate, channels, opuslib.APPLICATION_VOIP)
+        encoder.bitrate = self.bitrate * channels
+        encoder.complexity = self.complexity
+        samples = sample_rate * frame_ms // 1000
+        frame_bytes = samples * sample_width * channels
+        pcm = bytes(memoryview(pcm).cast("B"))
+        frame_count = -(-len(pcm) // frame_bytes)
+        pcm += b"\x00" * (frame_count * frame_bytes - len(pcm))
+        parts = []
+        for offset in range(0, len(pcm), frame_bytes):
+            packet = encoder.encode(pcm[offset:offset + frame_bytes], samples)
+            parts.append(PACKET_LENGTH.pack(len(packet)))
+            parts.append(packet)
+        payload = b"".join(parts)
+        header = OPUS_HEADER.pack(
+            OPUS_MAGIC, OPUS_VERSION, sample_width, channels, 0, sample_rate, frame_bytes, frame_count, len(payload)
+        )
+        return header + payload
+
+    def open_stream(self, head: BytesLike) -> Tuple[int, FrameDecoder]:
+        if len(head) < OPUS_HEADER.size:
+            raise AudioFormatError(f"blob too short: {len(head)} bytes")
+        magic, version, sample_width, channels, _, sample_rate, frame_bytes, frame_count, payload = OPUS_HEADER.unpack_from(head)
+        if magic != OPUS_MAGIC:
+            raise AudioFormatError(f"bad magic {magic!r}")
+        if version != OPUS_VERSION:
+            raise AudioFormatError(f"unsupported version {version}")
+        if frame_bytes <= 0:
+            raise AudioFormatError(f"invalid frame size {frame_bytes}")
+        decoder = _OpusFrameDecoder(sample_rate, sample_width, channels, frame_bytes, frame_count)
+        return OPUS_HEADER.size + payload, decoder
+
+
+PCM = PcmCodec()
+
+# Reading needs no encoder settings, so one default instance per format is enough
+_BY_MAGIC: Dict[bytes, AudioCodec] = {PcmCodec.magic: PCM, OpusCodec.magic: OpusCodec()}
+
+
+def codec_for(blob: BytesLike) -> AudioCodec:
+    """Codec of a stored blob (or of its prefix), by magic."""
+    codec = _BY_MAGIC.get(bytes(blob[:4]))
+    if codec is None:
+        raise AudioFormatError(f"unknown audio blob magic {bytes(blob[:4])!r}")
+    return codec
+
+
+def get_codec(name: str, **options) -> AudioCodec:
+    """
+    Codec for writing by name: "pcm" or "opus" (options: bitrate, complexity).
+    Raises CodecUnavailableError right away if opuslib/libopus is missing, so a
+    misconfigured node fails at startup instead of on every write.
+    """
+    if name == PcmCodec.name:
+        return PCM
+    if name == OpusCodec.name:
+        _opuslib()
+        return OpusCodec(**options)
+    raise ValueError(f"unknown audio codec '{name}'")
+
+
+def decode_audio(blob: BytesLike) -> PcmAudio:
+    return codec_for(blob).decode(blob)
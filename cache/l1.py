@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence
+
+import redis.asyncio as redis
+
+from cache.audio_format import PcmAudio
+from cache.cache import AUDIO_INVALIDATION_CHANNEL, INVALIDATE_ALL, RedisCacheManager
+from domain.interfaces.cache import AbstractCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class L1Stats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    oversize: int = 0
+    entries: int = 0
+    bytes: int = 0
+    max_bytes: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # Every waiter may have been cancelled; the fetch error must not be reported as never retrieved
+    if not task.cancelled():
+        task.exception()
+
+
+class L1AudioCache(AbstractCache):
+    """
+    In-process LRU cache of decoded audio in front of RedisCacheManager.
+
+    Entries are PcmAudio objects (one Redis blob each), so a hit is a dict lookup
+    with no I/O and no copying. Memory is bounded by `max_bytes` of PCM payload;
+    the least recently played prompt is evicted first.
+
+    Consistency across nodes: RedisCacheManager publishes the key to
+    AUDIO_INVALIDATION_CHANNEL after every audio write, and each L1 drops its copy
+    when it sees the message. If the subscription drops, messages may have been
+    missed, so the whole L1 is cleared on resubscribe. `connect()` returns only once
+    the first subscription is up, so nothing is cached before invalidations are heard.
+
+    Text methods are passed through to the backend unchanged.
+    """
+
+    def __init__(
+        self,
+        backend: RedisCacheManager,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_item_bytes: Optional[int] = None,
+        channel: str = AUDIO_INVALIDATION_CHANNEL,
+        resubscribe_delay_sec: float = 1.0,
+        subscribe_timeout_sec: float = 5.0,
+    ):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        # A single huge prompt should not flush the whole working set
+        self.max_item_bytes = max_item_bytes if max_item_bytes is not None else max_bytes // 8
+        self.channel = channel
+        self.resubscribe_delay_sec = resubscribe_delay_sec
+        self.subscribe_timeout_sec = subscribe_timeout_sec
+        self._entries: "OrderedDict[str, PcmAudio]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Bumped on every invalidation: a fetch that started before it must not be stored
+        self._epoch = 0
+        self._listener: Optional[asyncio.Task] = None
+        # Set once the first subscription is up; later subscriptions are resubscribes
+        self._subscribed = asyncio.Event()
+        self._stats = L1Stats(max_bytes=max_bytes)
+
+    async def connect(self) -> None:
+        await self.backend.connect()
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+        # Nothing may be cached before invalidations are heard: a write published earlier would be missed
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), self.subscribe_timeout_sec)
+        except asyncio.TimeoutError:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+            raise redis.ConnectionError(
+                f"L1 audio cache could not subscribe to {self.channel} in {self.subscribe_timeout_sec}s"
+            ) from None
+
+    async def close(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        self._subscribed.clear()
+        for task in list(self._inflight.values()):
+            task.cancel()
+        await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+        logger.info(f"L1 audio cache closed: {self.stats()}")
+        await self.backend.close()
+
+    # --- audio ---
+
+    async def get_audio(self, key: str) -> PcmAudio | None:
+        audio = self._entries.get(key)
+        if audio is not None:
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return audio
+        self._stats.misses += 1
+
+        # Concurrent misses on the same key share one Redis GET. It runs in its own task:
+        # a caller cancelled by barge-in must not cancel the fetch for the others waiting on it
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key))
+            task.add_done_callback(_retrieve_exception)
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str) -> PcmAudio | None:
+        epoch = self._epoch
+        try:
+            audio = await self.backend.get_audio(key)
+            if audio is not None and epoch == self._epoch:
+                self._put(key, audio)
+            return audio
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_audio_many(self, keys: Sequence[str]) -> Dict[str, PcmAudio | None]:
+        """Hits from memory; all misses in one batched backend request."""
+        result: Dict[str, PcmAudio | None] = {}
+        misses = []
+        for key in dict.fromkeys(keys):
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+                result[key] = audio
+            else:
+                self._stats.misses += 1
+                misses.append(key)
+        if misses:
+            epoch = self._epoch
+            fetched = await self.backend.get_audio_many(misses)
+            for key in misses:
+                audio = fetched.get(key)
+                if audio is not None and epoch == self._epoch:
+                    self._put(key, audio)
+                result[key] = audio
+        return result
+
+    async def stream_audio(self, key: str) -> AsyncIterator[memoryview]:
+        """Hit: frames from memory. Miss: progressive read from Redis, stored in the L1 once complete."""
+        audio = self._entries.get(key)
+        if audio is not None:
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            for frame in audio.iter_frames():
+                yield frame
+            return
+        self._stats.misses += 1
+        epoch = self._epoch
+
+        def store(complete: PcmAudio) -> None:
+            if epoch == self._epoch:
+                self._put(key, complete)
+
+        async for frame in self.backend.stream_audio(key, on_complete=store):
+            yield frame
+
+    async def get_audio_chunks(self, key: str) -> List[memoryview] | None:
+        audio = await self.get_audio(key)
+        return audio.frames() if audio is not None else None
+
+    async def set_audio_pcm(
+        self,
+        key: str,
+        pcm: bytes,
+        sample_rate: int = 8000,
+        sample_width: int = 2,
+        channels: int = 1,
+        frame_ms: int = 20,
+        ttl_seconds: Optional[int] = None,
+    ) -> bool:
+        self.invalidate(key)
+        return await self.backend.set_audio_pcm(key, pcm, sample_rate, sample_width, channels, frame_ms, ttl_seconds)
+
+    async def set_audio_chunks(self, key: str, audio_chunks: List[bytes]) -> bool:
+        self.invalidate(key)
+        return await self.backend.set_audio_chunks(key, audio_chunks)
+
+    async def load_and_set_audio(self, key: str, wav_filepath: str, chunk_size_ms: int = 20) -> bool:
+        self.invalidate(key)
+        return await self.backend.load_and_set_audio(key, wav_filepath, chunk_size_ms)
+
+    async def preload(self, keys: Iterable[str], concurrency: int = 16) -> int:
+        """Warm the L1 with the given keys (e.g. every prompt of the dialogue map). Returns keys loaded."""
+        keys = [k for k in dict.fromkeys(keys) if k not in self._entries]
+        semaphore = asyncio.Semaphore(concurrency)
+        t_start = time.monotonic()
+
+        async def load(key: str) -> bool:
+            async with semaphore:
+                return await self.get_audio(key) is not None
+
+        loaded = sum(await asyncio.gather(*(load(k) for k in keys)))
+        logger.info(
+            f"L1 audio cache preloaded {loaded}/{len(keys)} keys, {self._bytes} bytes "
+            f"in {(time.monotonic() - t_start) * 1000:.1f} ms."
+        )
+        return loaded
+
+    # --- text passthrough ---
+
+    async def set_text(self, key: str, text: str, ttl_seconds: int) -> bool:
+        return await self.backend.set_text(key, text, ttl_seconds)
+
+    async def get_text(self, key: str) -> str | None:
+        return await self.backend.get_text(key)
+
+    # --- bookkeeping ---
+
+    def _put(self, key: str, audio: PcmAudio) -> None:
+        size = audio.data.nbytes
+        if size > self.max_item_bytes:
+            self._stats.oversize += 1
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.data.nbytes
+        self._entries[key] = audio
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.data.nbytes
+            self._stats.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        self._epoch += 1
+        audio = self._entries.pop(key, None)
+        if audio is not None:
+            self._bytes -= audio.data.nbytes
+            self._stats.invalidations += 1
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._stats.invalidations += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> L1Stats:
+        return L1Stats(**{**asdict(self._stats), "entries": len(self._entries), "bytes": self._bytes})
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = None
+            try:
+                client = self.backend.redis_client
+                if client is None:
+                    raise redis.ConnectionError("backend is not connected")
+                pubsub = client.pubsub()
+                await pubsub.subscribe(self.channel)
+                if self._subscribed.is_set():
+                    # Invalidations published while we were not subscribed are lost
+                    logger.warning("L1 audio cache resubscribed to invalidations; clearing all entries.")
+                    self.clear()
+                else:
+                    self._subscribed.set()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None or message.get("type") != "message":
+                        continue
+                    key = message["data"].decode() if isinstance(message["data"], bytes) else message["data"]
+                    if key == INVALIDATE_ALL:
+                        self.clear()
+                    else:
+                        self.invalidate(key)
+            except asyncio.CancelledError:
+                raise
+            except (redis.RedisError, OSError) as e:
+                logger.error(f"L1 audio cache invalidation listener failed: {e}")
+                await asyncio.sleep(self.resubscribe_delay_sec)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except (redis.RedisError, OSError):
+                        pass
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import time
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from cache.audio_format import PcmAudio, decode_pcm, encode_pcm, pcm_from_wav_chunks, pcm_from_wav_file
+from domain.interfaces.cache import AbstractCache
+
+
+class InMemoryCache(AbstractCache):
+    """
+    Dict-backed AbstractCache with the same semantics as RedisCacheManager
+    (PCM1 blobs, TTLs, None on miss). For simulations, manual tests and
+    single-process tools that should not need a Redis server.
+    """
+
+    def __init__(self):
+        self._audio: Dict[str, Tuple[PcmAudio, Optional[float]]] = {}
+        self._text: Dict[str, Tuple[str, Optional[float]]] = {}
+
+    async def connect(self) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+    @staticmethod
+    def _alive(expires_at: Optional[float]) -> bool:
+        return expires_at is None or expires_at > time.monotonic()
+
+    @staticmethod
+    def _expiry(ttl_seconds: Optional[int]) -> Optional[float]:
+        return time.monotonic() + ttl_seconds if ttl_seconds else None
+
+    async def load_and_set_audio(self, key: str, wav_filepath: str, chunk_size_ms: int = 20) -> bool:
+        try:
+            pcm, sample_rate, sample_width, channels = pcm_from_wav_file(wav_filepath)
+        except Exception:
+            return False
+        return await self.set_audio_pcm(key, pcm, sample_rate, sample_width, channels, chunk_size_ms)
+
+    async def set_audio_chunks(self, key: str, audio_chunks: List[bytes]) -> bool:
+        if not audio_chunks:
+            return False
+        if bytes(audio_chunks[0][:4]) == b"RIFF":
+            pcm, sample_rate, sample_width, channels = pcm_from_wav_chunks(audio_chunks)
+            return await self.set_audio_pcm(key, pcm, sample_rate, sample_width, channels)
+        return await self.set_audio_pcm(key, b"".join(audio_chunks))
+
+    async def set_audio_pcm(
+        self,
+        key: str,
+        pcm: bytes,
+        sample_rate: int = 8000,
+        sample_width: int = 2,
+        channels: int = 1,
+        frame_ms: int = 20,
+        ttl_seconds: Optional[int] = None,
+    ) -> bool:
+        audio = decode_pcm(encode_pcm(pcm, sample_rate, sample_width, channels, frame_ms))
+        self._audio[key] = (audio, self._expiry(ttl_seconds))
+        return True
+
+    async def get_audio(self, key: str) -> PcmAudio | None:
+        entry = self._audio.get(key)
+        if entry is None:
+            return None
+        if not self._alive(entry[1]):
+            del self._audio[key]
+            return None
+        return entry[0]
+
+    async def get_audio_many(self, keys: Sequence[str]) -> Dict[str, PcmAudio | None]:
+        return {key: await self.get_audio(key) for key in dict.fromkeys(keys)}
+
+    async def stream_audio(self, key: str) -> AsyncIterator[memoryview]:
+        audio = await self.get_audio(key)
+        if audio is not None:
+            for frame in audio.iter_frames():
+                yield frame
+
+    async def get_audio_chunks(self, key: str) -> List[memoryview] | None:
+        audio = await self.get_audio(key)
+        return audio.frames() if audio is not None else None
+
+    async def set_text(self, key: str, text: str, ttl_seconds: int) -> bool:
+        self._text[key] = (text, self._expiry(ttl_seconds))
+        return True
+
+    async def get_text(self, key: str) -> str | None:
+        entry = self._text.get(key)
+        if entry is None:
+            return None
+        if not self._alive(entry[1]):
+            del self._text[key]
+            return None
+        return entry[0]
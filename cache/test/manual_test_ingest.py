@@ -0,0 +1,145 @@
+"""
+Проверка идемпотентности scripts/ingest_static_audio.py.
+
+Сценарий: первый прогон пишет все ключи, битый путь считается ошибкой; второй прогон
+ничего не декодирует; после удаления ключей (хэш в audio:ingest:hashes остаётся) третий
+прогон заливает заново только их.
+
+По умолчанию Redis заменён словарём в памяти процесса; с --redis прогон идёт в настоящий
+Redis из RedisConfig (ключи с префиксом --prefix удаляются после проверки).
+
+    python cache/test/manual_test_ingest.py
+    python cache/test/manual_test_ingest.py --files 200 --redis
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import wave
+from typing import Dict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import scripts.ingest_static_audio as ingest_module
+from infra.redis_config import RedisConfig
+
+
+class InMemoryPipeline:
+    def __init__(self, client: "InMemoryRedis"):
+        self._client = client
+        self._ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value):
+        self._ops.append(lambda: self._client.strings.__setitem__(key, value))
+
+    def hset(self, name, key, value):
+        self._ops.append(lambda: self._client.hashes.setdefault(name, {}).__setitem__(key, value))
+
+    def publish(self, channel, message):
+        self._ops.append(lambda: self._client.published.append((channel, message)))
+
+    def exists(self, key):
+        self._ops.append(lambda: int(key in self._client.strings))
+
+    async def execute(self):
+        await asyncio.sleep(0)
+        ops, self._ops = self._ops, []
+        return [op() for op in ops]
+
+
+class InMemoryRedis:
+    """Подмножество redis.asyncio.Redis, которое использует ingest."""
+
+    def __init__(self):
+        self.strings: Dict[str, bytes] = {}
+        self.hashes: Dict[str, Dict[str, str]] = {}
+        self.published = []
+
+    async def ping(self):
+        return True
+
+    async def hgetall(self, name):
+        return {k.encode(): v.encode() for k, v in self.hashes.get(name, {}).items()}
+
+    async def delete(self, *keys):
+        return sum(self.strings.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=False):
+        return InMemoryPipeline(self)
+
+    async def aclose(self):
+        pass
+
+
+def make_wavs(directory: str, prefix: str, count: int) -> Dict[str, str]:
+    manifest = {}
+    for i in range(count):
+        path = os.path.join(directory, f"{i}.wav")
+        with wave.open(path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(8000)
+            w.writeframes(os.urandom(3200 * (1 + i % 3)))
+        manifest[f"{prefix}{i}"] = path
+    return manifest
+
+
+def check(name: str, totals: Dict[str, int], **expected: int) -> None:
+    got = {k: totals[k] for k in expected}
+    print(json.dumps({"event": "ingest_check", "run": name, **totals}, ensure_ascii=False), flush=True)
+    assert got == expected, f"{name}: expected {expected}, got {got}"
+
+
+async def run(args) -> None:
+    if args.redis:
+        client = RedisConfig().build()
+    else:
+        client = InMemoryRedis()
+        RedisConfig.build = lambda self: client
+
+    with tempfile.TemporaryDirectory() as directory:
+        manifest = make_wavs(directory, args.prefix, args.files)
+        manifest[f"{args.prefix}bad"] = os.path.join(directory, "missing.wav")
+        ingest_module.resolve_sources = lambda _args: (dict(manifest), [])
+        ingest_args = argparse.Namespace(
+            manifest=None, wav_dir=None, frame_ms=20, codec="pcm", bitrate=16000,
+            workers=args.workers, connections=3, batch=16, force=False,
+        )
+        total = args.files + 1
+        try:
+            check("first", await ingest_module.ingest(ingest_args), keys=total, written=args.files, unchanged=0, failed=1)
+            check("second", await ingest_module.ingest(ingest_args), keys=total, written=0, unchanged=args.files, failed=1)
+            dropped = [f"{args.prefix}{i}" for i in range(0, args.files, max(1, args.files // 5))]
+            await client.delete(*dropped)
+            check("after_delete", await ingest_module.ingest(ingest_args),
+                  keys=total, written=len(dropped), unchanged=args.files - len(dropped), failed=1)
+        finally:
+            if args.redis:
+                await client.delete(*manifest)
+                await client.hdel(ingest_module.HASHES_KEY, *manifest)
+            await client.aclose()
+    print(json.dumps({"event": "ingest_idempotency_ok", "files": args.files}), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=2, help="Decoder processes")
+    parser.add_argument("--redis", action="store_true", help="Use the Redis from RedisConfig instead of the in-memory stand-in")
+    parser.add_argument("--prefix", type=str, default="audio:test_ingest:")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,105 @@
 from __future__ import annotations
 import abc
-from typing import List, Optional
+import enum
+from functools import cached_property
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from cache.audio_format import PcmAudio
+
+
+class CacheNamespace(str, enum.Enum):
+    """Пространства ключей кэша: тип значения и префикс ключа в хранилище."""
+    AUDIO = "audio"            # статические реплики; ключи из карты диалога уже глобальные, без префикса
+    TTS_RESULT = "tts"         # результаты синтеза (tts_manager/result_cache.py)
+    TEXT = "text"
+    SUMMARY = "summary"        # суммаризации диалога ConversationManager
+    EMBEDDING = "embedding"    # float16-векторы фраз (intent_classifier/embedding_cache.py), пишутся в Redis напрямую
+
+    @property
+    def prefix(self) -> str:
+        return _PREFIXES[self]
+
+
+_PREFIXES = {
+    CacheNamespace.AUDIO: "",
+    CacheNamespace.TTS_RESULT: "tts:v1:",
+    CacheNamespace.TEXT: "text:",
+    CacheNamespace.SUMMARY: "summary:",
+    CacheNamespace.EMBEDDING: "emb:v1:",
+}
+
+
+class AudioNamespace:
+    """Типизированный доступ к аудио одного пространства; значения — PcmAudio."""
+
+    def __init__(self, cache: AbstractCache, namespace: CacheNamespace):
+        self.cache = cache
+        self.namespace = namespace
+        self.prefix = namespace.prefix
+
+    def key(self, name: str) -> str:
+        return self.prefix + name
+
+    async def get(self, name: str) -> Optional["PcmAudio"]:
+        return await self.cache.get_audio(self.prefix + name)
+
+    async def get_many(self, names: Sequence[str]) -> Dict[str, Optional["PcmAudio"]]:
+        """Все ключи одним запросом к хранилищу (один конвейер Redis)."""
+        found = await self.cache.get_audio_many([self.prefix + n for n in names])
+        return {n: found.get(self.prefix + n) for n in names}
+
+    def stream(self, name: str) -> AsyncIterator[memoryview]:
+        return self.cache.stream_audio(self.prefix + name)
+
+    async def set_pcm(self, name: str, pcm: bytes, sample_rate: int = 8000, sample_width: int = 2,
+                      channels: int = 1, frame_ms: int = 20, ttl_seconds: Optional[int] = None) -> bool:
+        return await self.cache.set_audio_pcm(
+            self.prefix + name, pcm, sample_rate, sample_width, channels, frame_ms, ttl_seconds
+        )
+
+
+class TextNamespace:
+    """Типизированный доступ к строкам одного пространства; запись всегда с TTL."""
+
+    def __init__(self, cache: AbstractCache, namespace: CacheNamespace):
+        self.cache = cache
+        self.namespace = namespace
+        self.prefix = namespace.prefix
+
+    def key(self, name: str) -> str:
+        return self.prefix + name
+
+    async def get(self, name: str) -> Optional[str]:
+        return await self.cache.get_text(self.prefix + name)
+
+    async def set(self, name: str, text: str, ttl_seconds: int) -> bool:
+        return await self.cache.set_text(self.prefix + name, text, ttl_seconds)
+
 
 class AbstractCache(abc.ABC):
+    """
+    Хранилища (Redis, L1 в памяти, mmap-пак, InMemoryCache) реализуют примитивы ниже;
+    вызывающий код работает через общие для всех типизированные пространства:
+    `cache.audio`, `cache.tts`, `cache.text`, `cache.summary`.
+    """
+
+    @cached_property
+    def audio(self) -> AudioNamespace:
+        return AudioNamespace(self, CacheNamespace.AUDIO)
+
+    @cached_property
+    def tts(self) -> AudioNamespace:
+        return AudioNamespace(self, CacheNamespace.TTS_RESULT)
+
+    @cached_property
+    def text(self) -> TextNamespace:
+        return TextNamespace(self, CacheNamespace.TEXT)
+
+    @cached_property
+    def summary(self) -> TextNamespace:
+        return TextNamespace(self, CacheNamespace.SUMMARY)
+
     @abc.abstractmethod
     async def connect(self) -> None: ...
     @abc.abstractmethod
@@ -14,8 +111,17 @@ class AbstractCache(abc.ABC):
     async def set_audio_chunks(self, key: str, audio_chunks: List[bytes]) -> bool: ...
     @abc.abstractmethod
     async def get_audio_chunks(self, key: str) -> Optional[List[bytes]]: ...
+    @abc.abstractmethod
+    async def set_audio_pcm(self, key: str, pcm: bytes, sample_rate: int = 8000, sample_width: int = 2,
+                            channels: int = 1, frame_ms: int = 20, ttl_seconds: Optional[int] = None) -> bool: ...
+    @abc.abstractmethod
+    async def get_audio(self, key: str) -> Optional["PcmAudio"]: ...
+    @abc.abstractmethod
+    async def get_audio_many(self, keys: Sequence[str]) -> Dict[str, Optional["PcmAudio"]]: ...
+    @abc.abstractmethod
+    def stream_audio(self, key: str) -> AsyncIterator[memoryview]: ...
 
     @abc.abstractmethod
     async def set_text(self, key: str, text: str, ttl_seconds: int) -> bool: ...
     @abc.abstractmethod
-    async def get_text(self, key: str) -> Optional[str]: ...
\ No newline at end of file
+    async def get_text(self, key: str) -> Optional[str]: ...
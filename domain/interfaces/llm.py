@@ -38,4 +38,6 @@ class AbstractConversationManager(abc.ABC):
     @abc.abstractmethod
     async def process_user_turn(self, final_user_text: str) -> AsyncGenerator["LLMStreamChunk", None]: ...
     @abc.abstractmethod
+    async def abort_generation(self) -> None: ...
+    @abc.abstractmethod
     async def shutdown(self) -> None: ...
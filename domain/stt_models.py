@@ -7,6 +7,8 @@ class STTResponse:
     is_final: bool
     stability_level: float
     utterance_index: int
+    received_at: float = 0.0  # time.monotonic() приёма ответа из gRPC-стрима
+    speech_started_at: Optional[float] = None  # time.monotonic() начала фразы в аудио, если распознаватель его отдал
 
 @dataclass(slots=True)
 class STTConfig:
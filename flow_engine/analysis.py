@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from flow_engine.compiled import CompiledDialogueModel
+
+# Цели перехода, которые FlowEngine обрабатывает сам, а не как стейт карты
+PSEUDO_STATES = frozenset({"RUN_FORCE_CHECK"})
+# Стейты, в которые FlowEngine уходит по умолчанию, если их нет в карте
+ENGINE_FALLBACK_STATES = frozenset({"summary_single", "fallback_faq_state"})
+AUDIO_ITEM_TYPES = ("cache", "filler")
+
+ERROR = "error"
+WARNING = "warning"
+
+
+@dataclass(frozen=True)
+class Issue:
+    kind: str
+    severity: str
+    where: str
+    detail: str = ""
+
+
+@dataclass
+class AnalysisReport:
+    states: int
+    transitions: int
+    issues: List[Issue] = field(default_factory=list)
+    cache_keys: Dict[str, Tuple[str, ...]] = field(default_factory=dict)  # ключ -> стейты, где он играет
+
+    @property
+    def errors(self) -> List[Issue]:
+        return [i for i in self.issues if i.severity == ERROR]
+
+    def by_kind(self, kind: str) -> List[Issue]:
+        return [i for i in self.issues if i.kind == kind]
+
+
+class DialogueGraph:
+    """
+    Граф стейтов карты диалога с рёбрами-переходами.
+
+    `RUN_FORCE_CHECK` раскрывается в force-стейты параметров целей, как это делает FlowEngine.
+    Стейты внутри пронумерованы, рёбра — кортежи индексов: обходы идут без
+    строковых ключей, и таблица достижимости за k ходов для всей карты
+    считается за доли секунды даже на тысячах стейтов.
+    """
+
+    def __init__(self, model: CompiledDialogueModel):
+        self.model = model
+        self.state_ids: Tuple[str, ...] = tuple(model.states)
+        self.index: Dict[str, int] = {s: i for i, s in enumerate(self.state_ids)}
+
+        force_states = {
+            p.force_state for g in model.compiled_goals.values() for p in g.parameters if p.force_state in self.index
+        }
+        self.successors: List[Tuple[int, ...]] = []
+        for state_id in self.state_ids:
+            targets: Set[int] = set()
+            for next_state in model.states[state_id].transitions.values():
+                if next_state == "RUN_FORCE_CHECK":
+                    targets.update(self.index[s] for s in force_states)
+                elif next_state in self.index:
+                    targets.add(self.index[next_state])
+            self.successors.append(tuple(sorted(targets)))
+
+    def reachable_from(self, roots: Iterable[str]) -> Set[str]:
+        seen: Set[int] = set()
+        stack = [self.index[r] for r in roots if r in self.index]
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            stack.extend(n for n in self.successors[node] if n not in seen)
+        return {self.state_ids[i] for i in seen}
+
+    def within_turns(self, k: int) -> Dict[str, Tuple[str, ...]]:
+        """Для каждого стейта — стейты, достижимые не более чем за k переходов (сам стейт не включается)."""
+        table = {}
+        successors = self.successors
+        for start, state_id in enumerate(self.state_ids):
+            seen = {start}
+            order = []
+            frontier = [start]
+            for _ in range(max(0, k)):
+                next_frontier = []
+                for node in frontier:
+                    for child in successors[node]:
+                        if child not in seen:
+                            seen.add(child)
+                            order.append(child)
+                            next_frontier.append(child)
+                if not next_frontier:
+                    break
+                frontier = next_frontier
+            # Порядок — по числу ходов: ближние стейты первыми
+            table[state_id] = tuple(self.state_ids[i] for i in order)
+        return table
+
+    def strongly_connected_components(self) -> List[List[int]]:
+        """Итеративный Тарьян: рекурсия на больших картах упёрлась бы в лимит стека."""
+        index_of: Dict[int, int] = {}
+        low: Dict[int, int] = {}
+        on_stack: Set[int] = set()
+        stack: List[int] = []
+        components: List[List[int]] = []
+        counter = 0
+        for root in range(len(self.state_ids)):
+            if root in index_of:
+                continue
+            work = [(root, 0)]
+            while work:
+                node, child_pos = work.pop()
+                if child_pos == 0:
+                    index_of[node] = low[node] = counter
+                    counter += 1
+                    stack.append(node)
+                    on_stack.add(node)
+                successors = self.successors[node]
+                for pos in range(child_pos, len(successors)):
+                    child = successors[pos]
+                    if child not in index_of:
+                        work.append((node, pos + 1))
+                        work.append((child, 0))
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index_of[child])
+                else:
+                    if low[node] == index_of[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(component)
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+        return components
+
+
+def playlist_cache_keys(model: CompiledDialogueModel) -> Dict[str, Tuple[str, ...]]:
+    """Ключи аудио из кэша, на которые ссылаются плейлисты, и стейты, где они звучат."""
+    keys: Dict[str, List[str]] = {}
+    for state_id, state in model.states.items():
+        for item in state.playlist:
+            if isinstance(item, Mapping) and item.get("type") in AUDIO_ITEM_TYPES and item.get("key"):
+                keys.setdefault(item["key"], []).append(state_id)
+    return {k: tuple(v) for k, v in keys.items()}
+
+
+def hot_cache_keys(model: CompiledDialogueModel, within: Mapping[str, Tuple[str, ...]]) -> Dict[str, Tuple[str, ...]]:
+    """Для каждого стейта — ключи аудио его самого и стейтов из таблицы достижимости: их стоит держать в памяти."""
+    state_keys = {
+        state_id: tuple(
+            item["key"] for item in state.playlist
+            if isinstance(item, Mapping) and item.get("type") in AUDIO_ITEM_TYPES and item.get("key")
+        )
+        for state_id, state in model.states.items()
+    }
+    return {
+        state_id: tuple(dict.fromkeys(chain(state_keys.get(state_id, ()), *(state_keys.get(s, ()) for s in reachable))))
+        for state_id, reachable in within.items()
+    }
+
+
+def entry_states(model: CompiledDialogueModel, initial_state: str = "start_greeting") -> Set[str]:
+    """Стейты, в которые FlowEngine может попасть не по переходу: начальный и стейты вопросов/отступлений целей."""
+    entries = {initial_state}
+    for goal in model.compiled_goals.values():
+        for param in goal.parameters:
+            entries.update(s for s in (param.dialogue_state_to_ask, param.force_dialogue_state_to_ask) if s)
+        if goal.is_digression:
+            target = model.next_state(_digression_state(goal.goal_id, goal.dialogue_state_to_ask), goal.goal_id)
+            if target:
+                entries.add(target)
+    return entries
+
+
+def _digression_state(goal_id: str, dialogue_state_to_ask: Optional[str]) -> str:
+    # Та же эвристика, что в FlowEngine.process_event для отступлений
+    return dialogue_state_to_ask or f"info_{goal_id.split('_')[-1]}"
+
+
+def analyze(model: CompiledDialogueModel, initial_state: str = "start_greeting") -> AnalysisReport:
+    graph = DialogueGraph(model)
+    report = AnalysisReport(
+        states=len(model.states),
+        transitions=sum(len(s.transitions) for s in model.states.values()),
+        cache_keys=playlist_cache_keys(model),
+    )
+    issues = report.issues
+
+    if initial_state not in model.states:
+        issues.append(Issue("missing_initial_state", ERROR, initial_state))
+    for state_id in sorted(ENGINE_FALLBACK_STATES - set(model.states)):
+        issues.append(Issue("missing_fallback_state", WARNING, state_id, "FlowEngine may route here but the map has no such state"))
+
+    for state_id, state in model.states.items():
+        for intent_id, next_state in state.transitions.items():
+            if not next_state:
+                issues.append(Issue("dangling_target", ERROR, f"{state_id} --{intent_id}-->", "next_state is empty"))
+            elif next_state not in model.states and next_state not in PSEUDO_STATES:
+                issues.append(Issue("dangling_target", ERROR, f"{state_id} --{intent_id}-->", next_state))
+        for position, item in enumerate(state.playlist):
+            if not isinstance(item, Mapping) or "type" not in item:
+                issues.append(Issue("malformed_playlist_item", ERROR, f"{state_id}[{position}]", repr(item)))
+            elif item["type"] in AUDIO_ITEM_TYPES and not item.get("key"):
+                issues.append(Issue("malformed_playlist_item", ERROR, f"{state_id}[{position}]", "audio item without key"))
+        if not state.transitions and state.action != "END_CALL":
+            issues.append(Issue("dead_end_state", WARNING, state_id, "no transitions and no END_CALL action"))
+
+    for goal in model.compiled_goals.values():
+        for param in goal.parameters:
+            for attr in ("dialogue_state_to_ask", "force_dialogue_state_to_ask"):
+                target = getattr(param, attr)
+                if target and target not in model.states:
+                    issues.append(Issue("missing_ask_state", ERROR, f"{goal.goal_id}.{param.name}.{attr}", target))
+            if not param.dialogue_state_to_ask:
+                issues.append(Issue("missing_ask_state", ERROR, f"{goal.goal_id}.{param.name}", "dialogue_state_to_ask is not set"))
+        if goal.is_digression:
+            state_id = _digression_state(goal.goal_id, goal.dialogue_state_to_ask)
+            if model.next_state(state_id, goal.goal_id) is None:
+                issues.append(Issue("missing_digression_state", WARNING, goal.goal_id,
+                                    f"{state_id} has no transition for it; engine falls back to fallback_faq_state"))
+
+    reachable = graph.reachable_from(entry_states(model, initial_state))
+    for state_id in model.states:
+        if state_id not in reachable:
+            issues.append(Issue("unreachable_state", WARNING, state_id))
+
+    for component in graph.strongly_connected_components():
+        members = set(component)
+        if len(component) == 1 and component[0] not in graph.successors[component[0]]:
+            continue  # одиночный стейт без петли — не цикл
+        has_exit = any(n not in members for m in component for n in graph.successors[m])
+        ends_call = any(model.states[graph.state_ids[m]].action == "END_CALL" for m in component)
+        if not has_exit and not ends_call:
+            names = sorted(graph.state_ids[m] for m in component)
+            issues.append(Issue("trap_cycle", ERROR, names[0], " -> ".join(names)))
+
+    return report
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+
+from flow_engine.expressions import Evaluator, compile_expression
+from flow_engine.utils import load_json_config
+
+
+@dataclass(frozen=True)
+class CompiledParameter:
+    name: str
+    dialogue_state_to_ask: Optional[str]
+    force_dialogue_state_to_ask: Optional[str]
+    # bool — безусловно; иначе скомпилированное условие из goals.json: (context) -> value
+    is_required: Union[bool, Evaluator]
+    condition_source: Optional[str] = None
+
+    @property
+    def force_state(self) -> Optional[str]:
+        return self.force_dialogue_state_to_ask or self.dialogue_state_to_ask
+
+
+@dataclass(frozen=True)
+class CompiledGoal:
+    goal_id: str
+    parameters: Tuple[CompiledParameter, ...]
+    parameter_names: Tuple[str, ...]
+    is_terminal: bool
+    is_forcing: bool
+    is_digression: bool
+    dialogue_state_to_ask: Optional[str]
+
+
+@dataclass(frozen=True)
+class CompiledState:
+    state_id: str
+    transitions: Mapping[str, str]          # intent_id -> next_state
+    expected_intents: Tuple[str, ...]
+    playlist: Tuple[Mapping[str, Any], ...]
+    action: Optional[str]
+
+
+class CompiledDialogueModel:
+    """
+    Неизменяемая модель диалога: goals.json и карта диалога, разобранные один раз на процесс.
+
+    Хранит индексы intent→goal, таблицы переходов по стейтам и готовые кортежи
+    expected_intents, поэтому на ход и на partial не остаётся ни разбора JSON, ни линейных поисков.
+    Исходные словари доступны как `goals` и `dialogue_map` только для чтения.
+    """
+
+    def __init__(self, goals: Dict[str, Any], dialogue_map: Dict[str, Any]):
+        self.goals: Mapping[str, Any] = MappingProxyType(goals)
+        self.dialogue_map: Mapping[str, Any] = MappingProxyType(dialogue_map)
+
+        compiled_goals = {goal_id: self._compile_goal(goal_id, data) for goal_id, data in goals.items()}
+        self.compiled_goals: Mapping[str, CompiledGoal] = MappingProxyType(compiled_goals)
+
+        # Интент ведёт к цели с тем же id; иначе — к цели, у которой intent указан явно (первая по порядку)
+        goal_by_intent: Dict[str, CompiledGoal] = {}
+        for goal_id, data in goals.items():
+            intent_id = data.get("intent")
+            if intent_id and intent_id not in goal_by_intent:
+                goal_by_intent[intent_id] = compiled_goals[goal_id]
+        goal_by_intent.update(compiled_goals)
+        self._goal_by_intent: Mapping[str, CompiledGoal] = MappingProxyType(goal_by_intent)
+
+        self.states: Mapping[str, CompiledState] = MappingProxyType(
+            {state_id: self._compile_state(state_id, data) for state_id, data in dialogue_map.items()}
+        )
+
+    @staticmethod
+    def _compile_goal(goal_id: str, data: Dict[str, Any]) -> CompiledGoal:
+        parameters = []
+        for param in data.get("parameters", []):
+            condition = param.get("is_required", False)
+            if isinstance(condition, str):
+                is_required: Union[bool, Evaluator] = compile_expression(
+                    condition, origin=f"{goal_id}.{param['name']}.is_required"
+                )
+                source = condition
+            else:
+                is_required, source = bool(condition), None
+            parameters.append(CompiledParameter(
+                name=param["name"],
+                dialogue_state_to_ask=param.get("dialogue_state_to_ask"),
+                force_dialogue_state_to_ask=param.get("force_dialogue_state_to_ask"),
+                is_required=is_required,
+                condition_source=source,
+            ))
+        return CompiledGoal(
+            goal_id=goal_id,
+            parameters=tuple(parameters),
+            parameter_names=tuple(p.name for p in parameters),
+            is_terminal=bool(data.get("is_terminal")),
+            is_forcing=bool(data.get("is_forcing")),
+            is_digression=bool(data.get("is_digression")),
+            dialogue_state_to_ask=data.get("dialogue_state_to_ask"),
+        )
+
+    @staticmethod
+    def _compile_state(state_id: str, data: Dict[str, Any]) -> CompiledState:
+        transitions = {
+            intent_id: transition.get("next_state")
+            for intent_id, transition in data.get("transitions", {}).items()
+        }
+        playlist = data.get("system_response", {}).get("playlist") or []
+        return CompiledState(
+            state_id=state_id,
+            transitions=MappingProxyType(transitions),
+            expected_intents=tuple(transitions),
+            # Некорректные элементы (не словари) остаются как есть: их находит flow_engine.analysis
+            playlist=tuple(MappingProxyType(item) if isinstance(item, dict) else item for item in playlist),
+            action=data.get("action"),
+        )
+
+    def goal_for_intent(self, intent_id: str) -> Optional[CompiledGoal]:
+        return self._goal_by_intent.get(intent_id)
+
+    def goal(self, goal_id: str) -> Optional[CompiledGoal]:
+        return self.compiled_goals.get(goal_id)
+
+    def state(self, state_id: Optional[str]) -> Optional[CompiledState]:
+        return self.states.get(state_id) if state_id else None
+
+    def expected_intents(self, state_id: Optional[str]) -> Tuple[str, ...]:
+        state = self.state(state_id)
+        return state.expected_intents if state else ()
+
+    def next_state(self, state_id: Optional[str], intent_id: str) -> Optional[str]:
+        state = self.state(state_id)
+        return state.transitions.get(intent_id) if state else None
+
+    def playlist(self, state_id: Optional[str]) -> Tuple[Mapping[str, Any], ...]:
+        state = self.state(state_id)
+        return state.playlist if state else ()
+
+
+_models: Dict[Tuple[str, str], Tuple[Tuple[float, float], CompiledDialogueModel]] = {}
+_models_lock = threading.Lock()
+
+
+def load_dialogue_model(goals_config_path: str, dialogue_map_path: str) -> CompiledDialogueModel:
+    """
+    Возвращает общую на процесс модель для пары файлов. Перекомпилирует,
+    только если у какого-то из файлов изменилось время модификации.
+    """
+    key = (os.path.abspath(goals_config_path), os.path.abspath(dialogue_map_path))
+    try:
+        mtimes = (os.path.getmtime(key[0]), os.path.getmtime(key[1]))
+    except OSError:
+        mtimes = None  # load_json_config ниже выдаст понятную ошибку
+    with _models_lock:
+        cached = _models.get(key)
+        if cached and mtimes is not None and cached[0] == mtimes:
+            return cached[1]
+        model = CompiledDialogueModel(load_json_config(goals_config_path), load_json_config(dialogue_map_path))
+        if mtimes is not None:
+            _models[key] = (mtimes, model)
+        return model
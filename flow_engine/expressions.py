@@ -0,0 +1,226 @@
+"""
+Маленький язык условий для goals.json (`is_required` и т.п.).
+
+    session.variables.wants_inner_insurance == true
+    session.variables.property_value >= 1000000 and not session.variables.has_policy
+    session.variables.region in ["msk", "spb"]
+
+Выражение разбирается один раз при загрузке целей и компилируется в дерево
+замыканий. Допустимы только доступ к переменным (`a.b`, `a["b"]`), литералы
+(числа, строки, true/false/null, списки), сравнения, `and`/`or`/`not` и
+унарный минус; всё остальное (вызовы, лямбды, арифметика, dunder-атрибуты)
+отклоняется при загрузке с `ExpressionError`.
+
+При вычислении отсутствующая переменная равна None, а сравнение
+несравнимых значений (`None < 5`) даёт False, а не исключение.
+"""
+from __future__ import annotations
+
+import ast
+import operator
+from typing import Any, Callable, Mapping
+
+Evaluator = Callable[[Mapping[str, Any]], Any]
+
+_LITERAL_NAMES = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+
+class ExpressionError(ValueError):
+    """Выражение не разбирается или использует недопустимую конструкцию."""
+
+    def __init__(self, source: str, message: str, origin: str = ""):
+        prefix = f"{origin}: " if origin else ""
+        super().__init__(f"{prefix}{message} in expression {source!r}")
+        self.source = source
+        self.origin = origin
+
+
+def _lookup(value: Any, key: Any) -> Any:
+    if isinstance(value, Mapping):
+        return value.get(key)
+    if isinstance(value, (list, tuple)) and isinstance(key, int):
+        return value[key] if -len(value) <= key < len(value) else None
+    return None
+
+
+def _safe_compare(op: Callable[[Any, Any], bool]) -> Callable[[Any, Any], bool]:
+    def compare(a: Any, b: Any) -> bool:
+        try:
+            return bool(op(a, b))
+        except TypeError:
+            return False
+    return compare
+
+
+class _Compiler:
+    def __init__(self, source: str, origin: str):
+        self.source = source
+        self.origin = origin
+
+    def error(self, node: ast.AST, message: str) -> ExpressionError:
+        col = getattr(node, "col_offset", None)
+        where = f" at column {col + 1}" if col is not None else ""
+        return ExpressionError(self.source, f"{message}{where}", self.origin)
+
+    def compile(self, node: ast.AST) -> Evaluator:
+        method = getattr(self, f"_compile_{type(node).__name__}", None)
+        if method is None:
+            raise self.error(node, f"unsupported syntax '{type(node).__name__}'")
+        return method(node)
+
+    def _compile_Expression(self, node: ast.Expression) -> Evaluator:
+        return self.compile(node.body)
+
+    def _compile_Constant(self, node: ast.Constant) -> Evaluator:
+        if not isinstance(node.value, (str, int, float, bool, type(None))):
+            raise self.error(node, f"unsupported literal {node.value!r}")
+        value = node.value
+        return lambda ctx: value
+
+    def _compile_Name(self, node: ast.Name) -> Evaluator:
+        if node.id in _LITERAL_NAMES:
+            value = _LITERAL_NAMES[node.id]
+            return lambda ctx: value
+        return self._compile_path(node)
+
+    def _compile_Attribute(self, node: ast.Attribute) -> Evaluator:
+        return self._compile_path(node)
+
+    def _compile_Subscript(self, node: ast.Subscript) -> Evaluator:
+        return self._compile_path(node)
+
+    def _compile_path(self, node: ast.AST) -> Evaluator:
+        # `session.variables["x"]` сворачивается в один путь ("session", "variables", "x") и один цикл поиска
+        keys = []
+        while not isinstance(node, ast.Name):
+            if isinstance(node, ast.Attribute):
+                if node.attr.startswith("_"):
+                    raise self.error(node, f"private attribute '{node.attr}' is not allowed")
+                keys.append(node.attr)
+                node = node.value
+            elif isinstance(node, ast.Subscript):
+                if not isinstance(node.slice, ast.Constant) or not isinstance(node.slice.value, (str, int)):
+                    raise self.error(node, "only constant string or integer subscripts are allowed")
+                keys.append(node.slice.value)
+                node = node.value
+            else:
+                raise self.error(node, "attributes and subscripts are only allowed on variables")
+        if node.id in _LITERAL_NAMES:
+            raise self.error(node, f"'{node.id}' is a literal, not a variable")
+        root = node.id
+        path = tuple(reversed(keys))
+
+        if len(path) == 2 and all(isinstance(k, str) for k in path):
+            first, second = path
+
+            def lookup2(ctx):
+                value = ctx.get(root)
+                if isinstance(value, dict):
+                    value = value.get(first)
+                    if isinstance(value, dict):
+                        return value.get(second)
+                    return _lookup(value, second)
+                return _lookup(_lookup(value, first), second)
+            return lookup2
+
+        def lookup(ctx):
+            value = ctx.get(root)
+            for key in path:
+                value = _lookup(value, key)
+            return value
+        return lookup
+
+    def _compile_List(self, node: ast.List) -> Evaluator:
+        return self._compile_sequence(node)
+
+    def _compile_Tuple(self, node: ast.Tuple) -> Evaluator:
+        return self._compile_sequence(node)
+
+    @staticmethod
+    def _is_literal(node: ast.AST) -> bool:
+        return isinstance(node, ast.Constant) or (isinstance(node, ast.Name) and node.id in _LITERAL_NAMES)
+
+    def _compile_sequence(self, node) -> Evaluator:
+        items = [self.compile(elt) for elt in node.elts]
+        if all(self._is_literal(elt) for elt in node.elts):
+            constant = tuple(item({}) for item in items)
+            return lambda ctx: constant
+        return lambda ctx: tuple(item(ctx) for item in items)
+
+    def _compile_UnaryOp(self, node: ast.UnaryOp) -> Evaluator:
+        operand = self.compile(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda ctx: not operand(ctx)
+        if isinstance(node.op, ast.USub):
+            def negate(ctx):
+                value = operand(ctx)
+                return -value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+            return negate
+        raise self.error(node, f"unsupported operator '{type(node.op).__name__}'")
+
+    def _compile_BoolOp(self, node: ast.BoolOp) -> Evaluator:
+        values = [self.compile(v) for v in node.values]
+        if len(values) == 2:
+            first, second = values
+            if isinstance(node.op, ast.And):
+                return lambda ctx: bool(first(ctx)) and bool(second(ctx))
+            return lambda ctx: bool(first(ctx)) or bool(second(ctx))
+        if isinstance(node.op, ast.And):
+            return lambda ctx: all(v(ctx) for v in values)
+        return lambda ctx: any(v(ctx) for v in values)
+
+    def _compile_Compare(self, node: ast.Compare) -> Evaluator:
+        operands = [self.compile(node.left)] + [self.compile(c) for c in node.comparators]
+        ops = []
+        for op in node.ops:
+            fn = _COMPARE_OPS.get(type(op))
+            if fn is None:
+                raise self.error(node, f"unsupported comparison '{type(op).__name__}'")
+            ops.append(_safe_compare(fn))
+
+        if len(ops) == 1:
+            left, right = operands
+            compare = ops[0]
+            if type(node.ops[0]) in (ast.Eq, ast.NotEq) and self._is_literal(node.comparators[0]):
+                # Самый частый случай (`x == true`): ==/!= с литералом не бросает TypeError
+                constant = right({})
+                if isinstance(node.ops[0], ast.Eq):
+                    return lambda ctx: left(ctx) == constant
+                return lambda ctx: left(ctx) != constant
+            return lambda ctx: compare(left(ctx), right(ctx))
+
+        def chained(ctx):
+            left_value = operands[0](ctx)
+            for compare, right in zip(ops, operands[1:]):
+                right_value = right(ctx)
+                if not compare(left_value, right_value):
+                    return False
+                left_value = right_value
+            return True
+        return chained
+
+
+def compile_expression(source: str, origin: str = "") -> Evaluator:
+    """
+    Компилирует условие в функцию `(context) -> value`.
+    `origin` (например, "goal.param.is_required") попадает в текст ошибки.
+    Бросает `ExpressionError`, если выражение недопустимо.
+    """
+    if not isinstance(source, str) or not source.strip():
+        raise ExpressionError(str(source), "empty expression", origin)
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(source, f"syntax error: {e.msg}", origin) from None
+    return _Compiler(source, origin).compile(tree)
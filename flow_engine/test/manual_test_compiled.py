@@ -0,0 +1,192 @@
+"""
+Проверка эквивалентности: FlowEngine на CompiledDialogueModel против прямого обхода
+словарей goals.json и карты диалога, как FlowEngine работал до компиляции.
+
+Эталон ниже — прежний алгоритм process_event без индексов и предкомпиляции: цель ищется
+перебором, переходы читаются из словарей на каждом шаге. Условия is_required в обоих
+движках считает flow_engine.expressions, так что сравнивается именно компиляция модели.
+Случайные диалоги (интенты из целей и переходов карты, случайно заполняемые переменные)
+прогоняются через оба движка; следующий стейт, guide-back и стек задач должны совпадать.
+
+    python flow_engine/test/manual_test_compiled.py
+    python flow_engine/test/manual_test_compiled.py --trials 3000 --steps 8 --seed 1
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from domain.models import FlowResult, SessionState, Task
+from flow_engine.engine import FlowEngine
+from flow_engine.expressions import compile_expression
+from flow_engine.utils import load_json_config
+
+
+class ReferenceFlowEngine:
+    """Прежний FlowEngine: все поиски — по исходным словарям на каждом вызове."""
+
+    def __init__(self, goals_config_path: str, dialogue_map_path: str):
+        self.goals = load_json_config(goals_config_path)
+        self.dialogue_map = load_json_config(dialogue_map_path)
+
+    def _get_goal_by_intent(self, intent_id: str) -> Optional[Dict[str, Any]]:
+        if intent_id in self.goals:
+            return self.goals[intent_id]
+        for goal_id, goal_data in self.goals.items():
+            if goal_id == intent_id or goal_data.get('intent') == intent_id:
+                return goal_data
+        return None
+
+    def _find_next_required_param(self, goal: Dict[str, Any], session_variables: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        for param in goal.get("parameters", []):
+            if param["name"] in session_variables:
+                continue
+            condition = param.get("is_required", False)
+            required = False
+            if isinstance(condition, bool):
+                required = condition
+            elif isinstance(condition, str):
+                try:
+                    required = bool(compile_expression(condition)({"session": {"variables": session_variables}}))
+                except Exception:
+                    required = False
+            if required:
+                return param
+        return None
+
+    def process_event(self, session_state: SessionState, intent_id: str) -> FlowResult:
+        task_stack = session_state.task_stack
+        session_variables = session_state.variables
+        current_dialogue_state_id = session_state.current_state_id
+        goal_for_intent = self._get_goal_by_intent(intent_id)
+
+        if goal_for_intent and goal_for_intent.get("is_terminal"):
+            task_stack = [Task(goal_id=intent_id, status='IN_PROGRESS')]
+            param_to_ask = goal_for_intent['parameters'][0]
+            dialogue_state = self.dialogue_map[param_to_ask['dialogue_state_to_ask']]
+            next_state = dialogue_state["transitions"][intent_id]["next_state"]
+            return FlowResult(next_state=next_state, task_stack=task_stack)
+
+        if goal_for_intent and goal_for_intent.get("is_forcing"):
+            main_task = next((t for t in reversed(task_stack) if not self.goals.get(t.goal_id, {}).get("is_digression")), None)
+            if main_task:
+                main_task.mode = 'FORCED'
+                while task_stack and self.goals.get(task_stack[-1].goal_id, {}).get("is_digression"):
+                    task_stack.pop()
+                next_param = self._find_next_required_param(self.goals[main_task.goal_id], session_variables)
+                if next_param:
+                    next_state = next_param.get("force_dialogue_state_to_ask", next_param["dialogue_state_to_ask"])
+                    return FlowResult(next_state=next_state, task_stack=task_stack)
+
+        if intent_id == 'return_to_main_goal' and len(task_stack) > 1:
+            task_stack.pop()
+            current_task = task_stack[-1]
+            current_task.status = 'IN_PROGRESS'
+            return FlowResult(next_state=current_task.return_state_id or "start_greeting", task_stack=task_stack)
+
+        if goal_for_intent and goal_for_intent.get("is_digression"):
+            should_guide_back = len(task_stack) >= 3
+            if task_stack:
+                task_stack[-1].status = 'PAUSED'
+                task_stack[-1].return_state_id = current_dialogue_state_id
+            task_stack.append(Task(goal_id=intent_id, status='IN_PROGRESS'))
+            state_name = goal_for_intent.get("dialogue_state_to_ask") or f"info_{intent_id.split('_')[-1]}"
+            dialogue_state = self.dialogue_map.get(state_name, {})
+            next_state = dialogue_state.get("transitions", {}).get(intent_id, {}).get("next_state")
+            if not next_state:
+                next_state = dialogue_state.get("next_state", "fallback_faq_state")
+            return FlowResult(next_state=next_state, should_guide_back=should_guide_back, task_stack=task_stack)
+
+        return self._process_current_task(task_stack, session_variables, current_dialogue_state_id, intent_id)
+
+    def _process_current_task(self, task_stack, session_variables, current_dialogue_state_id, intent_id) -> FlowResult:
+        if not task_stack:
+            task_stack.append(Task(goal_id="provide_total_price", status='IN_PROGRESS'))
+        current_task = task_stack[-1]
+        current_goal = self.goals[current_task.goal_id]
+
+        if current_task.mode == 'FORCED':
+            next_param = self._find_next_required_param(current_goal, session_variables)
+            if next_param:
+                next_state = next_param.get("force_dialogue_state_to_ask", next_param["dialogue_state_to_ask"])
+                return FlowResult(next_state=next_state, task_stack=task_stack)
+            current_task.status = 'COMPLETED'
+            return FlowResult(next_state="summary_single", task_stack=task_stack)
+
+        next_param = self._find_next_required_param(current_goal, session_variables)
+        if next_param:
+            return FlowResult(next_state=next_param["dialogue_state_to_ask"], task_stack=task_stack)
+        if current_dialogue_state_id and intent_id in self.dialogue_map.get(current_dialogue_state_id, {}).get("transitions", {}):
+            next_state = self.dialogue_map[current_dialogue_state_id]["transitions"][intent_id]["next_state"]
+            if next_state == "RUN_FORCE_CHECK":
+                current_task.mode = 'FORCED'
+                return self._process_current_task(task_stack, session_variables, current_dialogue_state_id, intent_id)
+            return FlowResult(next_state=next_state, task_stack=task_stack)
+        return FlowResult(next_state="summary_single", task_stack=task_stack)
+
+
+def step(engine, session: SessionState, intent_id: str):
+    """(результат, имя исключения). Падать оба движка должны на одном шаге; тип может отличаться:
+    у цели без parameters эталон бросает KeyError, а скомпилированная модель — IndexError (пустой кортеж)."""
+    try:
+        return engine.process_event(session, intent_id), None
+    except Exception as e:
+        return None, type(e).__name__
+
+
+def replay(goals: str, dialogue_map: str, trials: int, steps: int, seed: int) -> int:
+    reference = ReferenceFlowEngine(goals, dialogue_map)
+    compiled = FlowEngine(goals, dialogue_map)
+    intents = sorted(
+        set(reference.goals)
+        | {i for state in reference.dialogue_map.values() for i in state.get("transitions", {})}
+        | {"return_to_main_goal"}
+    )
+    variables = sorted({p["name"] for goal in reference.goals.values() for p in goal.get("parameters", [])})
+    rng = random.Random(seed)
+    compared = 0
+    for trial in range(trials):
+        a, b = SessionState(call_id="replay"), SessionState(call_id="replay")
+        history = []
+        for _ in range(steps):
+            intent_id = rng.choice(intents)
+            if variables and rng.random() < 0.3:
+                name = rng.choice(variables)
+                value = rng.choice([True, False, 0, 1000000, "да"])
+                a.variables[name] = b.variables[name] = value
+            history.append(intent_id)
+            (ra, ea), (rb, eb) = step(reference, a, intent_id), step(compiled, b, intent_id)
+            if (ea is None) != (eb is None) or repr(ra) != repr(rb):
+                raise AssertionError(
+                    f"{dialogue_map}: trial {trial}, intents {history}:\n  reference {ra or ea}\n  compiled  {rb or eb}"
+                )
+            if ea:
+                break
+            compared += 1
+            a.task_stack, a.current_state_id = ra.task_stack, ra.next_state
+            b.task_stack, b.current_state_id = rb.task_stack, rb.next_state
+    return compared
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--goals", type=str, default="configs/goals.json")
+    parser.add_argument("--dialogue-map", action="append", default=None,
+                        help="Dialogue map to replay (repeatable); default: both maps in configs/")
+    parser.add_argument("--trials", type=int, default=3000)
+    parser.add_argument("--steps", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    maps = args.dialogue_map or ["configs/dialogue_flow_with_playlists.json", "configs/dialogue_flow.json"]
+    for dialogue_map in maps:
+        compared = replay(args.goals, dialogue_map, args.trials, args.steps, args.seed)
+        print(json.dumps({"event": "compiled_replay_ok", "dialogue_map": dialogue_map, "steps": compared}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+logger = logging.getLogger("infra.metrics")
+
+
+def jlog(event: str, **fields):
+    logger.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+
+class EventLoopLagMonitor:
+    """
+    Меряет задержку event loop: насколько позже запланированного просыпается
+    короткий `asyncio.sleep`. Рост лага — первый признак того, что процесс
+    перегружен звонками, ещё до того, как это станет слышно.
+    """
+
+    def __init__(self, interval_sec: float = 0.1, window: int = 50):
+        self.interval_sec = interval_sec
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            t_before = time.monotonic()
+            await asyncio.sleep(self.interval_sec)
+            lag_ms = (time.monotonic() - t_before - self.interval_sec) * 1000
+            self._samples.append(max(0.0, lag_ms))
+
+    @property
+    def last_ms(self) -> float:
+        return self._samples[-1] if self._samples else 0.0
+
+    def percentile(self, q: float) -> float:
+        """q в диапазоне 0..100 по последнему окну замеров."""
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+# --- Латентность хода: t1..t6 ---
+
+# Точки хода в порядке пайплайна. Все отметки — time.monotonic().
+STAGES = (
+    "speech_start",  # начало фразы по времени аудио от STT; без него стадия не считается
+    "stt_partial",
+    "stt_final",
+    "intent_decided",
+    "llm_first_token",
+    "tts_first_byte",
+    "first_outbound_frame",
+)
+# Отметки ответа бота принимаются только после stt_final: иначе их ставит
+# ещё играющий предыдущий ответ или спекулятивная подкачка.
+RESPONSE_STAGES = frozenset(STAGES[STAGES.index("stt_final") + 1:])
+END_TO_END = "stt_final->first_outbound_frame"
+
+
+class LatencyHistogram:
+    """
+    Гистограмма с логарифмическими корзинами (шаг 5%): запись O(1) без аллокаций,
+    перцентили с относительной ошибкой в пределах шага.
+    """
+
+    __slots__ = ("min_ms", "_log_growth", "_counts", "count", "sum_ms", "max_ms")
+
+    def __init__(self, min_ms: float = 0.05, max_ms: float = 120_000.0, growth: float = 1.05):
+        self.min_ms = min_ms
+        self._log_growth = math.log(growth)
+        self._counts: List[int] = [0] * (int(math.log(max_ms / min_ms) / self._log_growth) + 2)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float) -> None:
+        if ms <= self.min_ms:
+            index = 0
+        else:
+            index = min(len(self._counts) - 1, int(math.log(ms / self.min_ms) / self._log_growth) + 1)
+        self._counts[index] += 1
+        self.count += 1
+        self.sum_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, q: float) -> float:
+        """q в диапазоне 0..100; возвращает верхнюю границу корзины."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                upper = self.min_ms * math.exp(index * self._log_growth)
+                return min(upper, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class LatencyRegistry:
+    """Именованные гистограммы процесса (одна на стадию хода)."""
+
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+
+    def record(self, name: str, ms: float) -> None:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = LatencyHistogram()
+        histogram.record(ms)
+
+    def get(self, name: str) -> Optional[LatencyHistogram]:
+        return self._histograms.get(name)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {name: h.snapshot() for name, h in sorted(self._histograms.items())}
+
+    def reset(self) -> None:
+        self._histograms.clear()
+
+
+latency_registry = LatencyRegistry()
+
+
+@dataclass(slots=True)
+class TurnTrace:
+    trace_id: str
+    utterance_index: int
+    marks: Dict[str, float] = field(default_factory=dict)
+    finished: bool = False
+
+    def mark(self, stage: str, ts: Optional[float] = None) -> bool:
+        """Ставит отметку стадии; повторные отметки игнорируются."""
+        if stage in self.marks:
+            return False
+        self.marks[stage] = ts if ts is not None else time.monotonic()
+        return True
+
+    def stage_latencies(self) -> Dict[str, float]:
+        """Задержки между соседними отмеченными стадиями и сквозная stt_final→первый фрейм."""
+        latencies: Dict[str, float] = {}
+        previous: Optional[str] = None
+        for stage in STAGES:
+            if stage not in self.marks:
+                continue
+            if previous is not None:
+                latencies[f"{previous}->{stage}"] = round(max(0.0, self.marks[stage] - self.marks[previous]) * 1000, 3)
+            previous = stage
+        if "stt_final" in self.marks and "first_outbound_frame" in self.marks:
+            latencies[END_TO_END] = round((self.marks["first_outbound_frame"] - self.marks["stt_final"]) * 1000, 3)
+        return latencies
+
+
+class CallTracer:
+    """
+    Трассировка ходов одного звонка. Новый ход открывается первым непустым
+    результатом STT после финального; компоненты отмечают стадии через
+    `metrics.mark(...)`, а по первому фрейму ответа задержки уходят в гистограммы.
+    """
+
+    def __init__(self, call_id: str, registry: LatencyRegistry = latency_registry):
+        self.call_id = call_id
+        self.registry = registry
+        self.current: Optional[TurnTrace] = None
+        self.turns = 0
+        self._end_to_end_ms: List[float] = []
+
+    @property
+    def trace_id(self) -> Optional[str]:
+        return self.current.trace_id if self.current else None
+
+    def observe_stt(
+        self,
+        text: str,
+        is_final: bool,
+        utterance_index: int,
+        ts: Optional[float] = None,
+        speech_started_at: Optional[float] = None,
+    ) -> None:
+        if not text:
+            return
+        ts = ts if ts is not None else time.monotonic()
+        trace = self.current
+        if trace is None or ("stt_final" in trace.marks and utterance_index != trace.utterance_index):
+            self.finish_turn()
+            self.turns += 1
+            trace = self.current = TurnTrace(trace_id=f"{self.call_id}:t{self.turns}", utterance_index=utterance_index)
+        if speech_started_at is not None:
+            trace.mark("speech_start", min(speech_started_at, ts))
+        trace.mark("stt_final" if is_final else "stt_partial", ts)
+
+    def mark(self, stage: str, ts: Optional[float] = None) -> None:
+        trace = self.current
+        if trace is None or trace.finished:
+            return
+        if stage in RESPONSE_STAGES and "stt_final" not in trace.marks:
+            return
+        if trace.mark(stage, ts) and stage == "first_outbound_frame":
+            self.finish_turn()
+
+    def record(self, name: str, ms: float) -> None:
+        self.registry.record(name, ms)
+
+    def finish_turn(self) -> None:
+        trace = self.current
+        if trace is None or trace.finished:
+            return
+        trace.finished = True
+        latencies = trace.stage_latencies()
+        for name, ms in latencies.items():
+            self.registry.record(name, ms)
+        if END_TO_END in latencies:
+            self._end_to_end_ms.append(latencies[END_TO_END])
+        jlog(
+            "turn_latency",
+            call_id=self.call_id,
+            trace_id=trace.trace_id,
+            utterance_index=trace.utterance_index,
+            **latencies,
+        )
+
+    def close(self) -> None:
+        self.finish_turn()
+        e2e = sorted(self._end_to_end_ms)
+        jlog(
+            "call_latency_summary",
+            call_id=self.call_id,
+            turns=self.turns,
+            e2e_p50_ms=e2e[len(e2e) // 2] if e2e else None,
+            e2e_max_ms=e2e[-1] if e2e else None,
+        )
+
+
+_current_tracer: ContextVar[Optional[CallTracer]] = ContextVar("call_tracer", default=None)
+
+
+def bind_tracer(tracer: CallTracer) -> Token:
+    """Привязывает трассировщик к текущему контексту; задачи, созданные после, наследуют его."""
+    return _current_tracer.set(tracer)
+
+
+def unbind_tracer(token: Token) -> None:
+    _current_tracer.reset(token)
+
+
+def mark(stage: str, ts: Optional[float] = None) -> None:
+    tracer = _current_tracer.get()
+    if tracer is not None:
+        tracer.mark(stage, ts)
+
+
+def current_trace_id() -> Optional[str]:
+    tracer = _current_tracer.get()
+    return tracer.trace_id if tracer is not None else None
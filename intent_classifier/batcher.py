@@ -0,0 +1,205 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from infra import metrics
+
+logger = logging.getLogger("intent.batcher")
+
+EmbedFn = Callable[[List[str]], Awaitable[np.ndarray]]
+
+
+@dataclass(slots=True)
+class _Request:
+    texts: List[str]
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class EmbeddingBatcher:
+    """
+    Микробатчинг эмбеддингов между звонками.
+
+    Запросы `embed()` копятся до `window_ms` от первого из них или до `max_batch_size`
+    текстов, затем уходят в модель одним батчем (токенизатор дополняет их до общей
+    длины), и каждый вызывающий получает свои строки результата. Одновременно идёт не
+    больше `max_concurrent_batches` инференсов: пока батч считается, следующие запросы
+    собираются в новый, так что под нагрузкой батчи растут сами.
+
+    Запрос не делится между батчами: вызов с текстами больше `max_batch_size` идёт один.
+    Если батч из нескольких запросов упал, каждый запрос повторяется отдельно, и ошибку
+    получают только те, у кого она повторилась.
+    """
+
+    def __init__(
+        self,
+        embed_fn: EmbedFn,
+        window_ms: float = 2.0,
+        max_batch_size: int = 32,
+        max_concurrent_batches: int = 1,
+    ) -> None:
+        self._embed_fn = embed_fn
+        self.window_ms = window_ms
+        self.max_batch_size = max(1, max_batch_size)
+        self._slots = asyncio.Semaphore(max(1, max_concurrent_batches))
+        self._pending: List[_Request] = []
+        self._pending_texts = 0
+        self._has_work = asyncio.Event()
+        self._full = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: set[asyncio.Task] = set()
+        self.queue_wait = metrics.LatencyHistogram()
+        self.inference = metrics.LatencyHistogram()
+        self.batch_sizes: Counter = Counter()
+        self.requests = 0
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return await self._embed_fn(texts)
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+        request = _Request(list(texts), asyncio.get_running_loop().create_future(), time.monotonic())
+        self._pending.append(request)
+        self._pending_texts += len(request.texts)
+        self.requests += 1
+        self._has_work.set()
+        if self._pending_texts >= self.max_batch_size:
+            self._full.set()
+        return await request.future
+
+    async def _dispatch_loop(self) -> None:
+        window_sec = self.window_ms / 1000
+        while True:
+            if not self._pending:
+                self._has_work.clear()
+                await self._has_work.wait()
+                continue
+            # Окно отсчитывается от самого старого запроса: он не ждёт дольше window_ms
+            deadline = self._pending[0].enqueued_at + window_sec
+            while self._pending_texts < self.max_batch_size:
+                delay = deadline - time.monotonic()
+                if delay <= 0:
+                    break
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), delay)
+                except asyncio.TimeoutError:
+                    break
+            # Батч формируется, когда есть свободный слот: пришедшие за время ожидания тоже в него попадут
+            await self._slots.acquire()
+            batch = self._take()
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    def _take(self) -> List[_Request]:
+        batch: List[_Request] = []
+        size = 0
+        while self._pending:
+            request = self._pending[0]
+            if request.future.done():  # вызывающий отменил ожидание
+                self._pending.pop(0)
+                self._pending_texts -= len(request.texts)
+                continue
+            if batch and size + len(request.texts) > self.max_batch_size:
+                break
+            self._pending.pop(0)
+            self._pending_texts -= len(request.texts)
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    async def _run(self, batch: List[_Request]) -> None:
+        try:
+            texts = [text for request in batch for text in request.texts]
+            started_at = time.monotonic()
+            for request in batch:
+                wait_ms = (started_at - request.enqueued_at) * 1000
+                self.queue_wait.record(wait_ms)
+                metrics.latency_registry.record("embed_queue_wait", wait_ms)
+            self.batch_sizes[len(texts)] += 1
+            try:
+                vectors = await self._embed_fn(texts)
+            except asyncio.CancelledError:
+                for request in batch:
+                    request.future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Batched embed of {len(texts)} texts failed: {e}")
+                if len(batch) == 1:
+                    if not batch[0].future.done():
+                        batch[0].future.set_exception(e)
+                    return
+                await self._run_one_by_one(batch)
+                return
+            inference_ms = (time.monotonic() - started_at) * 1000
+            self.inference.record(inference_ms)
+            metrics.latency_registry.record("embed_batch_inference", inference_ms)
+            offset = 0
+            for request in batch:
+                rows = vectors[offset:offset + len(request.texts)]
+                offset += len(request.texts)
+                if not request.future.done():
+                    request.future.set_result(rows)
+        finally:
+            self._slots.release()
+
+    async def _run_one_by_one(self, batch: List[_Request]) -> None:
+        # Одна плохая фраза не должна ронять чужие запросы: каждый пробуем отдельно
+        for request in batch:
+            if request.future.done():
+                continue
+            try:
+                rows = await self._embed_fn(request.texts)
+            except asyncio.CancelledError:
+                for pending in batch:
+                    pending.future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Embed of {len(request.texts)} texts failed on retry: {e}")
+                if not request.future.done():
+                    request.future.set_exception(e)
+                continue
+            self.batch_sizes[len(request.texts)] += 1
+            if not request.future.done():
+                request.future.set_result(rows)
+
+    def stats(self) -> Dict[str, object]:
+        batches = sum(self.batch_sizes.values())
+        sizes = sorted(self.batch_sizes.elements())
+        return {
+            "requests": self.requests,
+            "batches": batches,
+            "batch_size": {
+                "mean": round(len(sizes) and sum(sizes) / len(sizes), 2),
+                "p50": sizes[len(sizes) // 2] if sizes else 0,
+                "p95": sizes[min(len(sizes) - 1, int(len(sizes) * 0.95))] if sizes else 0,
+                "max": sizes[-1] if sizes else 0,
+                "histogram": dict(sorted(self.batch_sizes.items())),
+            },
+            "queue_wait": self.queue_wait.snapshot(),
+            "inference": self.inference.snapshot(),
+        }
+
+    async def close(self) -> None:
+        """Останавливает диспетчер; ожидающие вызовы получают отмену."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+        for request in self._pending:
+            request.future.cancel()
+        self._pending.clear()
+        self._pending_texts = 0
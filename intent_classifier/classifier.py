@@ -1,6 +1,5 @@
 from __future__ import annotations
-from typing import List, Optional, Dict, Any, Tuple, Union
-import numpy as np
+from typing import Optional, Dict, Any, Sequence, Union
 import logging
 import time
 import re
@@ -10,6 +9,7 @@ from intent_classifier.model_manager import ModelManager
 from intent_classifier.repository import IntentRepository
 from intent_classifier.entity_extractors import SimpleNumericExtractor, BooleanExtractor
 from domain.models import IntentResult, FaqResult
+from infra import metrics
 
 logger = logging.getLogger("intent.classifier")
 
@@ -69,7 +69,7 @@ class IntentClassifier:
     async def classify_intent(
         self,
         text: str,
-        expected_intents: List[str],
+        expected_intents: Sequence[str],
         previous_leader: Optional[str] = None
     ) -> Optional[IntentResult]:
         t_start = time.monotonic()
@@ -121,27 +121,20 @@ class IntentClassifier:
         user_embedding = await ModelManager.get_instance().embed([text])
         user_embedding = user_embedding[0]
 
-        candidate_vectors = self.repo.get_intent_vectors(expected_intents)
-        if not candidate_vectors:
+        # Одно умножение матрицы центроидов стейта на вектор и выбор двух лучших (repository.py)
+        top = self.repo.top_intents(user_embedding, expected_intents)
+        if top is None:
             return None
 
-        scores = {intent_id: np.dot(user_embedding, centroid) for intent_id, centroid in candidate_vectors.items()}
-        
-        sorted_scores = sorted(scores.items(), key=lambda item: item[1], reverse=True)
-        
-        if not sorted_scores:
-            return None
-
-        leader_intent, leader_score = sorted_scores[0]
+        leader_intent, leader_score = top.leader, top.leader_score
         print(f"[DEBUG] Текст: '{text}' -> Лидер: '{leader_intent}' (Score: {leader_score:.4f})")
 
         # Confirmation Gates
         if leader_score < self.config["thresholds"]["confidence"]:
             return None
 
-        if len(sorted_scores) > 1:
-            second_score = sorted_scores[1][1]
-            second_intent, _ = sorted_scores[1]
+        if top.second is not None:
+            second_intent, second_score = top.second, top.second_score
             print(f"[DEBUG] ...Второй: '{second_intent}' (Score: {second_score:.4f}), Разрыв: {(leader_score - second_score):.4f}")
             if (leader_score - second_score) < self.config["thresholds"]["gap"]:
                 return None
@@ -169,7 +162,8 @@ class IntentClassifier:
                         return None
         
         t_end = time.monotonic()
-        logger.info(f"classify_intent finished in {(t_end - t_start) * 1000:.2f}ms. Leader: {leader_intent}")
+        metrics.latency_registry.record("intent_classify", (t_end - t_start) * 1000)
+        logger.info(f"classify_intent finished in {(t_end - t_start) * 1000:.2f}ms. Leader: {leader_intent} trace_id={metrics.current_trace_id()}")
         print(f"leader_intent: {leader_intent}, score: {leader_score}")
         return IntentResult(
             intent_id=leader_intent,
@@ -186,16 +180,11 @@ class IntentClassifier:
         user_embedding = await ModelManager.get_instance().embed([text])
         user_embedding = user_embedding[0]
         
-        faq_vectors = self.repo.get_all_faq_vectors()
-        if not faq_vectors:
-            return None
-            
-        scores = {qid: np.dot(user_embedding, vec) for qid, vec in faq_vectors.items()}
-        
-        if not scores:
+        best = self.repo.best_faq(user_embedding)
+        if best is None:
             return None
             
-        best_qid, best_score = max(scores.items(), key=lambda item: item[1])
+        best_qid, best_score = best
         
         if best_score < self.config.get("faq", {}).get("confidence", 0.7):
             return None
@@ -0,0 +1,250 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, List, Set
+
+import numpy as np
+
+from domain.interfaces.cache import CacheNamespace
+
+logger = logging.getLogger("intent.embedding_cache")
+
+EmbedFn = Callable[[List[str]], Awaitable[np.ndarray]]
+
+KEY_PREFIX = CacheNamespace.EMBEDDING.prefix
+_EDGE_PUNCTUATION = ".,!?;:…\"'«»()-— "
+_SMALL_FILE_BYTES = 4 * 1024 * 1024
+
+
+def normalize_utterance(text: str) -> str:
+    """Регистр, лишние пробелы и знаки по краям не меняют смысла: «Да.» и «да» — один ключ."""
+    text = " ".join(unicodedata.normalize("NFC", text).lower().split())
+    return text.strip(_EDGE_PUNCTUATION) or text
+
+
+def model_fingerprint(model_path: str) -> str:
+    """
+    Отпечаток модели для ключей кэша: другая модель или токенизатор — другие ключи.
+    Мелкие файлы (конфиг, словарь) хэшируются целиком, веса — по размеру и первому мегабайту;
+    время изменения не учитывается, чтобы узлы с одной моделью делили записи в Redis.
+    """
+    digest = hashlib.sha256()
+    for root, _, files in sorted(os.walk(model_path)):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            size = os.path.getsize(path)
+            digest.update(f"{os.path.relpath(path, model_path)}|{size}|".encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(f.read() if size <= _SMALL_FILE_BYTES else f.read(1024 * 1024))
+    return digest.hexdigest()[:16]
+
+
+@dataclass
+class EmbeddingCacheStats:
+    calls: int = 0
+    calls_inferred: int = 0     # вызовы, которым пришлось запускать модель самим
+    l1_hits: int = 0
+    redis_hits: int = 0
+    shared: int = 0             # текст уже считался для другого вызова — дождались его
+    inferred: int = 0           # тексты, ушедшие в модель
+    inference_calls: int = 0
+    inference_ms: float = 0.0
+    evictions: int = 0
+    redis_errors: int = 0
+    entries: int = 0
+    max_entries: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        hits = self.l1_hits + self.redis_hits + self.shared
+        total = hits + self.inferred
+        return hits / total if total else 0.0
+
+    @property
+    def saved_inference_ms(self) -> float:
+        # Оценка: каждое попадание сэкономило бы один вызов модели средней стоимости
+        if not self.inference_calls:
+            return 0.0
+        return (self.l1_hits + self.redis_hits + self.shared) * self.inference_ms / self.inference_calls
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            **asdict(self),
+            "inference_ms": round(self.inference_ms, 2),
+            "hit_ratio": round(self.hit_ratio, 4),
+            "onnx_skip_ratio": round(1 - self.calls_inferred / self.calls, 4) if self.calls else 0.0,
+            "saved_inference_ms": round(self.saved_inference_ms, 2),
+        }
+
+
+class EmbeddingCache:
+    """
+    Двухуровневый кэш эмбеддингов фраз перед моделью.
+
+    Ключ — нормализованный текст (`normalize_utterance`) и отпечаток модели. Первый уровень —
+    LRU в памяти процесса на `max_entries` векторов, второй (если передан `redis_client`) —
+    общий для узлов Redis: векторы хранятся во float16 с TTL. Промахи одного вызова уходят
+    в модель одним батчем; одновременные запросы одного текста (partial и final, классификатор
+    и FAQ) ждут один инференс. Модель считает вектор для нормализованного текста, поэтому
+    результат не зависит от того, какой вариант фразы пришёл первым.
+
+    Вызывающий получает новый массив (np.stack), векторы внутри кэша не меняются.
+    """
+
+    def __init__(
+        self,
+        embed_fn: EmbedFn,
+        fingerprint: str,
+        max_entries: int = 8192,
+        redis_client=None,
+        ttl_sec: int = 7 * 24 * 3600,
+    ) -> None:
+        self._embed_fn = embed_fn
+        self.fingerprint = fingerprint
+        self.max_entries = max(1, max_entries)
+        self.redis_client = redis_client
+        self.ttl_sec = ttl_sec
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats = EmbeddingCacheStats(max_entries=self.max_entries)
+
+    def redis_key(self, text: str) -> str:
+        return f"{KEY_PREFIX}{self.fingerprint}:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]}"
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return await self._embed_fn(texts)
+        self._stats.calls += 1
+        keys = [normalize_utterance(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        waits: Dict[str, asyncio.Future] = {}
+        misses: List[str] = []
+        for key in dict.fromkeys(keys):
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self._stats.l1_hits += 1
+                found[key] = vector
+            elif key in self._inflight:
+                self._stats.shared += 1
+                waits[key] = self._inflight[key]
+            else:
+                misses.append(key)
+
+        if misses:
+            # Фьючерсы регистрируются до первого await: следующий вызов с тем же текстом их увидит
+            loop = asyncio.get_running_loop()
+            for key in misses:
+                self._inflight[key] = loop.create_future()
+            waits.update((key, self._inflight[key]) for key in misses)
+            # Отдельная задача: отмена этого вызова не обрывает инференс для тех, кто ждёт тот же текст
+            self._spawn(self._fill(misses))
+
+        own = set(misses)
+        inferred = False
+        for key, future in waits.items():
+            found[key], source = await asyncio.shield(future)
+            inferred = inferred or (source == "model" and key in own)
+        if inferred:
+            self._stats.calls_inferred += 1
+        return np.stack([found[key] for key in keys])
+
+    async def _fill(self, keys: List[str]) -> None:
+        try:
+            cached = await self._redis_get(keys)
+            for key, vector in cached.items():
+                self._stats.redis_hits += 1
+                self._resolve(key, vector, "redis")
+            rest = [key for key in keys if key not in cached]
+            if not rest:
+                return
+            t_start = time.perf_counter()
+            vectors = await self._embed_fn(rest)
+            self._stats.inference_ms += (time.perf_counter() - t_start) * 1000
+            self._stats.inference_calls += 1
+            self._stats.inferred += len(rest)
+            computed = {}
+            for key, row in zip(rest, vectors):
+                vector = np.array(row, dtype=np.float32)
+                vector.setflags(write=False)
+                computed[key] = vector
+                self._resolve(key, vector, "model")
+            await self._redis_set(computed)
+        except BaseException as e:
+            for key in keys:
+                future = self._inflight.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e if isinstance(e, Exception) else RuntimeError("embedding cancelled"))
+                    future.exception()  # ожидающие перебросят её сами; помечаем как полученную
+            if not isinstance(e, Exception):
+                raise
+
+    def _resolve(self, key: str, vector: np.ndarray, source: str) -> None:
+        self._put(key, vector)
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result((vector, source))
+
+    def _put(self, key: str, vector: np.ndarray) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats.evictions += 1
+
+    async def _redis_get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if self.redis_client is None:
+            return {}
+        try:
+            raw = await self.redis_client.mget([self.redis_key(key) for key in keys])
+        except Exception as e:
+            self._stats.redis_errors += 1
+            logger.warning(f"Embedding cache Redis read failed: {e}")
+            return {}
+        found = {}
+        for key, blob in zip(keys, raw):
+            if not blob or len(blob) % 2:
+                continue
+            vector = np.frombuffer(blob, dtype="<f2").astype(np.float32)
+            norm = np.linalg.norm(vector)
+            if norm == 0:
+                continue
+            vector /= norm  # float16 слегка сдвигает норму; модель отдаёт L2-нормализованные векторы
+            vector.setflags(write=False)
+            found[key] = vector
+        return found
+
+    async def _redis_set(self, vectors: Dict[str, np.ndarray]) -> None:
+        if self.redis_client is None or not vectors:
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, vector in vectors.items():
+                    pipe.set(self.redis_key(key), vector.astype("<f2").tobytes(), ex=self.ttl_sec)
+                await pipe.execute()
+        except Exception as e:
+            self._stats.redis_errors += 1
+            logger.warning(f"Embedding cache Redis write failed: {e}")
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> EmbeddingCacheStats:
+        return EmbeddingCacheStats(**{**asdict(self._stats), "entries": len(self._entries)})
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def close(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info(f"Embedding cache closed: {self.stats().as_dict()}")
@@ -3,9 +3,11 @@ import asyncio
 import logging
 import time
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Dict, Optional, List
 import numpy as np
 
+from intent_classifier.batcher import EmbeddingBatcher
+from intent_classifier.embedding_cache import EmbeddingCache, model_fingerprint
 from intent_classifier.model_wrapper import OnnxModelWrapper
 
 logger = logging.getLogger("intent.model_manager")
@@ -15,6 +17,12 @@ class ModelManagerConfig:
     warmup_interval_sec: float = 10.0  # Интервал между прогревами
     warmup_text: str = "прогрев"  # Текст для прогрева
     max_idle_time_sec: float = 30.0  # Максимальное время простоя
+    batching: bool = True  # Объединять одновременные embed() разных звонков в один инференс
+    batch_window_ms: float = 2.0  # Сколько ждать попутчиков от первого запроса в батче
+    max_batch_size: int = 32  # Тексты в батче; полный батч уходит сразу
+    max_concurrent_batches: int = 1  # ONNX и так занимает все ядра своими потоками
+    embedding_cache_size: int = 8192  # Векторов в LRU процесса; 0 — без кэша
+    embedding_cache_ttl_sec: int = 7 * 24 * 3600  # TTL векторов в Redis (если подключён attach_redis)
 
 class ModelManager:
     _instance: Optional[ModelManager] = None
@@ -26,6 +34,8 @@ class ModelManager:
         self._warmup_task: Optional[asyncio.Task] = None
         self._last_used = 0.0
         self._config: Optional[ModelManagerConfig] = None
+        self._batcher: Optional[EmbeddingBatcher] = None
+        self._cache: Optional[EmbeddingCache] = None
 
     @classmethod
     def get_instance(cls) -> ModelManager:
@@ -41,6 +51,20 @@ class ModelManager:
             return
         instance._model = OnnxModelWrapper(model_path, device)
         instance._config = config or ModelManagerConfig()
+        if instance._config.batching:
+            instance._batcher = EmbeddingBatcher(
+                instance._model.embed,
+                window_ms=instance._config.batch_window_ms,
+                max_batch_size=instance._config.max_batch_size,
+                max_concurrent_batches=instance._config.max_concurrent_batches,
+            )
+        if instance._config.embedding_cache_size > 0:
+            instance._cache = EmbeddingCache(
+                instance._embed_uncached,
+                model_fingerprint(model_path),
+                max_entries=instance._config.embedding_cache_size,
+                ttl_sec=instance._config.embedding_cache_ttl_sec,
+            )
         instance._is_running = True
         instance._warmup_task = asyncio.create_task(instance._warmup_loop())
         logger.info("ModelManager initialized")
@@ -51,8 +75,28 @@ class ModelManager:
             raise RuntimeError("ModelManager not initialized")
         
         self._last_used = time.monotonic()
+        if self._cache is not None:
+            return await self._cache.embed(texts)
+        return await self._embed_uncached(texts)
+
+    async def _embed_uncached(self, texts: List[str]) -> np.ndarray:
+        if self._batcher is not None:
+            return await self._batcher.embed(texts)
         return await self._model.embed(texts)
 
+    def attach_redis(self, redis_client) -> None:
+        """Включает общий для узлов уровень кэша эмбеддингов в Redis."""
+        if self._cache is not None:
+            self._cache.redis_client = redis_client
+
+    def batch_stats(self) -> Optional[Dict[str, object]]:
+        """Гистограммы размера батча и ожидания в очереди; None, если батчинг выключен."""
+        return self._batcher.stats() if self._batcher is not None else None
+
+    def cache_stats(self) -> Optional[Dict[str, object]]:
+        """Попадания по уровням, доля вызовов без инференса и сэкономленное время; None без кэша."""
+        return self._cache.stats().as_dict() if self._cache is not None else None
+
     async def _warmup_loop(self) -> None:
         """Периодически прогревает модель, если она не использовалась"""
         while self._is_running:
@@ -90,4 +134,11 @@ class ModelManager:
                 await instance._warmup_task
             except asyncio.CancelledError:
                 pass
+        if instance._cache is not None:
+            await instance._cache.close()
+            instance._cache = None
+        if instance._batcher is not None:
+            await instance._batcher.close()
+            logger.info(f"Embedding batcher stats: {instance._batcher.stats()}")
+            instance._batcher = None
         logger.info("ModelManager closed") 
\ No newline at end of file
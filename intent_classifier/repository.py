@@ -1,10 +1,38 @@
 from __future__ import annotations
-from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Any, Sequence, Tuple
 from pathlib import Path
 import pickle
 import numpy as np
 from intent_classifier.model_wrapper import OnnxModelWrapper
 
+_MAX_VIEWS = 4096  # наборы интентов не из карты (ручные вызовы) кэшируются до этого предела
+
+
+@dataclass(slots=True)
+class CentroidView:
+    """Центроиды одного набора интентов (обычно expected_intents стейта) подряд в памяти."""
+    intent_ids: Tuple[str, ...]
+    rows: np.ndarray     # индексы строк в общей матрице центроидов, int32
+    matrix: np.ndarray   # (k, D) float32, C-contiguous
+    scores: np.ndarray   # (k,) float32, буфер скоров, переиспользуется между ходами
+
+
+@dataclass(slots=True, frozen=True)
+class TopIntents:
+    leader: str
+    leader_score: float
+    second: Optional[str]
+    second_score: float
+
+
+def _stack(vectors: Dict[str, np.ndarray]) -> Tuple[Tuple[str, ...], np.ndarray]:
+    ids = tuple(vectors)
+    if not ids:
+        return ids, np.zeros((0, 0), dtype=np.float32)
+    return ids, np.ascontiguousarray(np.stack([np.asarray(vectors[k], dtype=np.float32) for k in ids]))
+
+
 class IntentRepository:
     """
     Держит в памяти:
@@ -13,6 +41,10 @@ class IntentRepository:
       - centroids: Dict[intent_id, np.ndarray] # усреднённый вектор интента (D,)
       - faq: Dict[question_id, dict] (опц.)
       - faq_vectors: Dict[question_id, np.ndarray] (опц.)
+
+    Для скоринга центроиды сложены в одну матрицу `centroid_matrix` [N, D] с индексом
+    `intent_index`, а для каждого набора expected_intents заранее собран `CentroidView`:
+    скоринг хода — одно умножение матрицы на вектор в готовый буфер и выбор двух лучших.
     """
     def __init__(self) -> None:
         self.intents: Dict[str, dict] = {}
@@ -20,6 +52,13 @@ class IntentRepository:
         self.centroids: Dict[str, np.ndarray] = {}
         self.faq: Dict[str, dict] = {}
         self.faq_vectors: Dict[str, np.ndarray] = {}
+        self.intent_ids: Tuple[str, ...] = ()
+        self.intent_index: Dict[str, int] = {}
+        self.centroid_matrix = np.zeros((0, 0), dtype=np.float32)
+        self.faq_ids: Tuple[str, ...] = ()
+        self.faq_matrix = np.zeros((0, 0), dtype=np.float32)
+        self._faq_scores = np.zeros(0, dtype=np.float32)
+        self._views: Dict[Tuple[str, ...], Optional[CentroidView]] = {}
 
     def load_from_backup(self, filepath: str) -> None:
         with open(filepath, "rb") as f:
@@ -29,6 +68,79 @@ class IntentRepository:
             self.centroids = backup.get("centroids", {})
             self.faq = backup.get("faq", {})
             self.faq_vectors = backup.get("faq_vectors", {})
+        self.build_index()
+
+    def build_index(self) -> None:
+        """Пересобирает матрицы центроидов и FAQ из словарей; готовые наборы сбрасываются."""
+        self.intent_ids, self.centroid_matrix = _stack(self.centroids)
+        self.intent_index = {intent_id: i for i, intent_id in enumerate(self.intent_ids)}
+        self.faq_ids, self.faq_matrix = _stack(self.faq_vectors)
+        self._faq_scores = np.empty(len(self.faq_ids), dtype=np.float32)
+        self._views.clear()
+
+    def precompute_views(self, intent_sets: Iterable[Sequence[str]]) -> int:
+        """Собирает наборы заранее (expected_intents всех стейтов карты), чтобы на ходу их не строить."""
+        for intent_ids in intent_sets:
+            self.view(intent_ids)
+        return len(self._views)
+
+    def view(self, intent_ids: Sequence[str]) -> Optional[CentroidView]:
+        """Набор центроидов для интентов; неизвестные интенты пропускаются, None — если не осталось ни одного."""
+        key = intent_ids if isinstance(intent_ids, tuple) else tuple(intent_ids)
+        try:
+            return self._views[key]
+        except KeyError:
+            pass
+        ids = tuple(dict.fromkeys(k for k in key if k in self.intent_index))
+        view = None
+        if ids:
+            rows = np.fromiter((self.intent_index[k] for k in ids), dtype=np.int32, count=len(ids))
+            # Набор из всех интентов по порядку — сама общая матрица, без копии
+            matrix = self.centroid_matrix if ids == self.intent_ids else self.centroid_matrix[rows]
+            view = CentroidView(ids, rows, matrix, np.empty(len(ids), dtype=np.float32))
+        if len(self._views) < _MAX_VIEWS:
+            self._views[key] = view
+        return view
+
+    def top_intents(self, query: np.ndarray, intent_ids: Sequence[str]) -> Optional[TopIntents]:
+        """Лидер и второй по скалярному произведению с центроидами; при равенстве выигрывает первый в наборе."""
+        view = self.view(intent_ids)
+        if view is None:
+            return None
+        scores = np.dot(view.matrix, np.asarray(query, dtype=np.float32), out=view.scores)
+        first = int(scores.argmax())
+        leader_score = float(scores[first])
+        if len(scores) == 1:
+            return TopIntents(view.intent_ids[first], leader_score, None, 0.0)
+        scores[first] = -np.inf
+        second = int(scores.argmax())
+        return TopIntents(view.intent_ids[first], leader_score, view.intent_ids[second], float(scores[second]))
+
+    def top_intents_batch(self, queries: np.ndarray, intent_ids: Sequence[str]) -> List[Optional[TopIntents]]:
+        """То же для пачки векторов [B, D] одним умножением матриц."""
+        view = self.view(intent_ids)
+        if view is None:
+            return [None] * len(queries)
+        scores = np.asarray(queries, dtype=np.float32) @ view.matrix.T
+        batch = np.arange(len(scores))
+        first = scores.argmax(axis=1)
+        leader_scores = scores[batch, first]
+        if scores.shape[1] == 1:
+            return [TopIntents(view.intent_ids[i], float(s), None, 0.0) for i, s in zip(first, leader_scores)]
+        scores[batch, first] = -np.inf
+        second = scores.argmax(axis=1)
+        second_scores = scores[batch, second]
+        return [
+            TopIntents(view.intent_ids[i], float(s1), view.intent_ids[j], float(s2))
+            for i, s1, j, s2 in zip(first, leader_scores, second, second_scores)
+        ]
+
+    def best_faq(self, query: np.ndarray) -> Optional[Tuple[str, float]]:
+        if not self.faq_ids:
+            return None
+        scores = np.dot(self.faq_matrix, np.asarray(query, dtype=np.float32), out=self._faq_scores)
+        best = int(scores.argmax())
+        return self.faq_ids[best], float(scores[best])
 
     async def prepare_and_save_backup(self, dialogue_map: dict, intents: dict, model: "OnnxModelWrapper", filepath: str) -> None:
         all_phrases_map = {}
@@ -172,6 +172,7 @@ async def main():
 
     # --- Генерация отчета ---
     generate_report(all_results, output_dir)
+    jlog("embedding_cache", **(ModelManager.get_instance().cache_stats() or {}))
     
     await ModelManager.close()
 
@@ -4,13 +4,14 @@ import logging
 import json
 import time
 import hashlib
-from typing import AsyncGenerator, Set
+from typing import AsyncGenerator, Optional, Set
 
 import yaml
 
 from domain.interfaces.llm import AbstractConversationManager
 from domain.interfaces.cache import AbstractCache
 from domain.models import LLMStreamChunk, ConversationMessage
+from infra import metrics
 from llm.connection import LLMConnectionManagerImpl
 from llm.client import OpenAILLMClient, LLMStructuredResponse
 from llm.context import LLMContext
@@ -23,13 +24,22 @@ def jlog(data: dict):
     logger.info(json.dumps(data))
 
 class ConversationManager(AbstractConversationManager):
-    def __init__(self, config: dict, prompts: dict, cache: AbstractCache, session_id: str):
+    def __init__(
+        self,
+        config: dict,
+        prompts: dict,
+        cache: AbstractCache,
+        session_id: str,
+        connection_manager: Optional[LLMConnectionManagerImpl] = None
+    ):
         self._config = config['llm']
         self._prompts = prompts
         self._cache = cache
         self._session_id_hash = hashlib.sha256(session_id.encode()).hexdigest()
         
-        self.connection_manager = LLMConnectionManagerImpl(
+        # A host serving many calls passes one shared HTTP client; it owns its lifecycle then
+        self._owns_connection_manager = connection_manager is None
+        self.connection_manager = connection_manager or LLMConnectionManagerImpl(
             api_key=self._config['api_key'],
             timeout=self._config['http_timeout_sec'],
             keep_alive_interval=self._config['keep_alive_interval_sec']
@@ -49,6 +59,7 @@ class ConversationManager(AbstractConversationManager):
         )
         
         self._background_tasks: Set[asyncio.Task] = set()
+        self._active_streams: Set[AsyncGenerator] = set()
         self._is_initialized = False
 
     async def initialize(self):
@@ -66,7 +77,25 @@ class ConversationManager(AbstractConversationManager):
             LLMStructuredResponse,
             low_latency_mode=low_latency
         )
-        return stream.__aiter__()
+        iterator = stream.__aiter__()
+        self._active_streams.add(iterator)
+        return iterator
+
+    async def _close_stream(self, iterator) -> None:
+        self._active_streams.discard(iterator)
+        try:
+            await iterator.aclose()
+        except RuntimeError:
+            # Генератор сейчас исполняется в задаче-потребителе; он закроется, когда её отменят
+            pass
+
+    async def abort_generation(self) -> None:
+        """Закрывает SSE-стримы текущего хода (основная и черновая модели), чтобы не оплачивать лишние токены."""
+        streams = list(self._active_streams)
+        for iterator in streams:
+            await self._close_stream(iterator)
+        if streams:
+            jlog({"event": "generation_aborted", "streams": len(streams)})
 
     async def process_user_turn(
         self,
@@ -77,7 +106,7 @@ class ConversationManager(AbstractConversationManager):
             raise RuntimeError("ConversationManager must be initialized before processing a turn.")
 
         t_start_turn = time.monotonic()
-        jlog({"event": "user_turn_start", "session_hash": self._session_id_hash})
+        jlog({"event": "user_turn_start", "session_hash": self._session_id_hash, "trace_id": metrics.current_trace_id()})
         
         user_message: ConversationMessage = {"role": "user", "content": final_user_text}
         usage_ratio = self.dual_ctx.on_user_message(user_message)
@@ -112,6 +141,7 @@ class ConversationManager(AbstractConversationManager):
                     
                     if t_first_chunk is None:
                         t_first_chunk = time.monotonic()
+                        metrics.mark("llm_first_token", t_first_chunk)
                         first_chunk_metrics = {
                             "network_latency_ms": draft_chunk.network_latency_ms,
                             "inference_ttft_ms": draft_chunk.inference_ttft_ms
@@ -140,6 +170,7 @@ class ConversationManager(AbstractConversationManager):
 
                     if t_first_chunk is None:
                         t_first_chunk = time.monotonic()
+                        metrics.mark("llm_first_token", t_first_chunk)
                         first_chunk_metrics = {
                             "network_latency_ms": main_chunk.network_latency_ms,
                             "inference_ttft_ms": main_chunk.inference_ttft_ms
@@ -173,6 +204,10 @@ class ConversationManager(AbstractConversationManager):
 
         except Exception as e:
             jlog({"event": "speculative_generation_error", "error": str(e)})
+        finally:
+            # При отмене хода (barge-in) закрываем оба HTTP-стрима, а не ждём GC
+            await self._close_stream(draft_iterator)
+            await self._close_stream(main_iterator)
 
         # Finalize
         assistant_message: ConversationMessage = {"role": "assistant", "content": full_response}
@@ -194,7 +229,7 @@ class ConversationManager(AbstractConversationManager):
             return
 
         # Check cache for summary
-        summary = await self._cache.get(self._session_id_hash)
+        summary = await self._cache.summary.get(self._session_id_hash)
         
         if not summary:
             summary_prompt = self.dual_ctx.active_context.build_summary_prompt(history_to_summarize)
@@ -206,7 +241,7 @@ class ConversationManager(AbstractConversationManager):
             
             summary_parts = [chunk.answer async for chunk in summary_stream]
             summary = "".join(summary_parts)
-            await self._cache.set(self._session_id_hash, summary, ttl=3600)
+            await self._cache.summary.set(self._session_id_hash, summary, ttl_seconds=3600)
 
         new_context = LLMContext(
             prompt_config=self._prompts,
@@ -218,19 +253,16 @@ class ConversationManager(AbstractConversationManager):
 
 
     async def shutdown(self):
+        await self.abort_generation()
         for task in self._background_tasks:
             task.cancel()
         await asyncio.gather(*self._background_tasks, return_exceptions=True)
-        await self.connection_manager.shutdown()
+        if self._owns_connection_manager:
+            await self.connection_manager.shutdown()
         jlog({"event": "manager_shutdown"})
 
 if __name__ == "__main__":
-    class MockCache(AbstractCache):
-        _data = {}
-        async def get(self, key: str): return self._data.get(key)
-        async def set(self, key: str, value: str, ttl: int): self._data[key] = value
-        async def delete(self, key: str): self._data.pop(key, None)
-        async def disconnect(self): pass
+    from cache.memory import InMemoryCache
 
     async def main():
         with open("configs/config.yml", 'r') as f:
@@ -238,7 +270,7 @@ if __name__ == "__main__":
         with open("configs/prompts.yml", 'r') as f:
             prompts = yaml.safe_load(f)
             
-        cache = MockCache()
+        cache = InMemoryCache()
         manager = ConversationManager(config, prompts, cache, "test-session")
         
         text = "Tell me a short story."
@@ -8,9 +8,8 @@ import statistics
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
-from typing import List, Optional
 from llm.manager import ConversationManager
-from domain.interfaces.cache import AbstractCache
+from cache.memory import InMemoryCache
 import copy
 
 # Configure logging
@@ -21,21 +20,6 @@ logger = logging.getLogger("llm.probe")
 def jlog(data: dict):
     logger.info(json.dumps(data))
 
-class MockCache(AbstractCache):
-    _data = {}
-    async def get(self, key: str): return self._data.get(key)
-    async def set(self, key: str, value: str, ttl: int): self._data[key] = value
-    async def delete(self, key: str): self._data.pop(key, None)
-    async def connect(self) -> None: return None 
-    async def disconnect(self): pass
-    async def load_and_set_audio(self, key: str, wav_filepath: str, chunk_size_ms: int = 20) -> bool: return True
-    async def set_audio_chunks(self, key: str, audio_chunks: List[bytes]) -> bool: return True
-    async def get_audio_chunks(self, key: str) -> Optional[List[bytes]]: return None
-    async def set_text(self, key: str, text: str, ttl_seconds: int) -> bool: return True
-    async def get_text(self, key: str) -> Optional[str]: return None
-    async def close(self) -> None: return None
-
-
 def generate_report(metrics: list[dict], report_dir: Path, model: str, text: str):
     timestamp = datetime.now().strftime("%Y-%m-%d-%H%M%S")
     report_path = report_dir / f"llm_probe_{timestamp}.md"
@@ -205,7 +189,7 @@ async def main():
         debug_config['llm']['api_key'] = masked_key
     jlog({"event": "config_loaded", "config": debug_config})
 
-    cache = MockCache()
+    cache = InMemoryCache()
     
     all_metrics = []
     try:
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Deque, Dict, List, Optional
+
+from infra import metrics
+
+logger = logging.getLogger("orchestrator.fillers")
+
+
+def jlog(event: str, **fields):
+    logger.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+
+@dataclass
+class FillerReport:
+    """Итог маскировки одного ответа."""
+    deadline_ms: float
+    answer_wait_ms: Optional[float] = None     # от начала хода до готовности первого аудио ответа
+    fillers: List[str] = field(default_factory=list)
+    filler_frames: int = 0
+    masked_silence_ms: float = 0.0             # сколько ожидания закрыто филлером
+    unmasked_silence_ms: Optional[float] = None
+    handoff_gap_ms: Optional[float] = None     # от готовности ответа до конца последнего фрейма филлера
+    cancelled: bool = False
+
+    @property
+    def skipped(self) -> bool:
+        return not self.fillers
+
+
+class FillerScheduler:
+    """
+    Маскирует задержку LLM/TTS нейтральными филлерами из кэша.
+
+    Если первое аудио ответа не готово к `deadline_ms` от начала хода, играет
+    филлер пофреймово в темпе реального времени и после каждого фрейма проверяет
+    готовность ответа (asyncio.wait FIRST_COMPLETED), так что ответ идёт
+    на границе фрейма, без наложения. Если филлер закончился раньше ответа —
+    играет следующий, не повторяя только что звучавший, но не больше `max_fillers` подряд.
+    """
+
+    def __init__(
+        self,
+        cache,
+        filler_keys: List[str],
+        deadline_ms: float = 600.0,
+        frame_bytes: int = 320,
+        bytes_per_ms: int = 16,  # PCM 8 кГц, 16 бит, моно
+        max_fillers: int = 3,
+        rng: Optional[random.Random] = None,
+    ):
+        self.cache = cache
+        self.filler_keys = list(filler_keys)
+        self.deadline_ms = deadline_ms
+        self.frame_bytes = frame_bytes
+        self.frame_sec = frame_bytes / bytes_per_ms / 1000
+        self.max_fillers = max_fillers
+        self._rng = rng or random.Random()
+        # Последние сыгранные ключи: следующий выбирается среди остальных, пока не пройдём весь набор
+        self._recent: Deque[str] = deque(maxlen=max(0, len(self.filler_keys) - 1))
+        self._frames_by_key: Dict[str, List[bytes]] = {}
+
+    def _pick(self) -> Optional[str]:
+        candidates = [k for k in self.filler_keys if k not in self._recent] or self.filler_keys
+        if not candidates:
+            return None
+        key = self._rng.choice(candidates)
+        if self._recent.maxlen:
+            self._recent.append(key)
+        return key
+
+    async def _frames(self, key: str) -> List[bytes]:
+        if key not in self._frames_by_key:
+            # Все ещё не загруженные филлеры одним запросом: следующий понадобится уже во время игры этого
+            names = [k for k in self.filler_keys if k not in self._frames_by_key] or [key]
+            for name, audio in (await self.cache.audio.get_many(names)).items():
+                self._frames_by_key[name] = self._split(audio)
+        return self._frames_by_key.get(key, [])
+
+    def _split(self, audio) -> List[bytes]:
+        if audio is None:
+            return []
+        if audio.frame_bytes == self.frame_bytes:
+            return audio.frames()
+        # Только целые фреймы: хвост короче фрейма дал бы щелчок на стыке с ответом
+        data = audio.data
+        usable = len(data) - len(data) % self.frame_bytes
+        return [data[i:i + self.frame_bytes] for i in range(0, usable, self.frame_bytes)]
+
+    async def play_until_ready(self, first_audio: Awaitable[Any], outbound_stream, started_at: Optional[float] = None) -> Any:
+        """
+        Ждёт `first_audio` (первый чанк ответа), при необходимости закрывая паузу филлерами.
+        Возвращает результат `first_audio`; вызывающий пишет его в поток сразу после филлера.
+        """
+        started_at = started_at if started_at is not None else time.monotonic()
+        report = FillerReport(deadline_ms=self.deadline_ms)
+        waiter = asyncio.ensure_future(first_audio)
+        t_filler_start: Optional[float] = None
+        try:
+            timeout = self.deadline_ms / 1000 - (time.monotonic() - started_at)
+            done, _ = await asyncio.wait({waiter}, timeout=max(0.0, timeout))
+            if not done and self.filler_keys:
+                t_filler_start = time.monotonic()
+                await self._play_fillers(waiter, outbound_stream, report)
+            result = await waiter
+            report.answer_wait_ms = round((time.monotonic() - started_at) * 1000, 2)
+            return result
+        except asyncio.CancelledError:
+            report.cancelled = True
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            self._finish(report, started_at, t_filler_start)
+
+    async def _play_fillers(self, waiter: asyncio.Future, outbound_stream, report: FillerReport) -> None:
+        for _ in range(self.max_fillers):
+            key = self._pick()
+            if key is None:
+                return
+            frames = await self._frames(key)
+            if not frames or waiter.done():
+                continue
+            report.fillers.append(key)
+            t_clip_start = time.monotonic()
+            for index, frame in enumerate(frames):
+                if waiter.done():
+                    return
+                if await outbound_stream.write(frame) is False:
+                    return  # ход отменён, запись запрещена
+                report.filler_frames += 1
+                # Следующий фрейм — по расписанию реального времени, но ответ прерывает ожидание сразу
+                next_slot = t_clip_start + (index + 1) * self.frame_sec
+                await asyncio.wait({waiter}, timeout=max(0.0, next_slot - time.monotonic()))
+            if waiter.done():
+                return
+
+    def _finish(self, report: FillerReport, started_at: float, t_filler_start: Optional[float]) -> None:
+        t_end = time.monotonic()
+        wait_ms = (t_end - started_at) * 1000
+        if t_filler_start is not None:
+            filler_audio_ms = report.filler_frames * self.frame_sec * 1000
+            report.masked_silence_ms = round(min(filler_audio_ms, (t_end - t_filler_start) * 1000), 2)
+            report.handoff_gap_ms = round(max(0.0, (t_end - t_filler_start) * 1000 - filler_audio_ms), 2)
+        report.unmasked_silence_ms = round(max(0.0, wait_ms - report.masked_silence_ms), 2)
+        if report.fillers:
+            metrics.latency_registry.record("filler_masked_silence", report.masked_silence_ms)
+        jlog(
+            "filler_turn",
+            trace_id=metrics.current_trace_id(),
+            deadline_ms=report.deadline_ms,
+            answer_wait_ms=report.answer_wait_ms,
+            skipped=report.skipped,
+            fillers=report.fillers,
+            filler_frames=report.filler_frames,
+            masked_silence_ms=report.masked_silence_ms,
+            unmasked_silence_ms=report.unmasked_silence_ms,
+            handoff_gap_ms=report.handoff_gap_ms,
+            cancelled=report.cancelled,
+        )
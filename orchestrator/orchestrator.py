@@ -1,14 +1,31 @@
 import asyncio
-from typing import List, Optional, Dict, Any
+import json
+import logging
+import time
+from contextlib import aclosing
+from typing import Awaitable, Callable, List, Mapping, Optional, Dict, Any, Sequence
 
 from domain.models import SessionState
 from domain.interfaces.cache import AbstractCache
 from domain.interfaces.llm import AbstractConversationManager
 from flow_engine.engine import FlowEngine
+from infra import metrics
+from infra.metrics import CallTracer
 from intent_classifier.classifier import IntentClassifier
+from orchestrator.fillers import FillerScheduler
+from orchestrator.pacer import OutboundPacer
+from orchestrator.playlist import PlaylistPlayer
+from orchestrator.speculation import SpeculativePrefetch
+from orchestrator.turn_scope import TurnScope
 from stt_yandex.stt_yandex import YandexSTTStreamer
 from tts_manager.manager import TTSManager
 
+logger = logging.getLogger("orchestrator")
+
+
+def jlog(event: str, **fields):
+    logger.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
 
 class Orchestrator:
     def __init__(
@@ -23,6 +40,12 @@ class Orchestrator:
         neutral_fillers_keys: List[str],
         non_secure_response: str,
         dialogue_map: Dict[str, Any],
+        prefetch_lookahead: int = 1,
+        prefetch_buffer_chunks: int = 64,
+        speculation_stable_partials: int = 3,
+        filler_deadline_ms: float = 600.0,
+        bytes_per_frame: int = 320,
+        outbound_lead_ms: float = 60.0,
     ):
         self.call_id = call_id
         self.flow_engine = flow_engine
@@ -34,14 +57,42 @@ class Orchestrator:
         self.neutral_fillers_keys = neutral_fillers_keys
         self.non_secure_response = non_secure_response
         self.dialogue_map = dialogue_map
+        # Общая на процесс скомпилированная модель: переходы и expected_intents без разбора словарей на каждый partial
+        self.dialogue_model = flow_engine.model
+        self.playlist_player = PlaylistPlayer(
+            cache=cache,
+            tts_manager=tts_manager,
+            lookahead=prefetch_lookahead,
+            buffer_chunks=prefetch_buffer_chunks,
+        )
+        # Нейтральные филлеры ("filler:hmm", ...) закрывают паузу, если первое аудио ответа запаздывает
+        self.filler_scheduler = FillerScheduler(
+            cache, neutral_fillers_keys, deadline_ms=filler_deadline_ms, frame_bytes=bytes_per_frame
+        )
+        self.bytes_per_frame = bytes_per_frame
+        self.outbound_lead_ms = outbound_lead_ms
+        self.outbound: Optional[OutboundPacer] = None
 
         self.session_state = SessionState(call_id=call_id)
-        # self.metrics_logger = MetricsLogger(trace_id=call_id) # TODO: Implement MetricsLogger
+        self.tracer = CallTracer(call_id)
         self.current_playback_task: Optional[asyncio.Task] = None
+        self.turn_scope: Optional[TurnScope] = None
+        self._bot_turn_index = 0
         self.call_ended = False
 
+        # Спекулятивная подкачка следующего стейта по стабильному лидеру partial-ов
+        self.speculation_stable_partials = speculation_stable_partials
+        self.speculation: Optional[SpeculativePrefetch] = None
+        self._streak_leader: Optional[str] = None
+        self._leader_streak = 0
+
     async def run(self, inbound_stream, outbound_stream):
         """Главный метод, запускающий основной цикл диалога."""
+        # Все задачи звонка (STT, ходы бота, LLM→TTS) создаются ниже и наследуют трассировщик
+        tracer_token = metrics.bind_tracer(self.tracer)
+        # Весь исходящий звук идёт ровными 20 мс фреймами в темпе реального времени
+        self.outbound = OutboundPacer(outbound_stream, bytes_per_frame=self.bytes_per_frame, lead_ms=self.outbound_lead_ms)
+        outbound_stream = self.outbound
         audio_chunk_queue = asyncio.Queue(maxsize=100)
         stt_response_queue = await self.stt_streamer.start_recognition(audio_chunk_queue)
 
@@ -51,20 +102,24 @@ class Orchestrator:
         )
 
         try:
-            # 2. Запускает приветствие бота (первый ход).
-            self.session_state.turn_state = 'BOT_TURN'
+            # 2. Запускает приветствие бота (первый ход). Оно играет в фоне, чтобы его можно было перебить.
             initial_state_config = self.dialogue_map[self.session_state.current_state_id]
             print(f"Initial state config: {initial_state_config}")
             playlist_config = initial_state_config['system_response']['playlist']
-            await self._play_audio_playlist(playlist_config, outbound_stream)
+            await self._start_bot_turn(
+                lambda scope: self._play_audio_playlist(playlist_config, scope.guard(outbound_stream))
+            )
 
             # 4. Внутри цикла вызывает `await self._dialogue_loop(stt_response_queue, outbound_stream)`.
             await self._dialogue_loop(stt_response_queue, outbound_stream)
         finally:
             # 5. Использует `try…finally` для гарантированного вызова `self.shutdown()` в конце.
+            await self._cancel_bot_turn("call_ended")
+            self._discard_speculation("call_ended")
             await self.shutdown()
             inbound_stream_reader_task.cancel()
             await asyncio.gather(inbound_stream_reader_task, return_exceptions=True)
+            metrics.unbind_tracer(tracer_token)
 
 
     async def _pipe_inbound_stream_to_stt(self, inbound_stream, audio_chunk_queue: asyncio.Queue):
@@ -78,8 +133,6 @@ class Orchestrator:
     async def _dialogue_loop(self, stt_response_queue, outbound_stream):
         """Приватный метод для одного полного цикла «вопрос‑ответ»."""
         while not self.call_ended:
-            self.session_state.turn_state = 'USER_TURN'
-            
             stt_result, error = await stt_response_queue.get()
             if error:
                 # Handle STT error, maybe log and continue or hang up
@@ -90,9 +143,19 @@ class Orchestrator:
                 # End of STT stream
                 break
 
-            # TODO: Add metrics logging t1, t2
+            if stt_result.text and self._bot_is_speaking():
+                # Пользователь заговорил поверх бота -> barge-in
+                await self.handle_barge_in()
+
+            self.tracer.observe_stt(
+                stt_result.text,
+                stt_result.is_final,
+                stt_result.utterance_index,
+                stt_result.received_at or None,
+                stt_result.speech_started_at,
+            )
 
-            expected_intents = list(self.dialogue_map.get(self.session_state.current_state_id, {}).get("transitions", {}).keys())
+            expected_intents = self.dialogue_model.expected_intents(self.session_state.current_state_id)
 
             if not stt_result.is_final:
                 # 5. Обработка `partial` результатов
@@ -103,6 +166,9 @@ class Orchestrator:
                 )
                 if intent_result:
                     self.session_state.previous_intent_leader = intent_result.current_leader
+                    self._on_stable_partial_leader(intent_result.current_leader)
+                else:
+                    self._leader_streak = 0
                 continue
 
             # 6. Обработка `final` результатов
@@ -112,10 +178,24 @@ class Orchestrator:
                 expected_intents=expected_intents,
                 previous_leader=self.session_state.previous_intent_leader
             )
+            self.tracer.mark("intent_decided")
 
             playlist_to_play = None
+            prefetched_segments = None
+            speculation = self._take_speculation()
 
-            if intent_result:
+            if intent_result and speculation and speculation.matches(intent_result.intent_id, self.session_state.current_state_id):
+                # Спекуляция подтвердилась: берём готовый результат FlowEngine и уже подкачанное аудио
+                flow_result = speculation.flow_result
+                self.session_state.current_state_id = flow_result.next_state
+                self.session_state.task_stack = flow_result.task_stack
+                prefetched_segments = speculation.segments
+                jlog("speculation_committed", call_id=self.call_id, intent_id=speculation.intent_id,
+                     next_state=flow_result.next_state,
+                     head_start_ms=round((time.monotonic() - speculation.created_at) * 1000, 2))
+            elif intent_result:
+                if speculation:
+                    self._discard_speculation("intent_mismatch", speculation)
                 # Сценарий
                 # TODO: Check for entities
                 flow_result = self.flow_engine.process_event(
@@ -127,27 +207,40 @@ class Orchestrator:
                 self.session_state.task_stack = flow_result.task_stack
                 # ... any other variables ...
 
-                new_state_config = self.dialogue_map.get(self.session_state.current_state_id, {})
-                playlist_to_play = new_state_config.get("system_response", {}).get("playlist")
+                playlist_to_play = self.dialogue_model.playlist(self.session_state.current_state_id)
 
             else:
+                if speculation:
+                    self._discard_speculation("no_intent", speculation)
                 # Не по сценарию -> LLM
                 faq_answer = await self.intent_classifier.find_faq_answer(text=final_text)
                 if faq_answer:
                     # Found in FAQ, construct a simple playlist
                     playlist_to_play = [{"type": "tts", "text_template": faq_answer.answer_text}]
                 else:
-                    await self._handle_unscripted_flow(final_text, outbound_stream)
+                    # Значения привязываются сейчас: задача хода стартует позже, а цикл к тому времени
+                    # может уже переприсвоить final_text / playlist_to_play следующим результатом STT
+                    await self._start_bot_turn(
+                        lambda scope, text=final_text: self._handle_unscripted_flow(text, scope.guard(outbound_stream), scope)
+                    )
                     # _handle_unscripted_flow manages its own playback, so we can continue the loop
                     continue
 
-            if playlist_to_play:
-                self.session_state.turn_state = 'BOT_TURN'
-                await self._play_audio_playlist(playlist_to_play, outbound_stream)
+            if prefetched_segments is not None:
+                await self._start_bot_turn(
+                    lambda scope, segments=prefetched_segments: self.playlist_player.play(segments, scope.guard(outbound_stream))
+                )
+            elif playlist_to_play:
+                await self._start_bot_turn(
+                    lambda scope, playlist=playlist_to_play: self._play_audio_playlist(playlist, scope.guard(outbound_stream))
+                )
 
             # Check if we need to end the call
-            current_state_config = self.dialogue_map.get(self.session_state.current_state_id, {})
-            if current_state_config.get("action") == "END_CALL":
+            current_state = self.dialogue_model.state(self.session_state.current_state_id)
+            if current_state and current_state.action == "END_CALL":
+                # Прощальную фразу доигрываем до конца
+                if self.turn_scope:
+                    await self.turn_scope.wait()
                 self.call_ended = True
 
             if intent_result:
@@ -155,38 +248,127 @@ class Orchestrator:
             else:
                 self.session_state.previous_intent_leader = None
     
-    async def _play_audio_playlist(self, playlist_config: List[Dict[str, Any]], outbound_stream):
-        """Умный проигрыватель аудио‑ответов."""
-        
-        async def play_item(item: Dict[str, Any]):
-            item_type = item.get("type")
-            if item_type == "cache" or item_type == "filler":
-                key = item.get("key")
-                audio_chunks = await self.cache.get(key)
-                if audio_chunks:
-                    for chunk in audio_chunks:
-                        await outbound_stream.write(chunk)
-            elif item_type == "tts":
-                text_template = item.get("text_template", "")
-                # Simple templating for now
-                text_to_speak = text_template.format(session=self.session_state)
-                async for chunk in self.tts_manager.stream_static_text(text_to_speak):
-                    await outbound_stream.write(chunk)
-
-        playback_tasks = [play_item(item) for item in playlist_config]
-        self.current_playback_task = asyncio.gather(*playback_tasks)
-        
+    def _on_stable_partial_leader(self, leader: str) -> None:
+        if leader == self._streak_leader:
+            self._leader_streak += 1
+        else:
+            self._streak_leader = leader
+            self._leader_streak = 1
+
+        if self._leader_streak < self.speculation_stable_partials:
+            return
+        if self.speculation and self.speculation.intent_id == leader:
+            return
+        self._discard_speculation("leader_changed")
+        self.speculation = self._speculate(leader)
+
+    def _speculate(self, intent_id: str) -> Optional[SpeculativePrefetch]:
+        """Пробный прогон FlowEngine на копии состояния и подкачка аудио следующего стейта."""
+        source_state_id = self.session_state.current_state_id
+        speculative_state = self.session_state.model_copy(deep=True)
+        try:
+            flow_result = self.flow_engine.process_event(session_state=speculative_state, intent_id=intent_id)
+        except Exception as e:
+            jlog("speculation_failed", call_id=self.call_id, intent_id=intent_id, error=str(e))
+            return None
+        speculative_state.current_state_id = flow_result.next_state
+        speculative_state.task_stack = flow_result.task_stack
+
+        playlist = self.dialogue_model.playlist(flow_result.next_state)
+        speculation = SpeculativePrefetch(
+            intent_id=intent_id,
+            source_state_id=source_state_id,
+            flow_result=flow_result,
+            segments=self.playlist_player.prepare(playlist, speculative_state),
+        )
+        speculation.start()
+        jlog("speculation_started", call_id=self.call_id, intent_id=intent_id,
+             next_state=flow_result.next_state, segments=len(speculation.segments))
+        return speculation
+
+    def _take_speculation(self) -> Optional[SpeculativePrefetch]:
+        speculation = self.speculation
+        self.speculation = None
+        self._streak_leader = None
+        self._leader_streak = 0
+        return speculation
+
+    def _discard_speculation(self, reason: str, speculation: Optional[SpeculativePrefetch] = None) -> None:
+        if speculation is None:
+            speculation, self.speculation = self.speculation, None
+        if speculation is None:
+            return
+        speculation.discard()
+        jlog("speculation_discarded", call_id=self.call_id, intent_id=speculation.intent_id, reason=reason)
+
+    def _bot_is_speaking(self) -> bool:
+        return self.turn_scope is not None and not self.turn_scope.done
+
+    async def _start_bot_turn(self, turn: Callable[[TurnScope], Awaitable[None]]) -> TurnScope:
+        """Запускает ход бота в отдельной области отмены. Незаконченный предыдущий ход отменяется."""
+        if self._bot_is_speaking():
+            await self._cancel_bot_turn("superseded")
+        self._bot_turn_index += 1
+        scope = TurnScope(turn_id=f"{self.call_id}:{self._bot_turn_index}")
+        self.turn_scope = scope
+        self.session_state.turn_state = 'BOT_TURN'
+        self.current_playback_task = scope.spawn(
+            self._run_bot_turn(scope, turn)
+        )
+        return scope
+
+    async def _run_bot_turn(self, scope: TurnScope, turn: Callable[[TurnScope], Awaitable[None]]):
         try:
-            await self.current_playback_task
+            await turn(scope)
+            if self.outbound is not None and not scope.cancelled:
+                await self.outbound.flush()
         except asyncio.CancelledError:
             # This is expected if a barge-in happens
             pass
+        except Exception as e:
+            jlog("bot_turn_error", turn_id=scope.turn_id, error=str(e))
         finally:
-            self.current_playback_task = None
-
-
-    async def _handle_unscripted_flow(self, text: str, outbound_stream):
+            if self.turn_scope is scope:
+                self.session_state.turn_state = 'USER_TURN'
+                self.current_playback_task = None
+
+    async def handle_barge_in(self) -> Optional[float]:
+        """
+        Пользователь начал говорить во время BOT_TURN: за один фрейм прекращаем запись
+        в выходной поток, закрываем LLM/TTS стримы. Возвращает задержку cancel→тишина в мс.
+        """
+        scope = self.turn_scope
+        if scope is None or scope.done:
+            return None
+        self.session_state.turn_state = 'USER_TURN'
+        cancel_to_silence_ms = await self._cancel_bot_turn("barge_in")
+        if cancel_to_silence_ms is not None:
+            self.tracer.record("barge_in_cancel_to_silence", cancel_to_silence_ms)
+        return cancel_to_silence_ms
+
+    async def _cancel_bot_turn(self, reason: str) -> Optional[float]:
+        scope = self.turn_scope
+        if scope is None:
+            return None
+        self.turn_scope = None
+        self.current_playback_task = None
+        cancel_to_silence_ms = await scope.cancel(reason)
+        if self.outbound is not None:
+            # Запись уже прервана; в транспорте осталось не больше lead_ms аудио
+            self.outbound.drop()
+        return cancel_to_silence_ms
+
+    async def _play_audio_playlist(self, playlist_config: Sequence[Mapping[str, Any]], outbound_stream):
+        """Умный проигрыватель аудио‑ответов: строго по порядку, с подкачкой следующего элемента."""
+        segments = self.playlist_player.prepare(playlist_config, self.session_state)
+        # Филлер нужен, только если ответ начинается с синтеза; аудио из кэша приходит сразу
+        filler = self.filler_scheduler if segments and segments[0].item.get("type") == "tts" else None
+        await self.playlist_player.play(segments, outbound_stream, filler=filler)
+
+
+    async def _handle_unscripted_flow(self, text: str, outbound_stream, scope: TurnScope):
         """Handles the flow when the user input is not part of the script."""
+        t_turn = time.monotonic()
         try:
             text_input_queue, audio_output_queue = await self.tts_manager.start_llm_stream()
         except Exception as e: # Assuming a generic TTSConnectionError
@@ -194,45 +376,58 @@ class Orchestrator:
             await self._play_audio_playlist([{"type": "cache", "key": self.non_secure_response}], outbound_stream)
             return
 
+        # При barge-in закрываем SSE-стрим LLM и WebSocket-контекст TTS, чтобы не платить за лишние токены и символы
+        scope.on_cancel(self.tts_manager.abort_llm_stream)
+        scope.on_cancel(self.llm_manager.abort_generation)
+
         llm_text_stream = self.llm_manager.process_user_turn(text)
 
-        async def _pipe_llm_to_tts(llm_stream, tts_queue):
-            first_chunk = True
-            async for chunk in llm_stream:
-                if first_chunk:
-                    first_chunk = False
-                    if not chunk.is_safe:
-                        # Abort LLM generation and play safe response
-                        # TODO: Implement abort_generation in LLMManager
-                        # await self.llm_manager.abort_generation()
-                        await self._play_audio_playlist([{"type": "cache", "key": self.non_secure_response}], outbound_stream)
-                        return 
-                
-                await tts_queue.put(chunk.text_chunk)
-            await tts_queue.put(None) # Signal end of text
+        async def _pipe_llm_to_tts(llm_stream, tts_queue) -> bool:
+            """Возвращает False, если первый чанк небезопасен: такой ответ не озвучивается."""
+            try:
+                async with aclosing(llm_stream) as stream:
+                    first_chunk = True
+                    async for chunk in stream:
+                        if first_chunk:
+                            first_chunk = False
+                            if not chunk.is_safe:
+                                return False
+
+                        await tts_queue.put(chunk.text_chunk)
+                return True
+            finally:
+                await tts_queue.put(None) # Signal end of text
 
         async def _stream_audio_from_queue(audio_queue, stream):
-            while True:
-                chunk = await audio_queue.get()
-                if chunk is None:
-                    break
+            # Пока LLM→TTS не дали первого аудио, паузу закрывает филлер; ответ идёт сразу после его фрейма
+            chunk = await self.filler_scheduler.play_until_ready(audio_queue.get(), stream, started_at=t_turn)
+            while chunk is not None:
                 await stream.write(chunk)
-        
-        pipe_task = asyncio.create_task(
+                chunk = await audio_queue.get()
+
+        pipe_task = scope.spawn(
             _pipe_llm_to_tts(llm_text_stream, text_input_queue)
         )
-        playback_task = asyncio.create_task(
+        playback_task = scope.spawn(
             _stream_audio_from_queue(audio_output_queue, outbound_stream)
         )
-        
-        self.current_playback_task = playback_task
-        
-        await asyncio.gather(pipe_task, playback_task)
+
+        if await pipe_task:
+            await playback_task
+            return
+
+        # Abort LLM generation and play safe response. Сначала останавливаем филлер и
+        # воспроизведение ответа: в выходной поток в каждый момент пишет только один источник
+        await self.llm_manager.abort_generation()
+        await self.tts_manager.abort_llm_stream()
+        playback_task.cancel()
+        await asyncio.gather(playback_task, return_exceptions=True)
+        await self._play_audio_playlist([{"type": "cache", "key": self.non_secure_response}], outbound_stream)
 
 
     async def shutdown(self):
         """Корректное завершение работы."""
-        # TODO: Add final metrics logging
+        self.tracer.close()
         if self.llm_manager:
             await self.llm_manager.shutdown()
         if self.stt_streamer:
@@ -251,6 +446,12 @@ async def create_orchestrator_instance(
     neutral_fillers_keys: List[str],
     non_secure_response: str,
     dialogue_map: Dict[str, Any],
+    prefetch_lookahead: int = 1,
+    prefetch_buffer_chunks: int = 64,
+    speculation_stable_partials: int = 3,
+    filler_deadline_ms: float = 600.0,
+    bytes_per_frame: int = 320,
+    outbound_lead_ms: float = 60.0,
 ) -> Orchestrator:
     """
     Creates and initializes an instance of the Orchestrator.
@@ -267,6 +468,12 @@ async def create_orchestrator_instance(
         neutral_fillers_keys=neutral_fillers_keys,
         non_secure_response=non_secure_response,
         dialogue_map=dialogue_map,
+        prefetch_lookahead=prefetch_lookahead,
+        prefetch_buffer_chunks=prefetch_buffer_chunks,
+        speculation_stable_partials=speculation_stable_partials,
+        filler_deadline_ms=filler_deadline_ms,
+        bytes_per_frame=bytes_per_frame,
+        outbound_lead_ms=outbound_lead_ms,
     )
     # According to context, here we would call something like:
     # await orchestrator._setup_connections()
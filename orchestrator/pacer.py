@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("orchestrator.pacer")
+
+
+def jlog(event: str, **fields):
+    logger.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+
+class OutboundPacer:
+    """
+    Исходящий поток звонка в темпе реального времени.
+
+    Режет входящие чанки (кэш, TTS, филлеры) на ровные фреймы `bytes_per_frame`
+    и отдаёт транспорту каждый фрейм не раньше, чем за `lead_ms` до его
+    времени воспроизведения по монотонным часам. Так ниже по течению лежит
+    не больше `lead_ms` аудио, и barge-in обрывает речь за это время:
+    неотправленные фреймы просто отбрасываются `drop()`.
+
+    `write()` блокируется до отправки, поэтому источники получают backpressure
+    и не читают аудио быстрее, чем оно играется.
+    """
+
+    def __init__(self, outbound_stream, bytes_per_frame: int = 320, frame_ms: float = 20.0, lead_ms: float = 60.0):
+        self._stream = outbound_stream
+        self.bytes_per_frame = bytes_per_frame
+        self.frame_sec = frame_ms / 1000
+        self.lead_sec = max(0.0, lead_ms / 1000)
+        self._buffer = bytearray()
+        self._next_release: Optional[float] = None  # время воспроизведения следующего фрейма
+        self._in_answer = False  # опоздание фрейма внутри ответа — это underrun, между ответами — нет
+        self._lock = asyncio.Lock()
+        self.frames_sent = 0
+        self.underruns = 0
+        self.dropped_bytes = 0
+
+    @property
+    def in_flight_ms(self) -> float:
+        """Сколько аудио уже отдано транспорту, но ещё не проиграно."""
+        if self._next_release is None:
+            return 0.0
+        return max(0.0, (self._next_release - time.monotonic()) * 1000)
+
+    @property
+    def buffered_ms(self) -> float:
+        """Неполный фрейм, ожидающий продолжения."""
+        return len(self._buffer) / self.bytes_per_frame * self.frame_sec * 1000
+
+    async def write(self, chunk: bytes) -> None:
+        async with self._lock:
+            self._buffer.extend(chunk)
+            while len(self._buffer) >= self.bytes_per_frame:
+                frame = bytes(self._buffer[:self.bytes_per_frame])
+                del self._buffer[:self.bytes_per_frame]
+                await self._send(frame)
+
+    async def flush(self) -> None:
+        """Дописывает хвост тишиной до целого фрейма (конец ответа)."""
+        async with self._lock:
+            if self._buffer:
+                frame = bytes(self._buffer) + b"\x00" * (self.bytes_per_frame - len(self._buffer))
+                self._buffer.clear()
+                await self._send(frame)
+            self._in_answer = False
+
+    def drop(self) -> Dict[str, Any]:
+        """Отбрасывает неотправленное аудио. Вызывается после отмены хода, когда запись уже прервана."""
+        dropped = len(self._buffer)
+        self._buffer.clear()
+        self._in_answer = False
+        self.dropped_bytes += dropped
+        info = {"dropped_bytes": dropped, "in_flight_ms": round(self.in_flight_ms, 2)}
+        jlog("outbound_dropped", **info)
+        return info
+
+    async def _send(self, frame: bytes) -> None:
+        now = time.monotonic()
+        if self._next_release is None or self._next_release < now:
+            # Источник не успел (или поток только начался): часы стартуют заново, без догоняющего залпа
+            if self._in_answer:
+                self.underruns += 1
+            self._next_release = now
+        self._in_answer = True
+        delay = self._next_release - self.lead_sec - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._stream.write(frame)
+        self._next_release += self.frame_sec
+        self.frames_sent += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "frames_sent": self.frames_sent,
+            "underruns": self.underruns,
+            "dropped_bytes": self.dropped_bytes,
+            "in_flight_ms": round(self.in_flight_ms, 2),
+        }
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, List, Mapping, Optional, Sequence
+
+logger = logging.getLogger("orchestrator.playlist")
+
+
+def jlog(event: str, **fields):
+    logger.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+
+_END_OF_SEGMENT = object()
+
+
+@dataclass
+class PlaybackReport:
+    """Итог проигрывания одного плейлиста."""
+    segments: int = 0
+    played_segments: int = 0
+    total_bytes: int = 0
+    first_audio_ms: Optional[float] = None       # от вызова play() до первой записи
+    gaps_ms: List[float] = field(default_factory=list)  # пауза перед каждым сегментом, начиная со второго
+    cancelled: bool = False
+
+
+class PlaylistSegment:
+    """
+    Один элемент плейлиста. Источник (Redis или TTS) читается фоновой задачей
+    в ограниченную очередь, поэтому сегмент можно начать качать заранее,
+    пока играет предыдущий.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        item: Mapping[str, Any],
+        open_source: Callable[[], AsyncIterator[bytes]],
+        buffer_chunks: int,
+        batch: Optional["_AudioBatch"] = None,
+    ):
+        self.index = index
+        self.item = item
+        self._open_source = open_source
+        self._batch = batch
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, buffer_chunks))
+        self._task: Optional[asyncio.Task] = None
+        self.error: Optional[BaseException] = None
+        self.fetch_started_at: Optional[float] = None
+        self.first_chunk_at: Optional[float] = None
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self.fetch_started_at = time.monotonic()
+            self._task = asyncio.create_task(self._fill())
+
+    async def _fill(self) -> None:
+        try:
+            async with aclosing(self._open_source()) as source:
+                async for chunk in source:
+                    if not chunk:
+                        continue
+                    if self.first_chunk_at is None:
+                        self.first_chunk_at = time.monotonic()
+                    await self._queue.put(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+            jlog("playlist_segment_error", index=self.index, type=self.item.get("type"), error=str(e))
+        await self._queue.put(_END_OF_SEGMENT)
+
+    async def next_chunk(self) -> Optional[bytes]:
+        """Следующий чанк сегмента или None в конце. Отмена ожидания не теряет чанков."""
+        self.start()
+        chunk = await self._queue.get()
+        if chunk is _END_OF_SEGMENT:
+            return None
+        return chunk
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        while (chunk := await self.next_chunk()) is not None:
+            yield chunk
+
+    def cancel(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+        if self._batch is not None:
+            self._batch.cancel()
+
+
+class _AudioBatch:
+    """
+    Общий запрос за аудио нескольких сегментов: все ключи уходят одним
+    `cache.audio.get_many` (один конвейер Redis) при старте первого из них.
+    """
+
+    def __init__(self, cache, keys: Sequence[str]):
+        self.cache = cache
+        self.keys = list(dict.fromkeys(keys))
+        self._task: Optional[asyncio.Task] = None
+
+    async def get(self, key: str):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.cache.audio.get_many(self.keys))
+        # shield: отмена одного сегмента не должна обрывать запрос остальных
+        found = await asyncio.shield(self._task)
+        return found.get(key)
+
+    def cancel(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+
+class PlaylistPlayer:
+    """
+    Проигрывает элементы плейлиста строго по порядку и одновременно подкачивает
+    следующие `lookahead` элементов, чтобы пауза между сегментами была близка к нулю.
+    """
+
+    def __init__(self, cache, tts_manager, lookahead: int = 1, buffer_chunks: int = 64):
+        self.cache = cache
+        self.tts_manager = tts_manager
+        self.lookahead = max(0, lookahead)
+        self.buffer_chunks = buffer_chunks
+
+    def prepare(self, playlist: Sequence[Mapping[str, Any]], session_state) -> List[PlaylistSegment]:
+        """
+        Создаёт сегменты плейлиста, не запуская их загрузку. Первый сегмент из кэша
+        читается потоково (быстрый первый фрейм), остальные кэшированные — одним
+        пакетным запросом, который уходит, когда look-ahead запускает второй из них.
+        """
+        items = [item for item in playlist or [] if isinstance(item, Mapping)]
+        cache_keys = [item.get("key") for item in items if item.get("type") in ("cache", "filler") and item.get("key")]
+        batch = _AudioBatch(self.cache, cache_keys[1:]) if len(cache_keys) > 1 else None
+        streamed_first = False
+        segments = []
+        for index, item in enumerate(playlist or []):
+            if not isinstance(item, Mapping):
+                jlog("playlist_item_skipped", index=index, type=None, item=repr(item))
+                continue
+            is_cache = item.get("type") in ("cache", "filler") and item.get("key")
+            open_source = self._source_for(item, session_state, batch if is_cache and streamed_first else None)
+            streamed_first = streamed_first or bool(is_cache)
+            if open_source is None:
+                jlog("playlist_item_skipped", index=index, type=item.get("type"))
+                continue
+            segments.append(PlaylistSegment(index, item, open_source, self.buffer_chunks, batch))
+        return segments
+
+    def _source_for(
+        self, item: Mapping[str, Any], session_state, batch: Optional[_AudioBatch] = None
+    ) -> Optional[Callable[[], AsyncIterator[bytes]]]:
+        item_type = item.get("type")
+        if item_type == "cache" or item_type == "filler":
+            key = item.get("key")
+            if batch is not None:
+                return lambda: self._batched_source(batch, key)
+            return lambda: self._cache_source(key)
+        if item_type == "tts":
+            text_template = item.get("text_template", "")
+            # Simple templating for now
+            text_to_speak = text_template.format(session=session_state)
+            return lambda: self.tts_manager.stream_static_text(text_to_speak)
+        return None
+
+    async def _cache_source(self, key: str) -> AsyncIterator[bytes]:
+        # Потоковое чтение: первый фрейм готов после короткого запроса, хвост докачивается во время игры
+        async with aclosing(self.cache.audio.stream(key)) as frames:
+            async for frame in frames:
+                yield frame
+
+    async def _batched_source(self, batch: _AudioBatch, key: str) -> AsyncIterator[bytes]:
+        audio = await batch.get(key)
+        if audio is None:
+            return
+        for frame in audio.iter_frames():
+            yield frame
+
+    async def play(self, segments: List[PlaylistSegment], outbound_stream, filler=None) -> PlaybackReport:
+        """
+        `filler` (FillerScheduler) закрывает паузу до первого чанка первого сегмента,
+        если он не успел к дедлайну; дальше сегменты играют как обычно.
+        """
+        report = PlaybackReport(segments=len(segments))
+        t_start = time.monotonic()
+        last_write_at: Optional[float] = None
+
+        try:
+            for position, segment in enumerate(segments):
+                # Текущий сегмент + look-ahead: пока играет N, качается N+1
+                for upcoming in segments[position:position + 1 + self.lookahead]:
+                    upcoming.start()
+
+                if position == 0 and filler is not None:
+                    chunk = await filler.play_until_ready(segment.next_chunk(), outbound_stream, started_at=t_start)
+                else:
+                    chunk = await segment.next_chunk()
+                first_chunk = True
+                while chunk is not None:
+                    if first_chunk:
+                        first_chunk = False
+                        now = time.monotonic()
+                        if last_write_at is None:
+                            report.first_audio_ms = round((now - t_start) * 1000, 2)
+                        else:
+                            report.gaps_ms.append(round((now - last_write_at) * 1000, 2))
+                    await outbound_stream.write(chunk)
+                    report.total_bytes += len(chunk)
+                    last_write_at = time.monotonic()
+                    chunk = await segment.next_chunk()
+                report.played_segments += 1
+        except asyncio.CancelledError:
+            report.cancelled = True
+            raise
+        finally:
+            for segment in segments:
+                segment.cancel()
+            jlog(
+                "playlist_played",
+                segments=report.segments,
+                played=report.played_segments,
+                bytes=report.total_bytes,
+                first_audio_ms=report.first_audio_ms,
+                gaps_ms=report.gaps_ms,
+                max_gap_ms=max(report.gaps_ms) if report.gaps_ms else None,
+                cancelled=report.cancelled,
+            )
+        return report
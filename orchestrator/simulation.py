@@ -0,0 +1,474 @@
+"""
+Офлайн-симуляция звонков через настоящий `Orchestrator`.
+
+STT, классификатор, LLM, TTS и Redis заменены заглушками, у которых задержки
+и размеры чанков берутся из распределений, подогнанных под замеры из `reports/`
+(stt_probe_*, llm_agent_*, llm_probe_*, intent_test_report_*). Сеть не нужна.
+Для TTS в отчётах пока нет чисел — используются целевые значения из tts_manager/task.md.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import glob
+import json
+import logging
+import math
+import os
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache.audio_format import PcmAudio, decode_pcm, encode_pcm
+from cache.memory import InMemoryCache
+from domain.models import FaqResult, IntentResult, LLMStreamChunk
+from domain.stt_models import STTResponse
+from flow_engine.engine import FlowEngine
+from infra import metrics
+from orchestrator.orchestrator import Orchestrator, create_orchestrator_instance
+
+logger = logging.getLogger("orchestrator.simulation")
+
+FRAME_BYTES = 320  # 20 мс PCM 8 кГц, 16 бит
+BYTES_PER_SEC = FRAME_BYTES * 50
+Z95 = 1.645
+
+
+# --- Распределения ---
+
+@dataclass(frozen=True)
+class LatencyDistribution:
+    """Логнормальное распределение, заданное медианой и sigma логарифма."""
+    median_ms: float
+    sigma: float = 0.0
+    source: str = "default"
+
+    @classmethod
+    def from_percentiles(cls, p50_ms: float, p95_ms: float, source: str) -> LatencyDistribution:
+        sigma = math.log(p95_ms / p50_ms) / Z95 if p95_ms > p50_ms > 0 else 0.0
+        return cls(median_ms=p50_ms, sigma=sigma, source=source)
+
+    @classmethod
+    def from_samples(cls, samples: List[float], source: str) -> LatencyDistribution:
+        # Через p50/p95, а не через std(log): единичные выбросы в пробах (7+ секунд) не раздувают хвост
+        values = [v for v in samples if v and v > 0]
+        return cls.from_percentiles(float(np.percentile(values, 50)), float(np.percentile(values, 95)), source)
+
+    def sample_ms(self, rng: random.Random) -> float:
+        return self.median_ms * math.exp(rng.gauss(0.0, self.sigma)) if self.sigma else self.median_ms
+
+    def sample_sec(self, rng: random.Random) -> float:
+        return self.sample_ms(rng) / 1000
+
+
+@dataclass
+class LatencyProfile:
+    stt_first_partial: LatencyDistribution = LatencyDistribution(200.0, 0.3)
+    stt_partial_interval: LatencyDistribution = LatencyDistribution(120.0, 0.3)
+    stt_final_after_partial: LatencyDistribution = LatencyDistribution(500.0, 0.4)
+    stt_partials_per_utterance: int = 5
+    user_pause: LatencyDistribution = LatencyDistribution(2500.0, 0.4)
+    intent_classify: LatencyDistribution = LatencyDistribution(50.0, 0.35)
+    llm_ttft: LatencyDistribution = LatencyDistribution(1000.0, 0.3)
+    llm_chunk_interval: LatencyDistribution = LatencyDistribution(45.0, 0.3)
+    llm_answer_chunks: int = 40
+    tts_first_byte: LatencyDistribution = LatencyDistribution.from_percentiles(450.0, 1000.0, "tts_manager/task.md goals")
+    tts_realtime_factor: float = 4.0
+    tts_chunk_bytes: int = 4096
+    redis_get: LatencyDistribution = LatencyDistribution(0.4, 0.6)
+    cached_clip_sec: float = 3.0
+    notes: List[str] = field(default_factory=list)
+
+    def describe(self) -> Dict[str, object]:
+        result: Dict[str, object] = {}
+        for name, value in self.__dict__.items():
+            if isinstance(value, LatencyDistribution):
+                result[name] = {"median_ms": round(value.median_ms, 2), "sigma": round(value.sigma, 3), "source": value.source}
+            else:
+                result[name] = value
+        return result
+
+
+def _md_row(text: str, label: str) -> Optional[List[float]]:
+    match = re.search(r"\|\s*" + re.escape(label) + r"\s*((?:\|\s*[\d.]+\s*)+)\|", text)
+    if not match:
+        return None
+    return [float(v) for v in re.findall(r"[\d.]+", match.group(1))]
+
+
+def load_profile(reports_dir: str = "reports") -> LatencyProfile:
+    """Подгоняет профиль задержек под отчёты проб. Чего нет в отчётах — остаётся по умолчанию."""
+    profile = LatencyProfile()
+
+    # STT: время до первого partial, до финала, число partial-ов на фразу
+    ttfp, final_gap, partials = [], [], []
+    for path in glob.glob(os.path.join(reports_dir, "stt_probe_*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        for run in report.get("runs", []):
+            if run.get("error"):
+                continue
+            if run.get("ttfp_ms"):
+                ttfp.append(run["ttfp_ms"])
+            if run.get("ttfp_ms") and run.get("ttff_ms") and run["ttff_ms"] > run["ttfp_ms"]:
+                final_gap.append(run["ttff_ms"] - run["ttfp_ms"])
+            if run.get("partials_count") and run.get("finals_count"):
+                partials.append(run["partials_count"] / run["finals_count"])
+    if ttfp:
+        profile.stt_first_partial = LatencyDistribution.from_samples(ttfp, f"stt_probe ttfp_ms n={len(ttfp)}")
+    if final_gap:
+        profile.stt_final_after_partial = LatencyDistribution.from_samples(final_gap, f"stt_probe ttff-ttfp n={len(final_gap)}")
+    if partials:
+        profile.stt_partials_per_utterance = max(1, int(round(float(np.median(partials)))))
+        profile.stt_partial_interval = LatencyDistribution(
+            profile.stt_final_after_partial.median_ms / profile.stt_partials_per_utterance,
+            0.3,
+            "stt_probe (ttff-ttfp)/partials",
+        )
+
+    # Классификатор интентов
+    p50s, p95s = [], []
+    for path in glob.glob(os.path.join(reports_dir, "intent_test_report_*.md")):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        p50, p95 = _md_row(text, "P50 Latency (ms)"), _md_row(text, "P95 Latency (ms)")
+        if p50 and p95:
+            p50s.append(p50[0])
+            p95s.append(p95[0])
+    if p50s:
+        profile.intent_classify = LatencyDistribution.from_percentiles(
+            float(np.median(p50s)), float(np.median(p95s)), f"intent_test_report n={len(p50s)}"
+        )
+
+    # LLM: TTFT из llm_agent (сырые замеры) и llm_probe (p50/p95), темп чанков из llm_probe
+    ttft, stream_ms = [], []
+    for path in glob.glob(os.path.join(reports_dir, "llm_agent_*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        for m in report.get("metrics", []):
+            if m.get("ttft_ms"):
+                ttft.append(m["ttft_ms"])
+            if m.get("ttft_ms") and m.get("total_ms"):
+                stream_ms.append(m["total_ms"] - m["ttft_ms"])
+    chunk_rates = []
+    for path in glob.glob(os.path.join(reports_dir, "llm_probe_*.md")):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        row = _md_row(text, "Time to First Token (ms)")
+        if row and len(row) >= 2:
+            ttft.append(row[1])
+        rate = _md_row(text, "Chunk Rate (chunks/sec)")
+        if rate and len(rate) >= 2 and rate[1] > 0:
+            chunk_rates.append(rate[1])
+    if ttft:
+        profile.llm_ttft = LatencyDistribution.from_samples(ttft, f"llm_agent/llm_probe ttft n={len(ttft)}")
+    if chunk_rates:
+        rate = float(np.median(chunk_rates))
+        profile.llm_chunk_interval = LatencyDistribution(1000 / rate, 0.3, f"llm_probe chunk rate n={len(chunk_rates)}")
+        if stream_ms:
+            profile.llm_answer_chunks = max(1, int(float(np.median(stream_ms)) / 1000 * rate))
+
+    # TTS: берём замеры, если в отчётах появятся числа
+    tts_samples = []
+    for path in glob.glob(os.path.join(reports_dir, "tts_summary_*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        for mode, key in (("http_short", "ttfa_ms"), ("ws_short", "ttft_ms")):
+            stats = report.get(mode, {}).get(key, {})
+            if stats.get("p50") and stats.get("p95"):
+                tts_samples.append((stats["p50"], stats["p95"]))
+    if tts_samples:
+        profile.tts_first_byte = LatencyDistribution.from_percentiles(
+            float(np.median([s[0] for s in tts_samples])),
+            float(np.median([s[1] for s in tts_samples])),
+            f"tts_summary n={len(tts_samples)}",
+        )
+    else:
+        profile.notes.append("tts_summary reports have no measurements; TTS uses task.md goals")
+    profile.notes.append("redis_get and user_pause are not measured in reports; defaults used")
+    return profile
+
+
+# --- Заглушки компонентов ---
+
+class SimulatedSTTStreamer:
+    """Выдаёт `turns` фраз: partial-ы растущего текста и финал, с задержками из профиля."""
+
+    def __init__(self, profile: LatencyProfile, rng: random.Random, turns: int, tail_sec: float = 4.0):
+        self.profile = profile
+        self.rng = rng
+        self.turns = turns
+        self.tail_sec = tail_sec
+        self._tasks: List[asyncio.Task] = []
+
+    async def start_recognition(self, audio_chunk_queue: asyncio.Queue) -> asyncio.Queue:
+        response_queue: asyncio.Queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._drain(audio_chunk_queue)),
+            asyncio.create_task(self._emit(response_queue)),
+        ]
+        return response_queue
+
+    async def _drain(self, audio_chunk_queue: asyncio.Queue) -> None:
+        while await audio_chunk_queue.get() is not None:
+            pass
+
+    async def _emit(self, response_queue: asyncio.Queue) -> None:
+        words = ["да", "хочу", "узнать", "про", "стоимость", "полиса", "для", "квартиры"]
+        for utterance in range(self.turns):
+            await asyncio.sleep(self.profile.user_pause.sample_sec(self.rng))
+            speech_started_at = time.monotonic()
+            await asyncio.sleep(self.profile.stt_first_partial.sample_sec(self.rng))
+            partials = self.profile.stt_partials_per_utterance
+            for i in range(partials):
+                text = f"u{utterance} " + " ".join(words[: i + 1])
+                partial = STTResponse(text, False, 0.5, utterance, time.monotonic(), speech_started_at)
+                await response_queue.put((partial, None))
+                if i < partials - 1:
+                    await asyncio.sleep(self.profile.stt_partial_interval.sample_sec(self.rng))
+            await asyncio.sleep(self.profile.stt_final_after_partial.sample_sec(self.rng))
+            text = f"u{utterance} " + " ".join(words)
+            final = STTResponse(text, True, 1.0, utterance, time.monotonic(), speech_started_at)
+            await response_queue.put((final, None))
+        await asyncio.sleep(self.tail_sec)
+        await response_queue.put((None, None))
+
+    async def stop_recognition(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class SimulatedIntentClassifier:
+    """
+    Для каждой фразы один раз выбирает интент из ожидаемых в текущем стейте
+    (или «не по сценарию» с вероятностью `unscripted_rate`), так что partial-ы
+    дают стабильного лидера. Скоринг numpy — настоящий, инференс модели — задержка из профиля.
+    """
+
+    def __init__(self, profile: LatencyProfile, rng: random.Random, unscripted_rate: float, dim: int = 312):
+        self.profile = profile
+        self.rng = rng
+        self.unscripted_rate = unscripted_rate
+        self._centroids = np.random.default_rng(rng.randrange(2**32)).standard_normal((64, dim)).astype(np.float32)
+        self._decisions: Dict[str, Optional[str]] = {}
+
+    async def classify_intent(self, text: str, expected_intents: Sequence[str], previous_leader: Optional[str] = None) -> Optional[IntentResult]:
+        await asyncio.sleep(self.profile.intent_classify.sample_sec(self.rng))
+        query = self._centroids[self.rng.randrange(len(self._centroids))]
+        scores = self._centroids[: max(2, len(expected_intents))] @ query
+        np.argpartition(-scores, 1)[:2]
+
+        utterance = text.split(" ", 1)[0]
+        if utterance not in self._decisions:
+            scripted = expected_intents and self.rng.random() >= self.unscripted_rate
+            self._decisions[utterance] = self.rng.choice(expected_intents) if scripted else None
+        intent_id = self._decisions[utterance]
+        if intent_id is None or intent_id not in expected_intents:
+            return None
+        return IntentResult(intent_id=intent_id, score=0.9, entities=None, current_leader=intent_id)
+
+    async def find_faq_answer(self, text: str) -> Optional[FaqResult]:
+        await asyncio.sleep(self.profile.intent_classify.sample_sec(self.rng))
+        return None
+
+
+class SimulatedLLMManager:
+    def __init__(self, profile: LatencyProfile, rng: random.Random):
+        self.profile = profile
+        self.rng = rng
+        self._active: List[AsyncGenerator] = []
+
+    async def process_user_turn(self, final_user_text: str, low_latency_mode: bool = False) -> AsyncGenerator[LLMStreamChunk, None]:
+        await asyncio.sleep(self.profile.llm_ttft.sample_sec(self.rng))
+        metrics.mark("llm_first_token")
+        for i in range(self.profile.llm_answer_chunks):
+            # Разбор SSE-строки — та же CPU-работа, что у настоящего клиента
+            payload = json.loads('{"choices": [{"delta": {"content": "слово "}}]}')
+            yield LLMStreamChunk(text_chunk=payload["choices"][0]["delta"]["content"], is_safe=True if i == 0 else None)
+            await asyncio.sleep(self.profile.llm_chunk_interval.sample_sec(self.rng))
+        yield LLMStreamChunk(text_chunk="", is_final_chunk=True)
+
+    async def abort_generation(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class SimulatedTTSManager:
+    def __init__(self, profile: LatencyProfile, rng: random.Random):
+        self.profile = profile
+        self.rng = rng
+        self._ws_task: Optional[asyncio.Task] = None
+
+    def _audio(self, seconds: float) -> bytes:
+        size = int(seconds * BYTES_PER_SEC) // FRAME_BYTES * FRAME_BYTES or FRAME_BYTES
+        # base64-декод, как у ответа WebSocket TTS
+        return base64.b64decode(base64.b64encode(bytes(size)))
+
+    async def stream_static_text(self, text: str) -> AsyncGenerator[bytes, None]:
+        await asyncio.sleep(self.profile.tts_first_byte.sample_sec(self.rng))
+        metrics.mark("tts_first_byte")
+        audio = self._audio(max(1.0, len(text) / 15))
+        chunk = self.profile.tts_chunk_bytes
+        for offset in range(0, len(audio), chunk):
+            yield audio[offset:offset + chunk]
+            await asyncio.sleep(chunk / BYTES_PER_SEC / self.profile.tts_realtime_factor)
+
+    async def start_llm_stream(self) -> Tuple[asyncio.Queue, asyncio.Queue]:
+        text_queue: asyncio.Queue = asyncio.Queue()
+        audio_queue: asyncio.Queue = asyncio.Queue()
+        self._ws_task = asyncio.create_task(self._synthesize(text_queue, audio_queue))
+        return text_queue, audio_queue
+
+    async def _synthesize(self, text_queue: asyncio.Queue, audio_queue: asyncio.Queue) -> None:
+        first = True
+        try:
+            while (text := await text_queue.get()) is not None:
+                if first:
+                    await asyncio.sleep(self.profile.tts_first_byte.sample_sec(self.rng))
+                    metrics.mark("tts_first_byte")
+                    first = False
+                await audio_queue.put(self._audio(len(text) / 15))
+        finally:
+            await audio_queue.put(None)
+
+    async def abort_llm_stream(self) -> None:
+        if self._ws_task:
+            self._ws_task.cancel()
+            await asyncio.gather(self._ws_task, return_exceptions=True)
+
+
+class SimulatedCache(InMemoryCache):
+    """Redis: задержка GET из профиля, под любым ключом — один и тот же клип."""
+
+    def __init__(self, profile: LatencyProfile, rng: random.Random):
+        super().__init__()
+        self.profile = profile
+        self.rng = rng
+        self._clip = decode_pcm(encode_pcm(bytes(FRAME_BYTES * int(profile.cached_clip_sec * 50))))
+
+    async def get_audio(self, key: str) -> Optional[PcmAudio]:
+        await asyncio.sleep(self.profile.redis_get.sample_sec(self.rng))
+        return self._clip
+
+    async def get_audio_many(self, keys: Sequence[str]) -> Dict[str, Optional[PcmAudio]]:
+        # Один конвейер — одна задержка на все ключи
+        await asyncio.sleep(self.profile.redis_get.sample_sec(self.rng))
+        return {key: self._clip for key in keys}
+
+    async def stream_audio(self, key: str) -> AsyncGenerator[bytes, None]:
+        # Первое окно приходит после одного GET, остальное докачивается во время игры
+        await asyncio.sleep(self.profile.redis_get.sample_sec(self.rng))
+        for frame in self._clip.iter_frames():
+            yield frame
+
+
+class SimulatedInbound:
+    """Входящий поток абонента: фрейм тишины каждые 20 мс."""
+
+    def __aiter__(self):
+        return self._frames()
+
+    async def _frames(self):
+        frame = bytes(FRAME_BYTES)
+        while True:
+            await asyncio.sleep(0.02)
+            yield frame
+
+
+class PacedOutbound:
+    """Исходящий поток с темпом реального времени, как у телефонного канала."""
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    async def write(self, chunk: bytes) -> None:
+        self.bytes_written += len(chunk)
+        await asyncio.sleep(len(chunk) / BYTES_PER_SEC)
+
+
+# --- Прогон ---
+
+@dataclass
+class SimulationResult:
+    calls: int
+    failed_calls: int
+    wall_sec: float
+    cpu_sec: float
+    loop_lag_ms: Dict[str, float]
+    latency: Dict[str, Dict[str, float]]
+
+    @property
+    def cpu_ms_per_call(self) -> float:
+        return round(self.cpu_sec / self.calls * 1000, 2) if self.calls else 0.0
+
+
+async def build_simulated_orchestrator(
+    call_id: str,
+    flow_engine: FlowEngine,
+    profile: LatencyProfile,
+    rng: random.Random,
+    turns: int,
+    unscripted_rate: float,
+) -> Orchestrator:
+    return await create_orchestrator_instance(
+        call_id=call_id,
+        flow_engine=flow_engine,
+        intent_classifier=SimulatedIntentClassifier(profile, rng, unscripted_rate),
+        llm_manager=SimulatedLLMManager(profile, rng),
+        tts_manager=SimulatedTTSManager(profile, rng),
+        stt_streamer=SimulatedSTTStreamer(profile, rng, turns),
+        cache=SimulatedCache(profile, rng),
+        neutral_fillers_keys=[],
+        non_secure_response="audio_non_secure_response",
+        dialogue_map=flow_engine.dialogue_map,
+    )
+
+
+async def simulate_calls(
+    concurrency: int,
+    flow_engine: FlowEngine,
+    profile: LatencyProfile,
+    turns: int = 6,
+    unscripted_rate: float = 0.15,
+    arrival_window_sec: float = 2.0,
+    seed: int = 0,
+) -> SimulationResult:
+    """Проводит `concurrency` одновременных звонков и собирает перцентили ходов, лаг loop и CPU."""
+    metrics.latency_registry.reset()
+    lag_monitor = metrics.EventLoopLagMonitor(interval_sec=0.05, window=100_000)
+    lag_monitor.start()
+    failed = 0
+
+    async def one_call(index: int) -> None:
+        nonlocal failed
+        rng = random.Random(seed * 1_000_003 + index)
+        await asyncio.sleep(rng.random() * arrival_window_sec)
+        orchestrator = await build_simulated_orchestrator(
+            f"sim-{concurrency}-{index}", flow_engine, profile, rng, turns, unscripted_rate
+        )
+        try:
+            await orchestrator.run(SimulatedInbound(), PacedOutbound())
+        except Exception as e:
+            failed += 1
+            logger.warning(json.dumps({"event": "simulated_call_failed", "call": index, "error": repr(e)}))
+
+    t_wall, t_cpu = time.monotonic(), time.process_time()
+    await asyncio.gather(*(one_call(i) for i in range(concurrency)))
+    wall_sec, cpu_sec = time.monotonic() - t_wall, time.process_time() - t_cpu
+    await lag_monitor.stop()
+
+    return SimulationResult(
+        calls=concurrency,
+        failed_calls=failed,
+        wall_sec=round(wall_sec, 2),
+        cpu_sec=round(cpu_sec, 3),
+        loop_lag_ms={q: round(lag_monitor.percentile(p), 3) for q, p in (("p50", 50), ("p95", 95), ("p99", 99))},
+        latency=metrics.latency_registry.snapshot(),
+    )
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+from domain.models import FlowResult
+from orchestrator.playlist import PlaylistSegment
+
+
+@dataclass
+class SpeculativePrefetch:
+    """
+    Ответ, подготовленный заранее по стабильному лидеру partial-результатов STT:
+    результат пробного `FlowEngine.process_event` на копии `SessionState`
+    и уже запущенная подкачка аудио следующего стейта.
+    """
+    intent_id: str
+    source_state_id: str
+    flow_result: FlowResult
+    segments: List[PlaylistSegment]
+    created_at: float = field(default_factory=time.monotonic)
+
+    def matches(self, intent_id: str, state_id: str) -> bool:
+        return self.intent_id == intent_id and self.source_state_id == state_id
+
+    def start(self) -> None:
+        for segment in self.segments:
+            segment.start()
+
+    def discard(self) -> None:
+        for segment in self.segments:
+            segment.cancel()
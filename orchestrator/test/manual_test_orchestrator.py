@@ -11,6 +11,7 @@ import yaml
 project_root = Path(__file__).resolve().parent.parent.parent
 sys.path.append(str(project_root))
 
+from cache.memory import InMemoryCache
 from orchestrator.orchestrator import Orchestrator
 from flow_engine.engine import FlowEngine
 from domain.models import SessionState, LLMStreamChunk
@@ -85,6 +86,9 @@ class MockLLMManager:
             yield LLMStreamChunk(text_chunk=chunk + " ", is_final_chunk=False, is_safe=True)
         yield LLMStreamChunk(text_chunk="", is_final_chunk=True, is_safe=True)
 
+    async def abort_generation(self):
+        print("LOG: LLM generation aborted.")
+
     async def shutdown(self):
         print("LOG: LLM Manager shut down.")
 
@@ -105,17 +109,8 @@ class MockTTSManager:
             raise ConnectionError("Simulated TTS Failure on LLM stream")
         return asyncio.Queue(), asyncio.Queue()
 
-class MockCache:
-    def __init__(self):
-        self._data = {}
-
-    async def get(self, key: str) -> Optional[List[bytes]]:
-        print(f"LOG: Cache GET for key: {key}")
-        return self._data.get(key)
-
-    async def set(self, key: str, value: List[bytes]):
-        print(f"LOG: Cache SET for key: {key}")
-        self._data[key] = value
+    async def abort_llm_stream(self):
+        print("LOG: TTS LLM stream aborted.")
 
 class MockStream:
     def __init__(self):
@@ -179,9 +174,9 @@ async def run_test_scenario(args):
     intent_classifier = MockIntentClassifier(should_fail=args.simulate_intent_failure)
     llm_manager = MockLLMManager(should_fail=args.simulate_llm_failure, simulate_unsafe=args.simulate_llm_unsafe)
     tts_manager = MockTTSManager(should_fail=args.simulate_tts_failure)
-    cache = MockCache()
-    # Pre-populate cache for fallback response
-    await cache.set("non_secure_response", [b"fallback_audio"])
+    cache = InMemoryCache()
+    # Pre-populate cache for fallback response (200 ms of silence)
+    await cache.audio.set_pcm("non_secure_response", bytes(3200))
     
     flow_engine = FlowEngine(goals_config_path="configs/goals.json", dialogue_map_path="configs/dialogue_flow_with_playlists.json")
     
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Coroutine, List, Optional, Set
+
+from infra import metrics
+
+logger = logging.getLogger("orchestrator.turn_scope")
+
+
+def jlog(event: str, **fields):
+    logger.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+
+class GuardedOutbound:
+    """Выходной поток, который перестаёт писать, как только область хода отменена."""
+
+    def __init__(self, scope: TurnScope, outbound_stream):
+        self._scope = scope
+        self._stream = outbound_stream
+
+    async def write(self, chunk: bytes) -> bool:
+        return await self._scope._write(self._stream, chunk)
+
+
+class TurnScope:
+    """
+    Область отмены одного хода бота.
+
+    Держит все задачи хода (проигрывание, LLM→TTS пайп) и колбэки очистки
+    (закрытие SSE-стрима LLM, сброс WebSocket-контекста TTS). `cancel()`
+    синхронно запрещает запись в выходной поток, отменяет задачи и затем
+    освобождает ресурсы, измеряя задержку cancel→тишина.
+    """
+
+    def __init__(self, turn_id: str):
+        self.turn_id = turn_id
+        self.cancelled = False
+        self.cancel_to_silence_ms: Optional[float] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._on_cancel: List[Callable[[], Awaitable[None]]] = []
+        self._writes_in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def done(self) -> bool:
+        return not self._tasks
+
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self.cancelled:
+            task.cancel()
+        return task
+
+    def on_cancel(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Регистрирует асинхронный колбэк, который вызывается только при отмене хода."""
+        self._on_cancel.append(callback)
+
+    def guard(self, outbound_stream) -> GuardedOutbound:
+        return GuardedOutbound(self, outbound_stream)
+
+    async def _write(self, stream, chunk: bytes) -> bool:
+        if self.cancelled:
+            return False
+        self._writes_in_flight += 1
+        self._idle.clear()
+        metrics.mark("first_outbound_frame")
+        try:
+            await stream.write(chunk)
+        finally:
+            self._writes_in_flight -= 1
+            if not self._writes_in_flight:
+                self._idle.set()
+        return True
+
+    async def wait(self) -> None:
+        current = asyncio.current_task()
+        pending = [t for t in self._tasks if t is not current]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def cancel(self, reason: str = "barge_in") -> Optional[float]:
+        if self.cancelled:
+            return self.cancel_to_silence_ms
+        t_cancel = time.monotonic()
+        self.cancelled = True
+
+        current = asyncio.current_task()
+        for task in list(self._tasks):
+            if task is not current:
+                task.cancel()
+
+        # Тишина наступает, когда завершилась последняя начатая запись фрейма
+        await self._idle.wait()
+        self.cancel_to_silence_ms = round((time.monotonic() - t_cancel) * 1000, 3)
+
+        await self.wait()
+        for callback in reversed(self._on_cancel):
+            try:
+                await callback()
+            except Exception as e:
+                jlog("turn_cancel_cleanup_error", turn_id=self.turn_id, error=str(e))
+
+        jlog(
+            "turn_cancelled",
+            turn_id=self.turn_id,
+            reason=reason,
+            cancel_to_silence_ms=self.cancel_to_silence_ms,
+            cleanup_ms=round((time.monotonic() - t_cancel) * 1000, 3),
+        )
+        return self.cancel_to_silence_ms
@@ -0,0 +1,139 @@
+"""
+Бенчмарк форматов аудио в Redis: старый List из WAV-чанков (как писал pydub-экспорт
+по 20 мс) против PCM1 — один String с заголовком (cache/audio_format.py).
+
+Для каждого формата пишет --prompts синтетических реплик длиной --seconds и меряет:
+MEMORY USAGE ключа, задержку выборки (LRANGE против GET, p50/p95) и CPU процесса на
+выборку с разбором до списка 20 мс фреймов PCM, готовых к отправке.
+
+    python scripts/benchmark_audio_cache.py --prompts 50 --seconds 4 --iterations 200
+
+Ключи пишутся под префиксом bench:audio: и удаляются в конце.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import statistics
+import struct
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cache.audio_format import decode_pcm, encode_pcm
+from infra.redis_config import RedisConfig
+
+SAMPLE_RATE = 8000
+FRAME_MS = 20
+PREFIX = "bench:audio:"
+
+
+def synth_pcm(seconds: float, tone_hz: float) -> bytes:
+    n = int(SAMPLE_RATE * seconds)
+    return struct.pack(f"<{n}h", *(int(8000 * math.sin(2 * math.pi * tone_hz * i / SAMPLE_RATE)) for i in range(n)))
+
+
+def wav_chunks(pcm: bytes) -> list[bytes]:
+    # Тот же результат, что AudioSegment[i:i+20].export(format="wav"): по WAV-файлу на фрейм
+    frame_bytes = SAMPLE_RATE * FRAME_MS // 1000 * 2
+    chunks = []
+    for offset in range(0, len(pcm), frame_bytes):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(SAMPLE_RATE)
+            w.writeframes(pcm[offset:offset + frame_bytes])
+        chunks.append(buffer.getvalue())
+    return chunks
+
+
+def frames_from_wav_chunks(chunks: list[bytes]) -> list[bytes]:
+    # Чтобы отдать в канал сырой PCM, старый формат приходится разбирать чанк за чанком
+    frames = []
+    for chunk in chunks:
+        with wave.open(io.BytesIO(chunk), "rb") as w:
+            frames.append(w.readframes(w.getnframes()))
+    return frames
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+async def bench_layout(client, name: str, keys: list[str], fetch, iterations: int) -> dict:
+    latencies = []
+    cpu_start = time.process_time()
+    frames = 0
+    for i in range(iterations):
+        key = keys[i % len(keys)]
+        t0 = time.perf_counter()
+        frames += len(await fetch(key))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    cpu_us = (time.process_time() - cpu_start) / iterations * 1e6
+    memory = [await client.memory_usage(k, samples=0) or 0 for k in keys]
+    return {
+        "layout": name,
+        "keys": len(keys),
+        "memory_bytes_per_key": round(statistics.mean(memory)),
+        "memory_bytes_total": sum(memory),
+        "fetch_p50_ms": round(percentile(latencies, 0.5), 3),
+        "fetch_p95_ms": round(percentile(latencies, 0.95), 3),
+        "cpu_us_per_fetch": round(cpu_us, 1),
+        "frames_per_fetch": frames // iterations,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    client = RedisConfig().build()
+    await client.ping()
+    list_keys = [f"{PREFIX}list:{i}" for i in range(args.prompts)]
+    blob_keys = [f"{PREFIX}pcm1:{i}" for i in range(args.prompts)]
+    try:
+        for i in range(args.prompts):
+            pcm = synth_pcm(args.seconds, 220 + 20 * i)
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.delete(list_keys[i]).rpush(list_keys[i], *wav_chunks(pcm))
+                pipe.set(blob_keys[i], encode_pcm(pcm, SAMPLE_RATE, frame_ms=FRAME_MS))
+                await pipe.execute()
+
+        async def fetch_list(key):
+            return frames_from_wav_chunks(await client.lrange(key, 0, -1))
+
+        async def fetch_blob(key):
+            return decode_pcm(await client.get(key)).frames()
+
+        results = [
+            await bench_layout(client, "list_of_wav", list_keys, fetch_list, args.iterations),
+            await bench_layout(client, "pcm1_blob", blob_keys, fetch_blob, args.iterations),
+        ]
+    finally:
+        await client.delete(*list_keys, *blob_keys)
+        await client.aclose()
+
+    for row in results:
+        print(json.dumps({"event": "audio_cache_benchmark", "seconds": args.seconds, **row}), flush=True)
+    old, new = results
+    print(json.dumps({
+        "event": "summary",
+        "memory_ratio": round(old["memory_bytes_per_key"] / max(1, new["memory_bytes_per_key"]), 2),
+        "p50_speedup": round(old["fetch_p50_ms"] / max(1e-6, new["fetch_p50_ms"]), 2),
+        "cpu_ratio": round(old["cpu_us_per_fetch"] / max(1e-6, new["cpu_us_per_fetch"]), 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""
+Бенчмарк кодеков хранения аудио (cache/codecs.py): PCM1 против Opus на разных битрейтах.
+
+Для каждого кодека кодирует реплики (--wav или синтетический «голос» длиной --seconds) и меряет:
+- байт на секунду аудио и прогноз памяти Redis на --prompts реплик (значение ключа —
+  ровно блоб, накладные расходы Redis на ключ одинаковы для всех кодеков);
+- время до первого фрейма: разбор заголовка и декодирование первого пакета;
+- CPU потокового декодирования, когда --calls звонков одновременно играют реплики
+  (декодеры продвигаются по фрейму по очереди, как в плейлистах): мкс на фрейм, доля
+  ядра на один звонок и сколько звонков ядро декодирует в реальном времени.
+
+    python scripts/benchmark_audio_codec.py --prompts 400 --seconds 4 --calls 200
+    python scripts/benchmark_audio_codec.py --wav prompts/audio_hello.wav --bitrates 12000,16000,24000
+
+Redis не нужен. Для Opus нужны opuslib и системная libopus.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import struct
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cache.audio_format import pcm_from_wav_file
+from cache.codecs import AudioCodec, OpusCodec, PCM, codec_for
+
+SAMPLE_RATE = 8000
+FRAME_MS = 20
+
+
+def synth_voice(seconds: float, seed: int) -> bytes:
+    # Гармоники с плавающим основным тоном, слоговая огибающая и шум: ближе к речи, чем чистый синус
+    rng = random.Random(seed)
+    n = int(SAMPLE_RATE * seconds)
+    f0 = 110 + 60 * rng.random()
+    samples, phase = [], 0.0
+    for i in range(n):
+        t = i / SAMPLE_RATE
+        pitch = f0 * (1 + 0.15 * math.sin(2 * math.pi * 0.7 * t))
+        phase += 2 * math.pi * pitch / SAMPLE_RATE
+        envelope = max(0.0, math.sin(2 * math.pi * 3.5 * t)) ** 0.5
+        voiced = sum(math.sin(k * phase) / k for k in range(1, 12))
+        samples.append(int(max(-32767, min(32767, 5000 * envelope * voiced + rng.gauss(0, 300)))))
+    return struct.pack(f"<{n}h", *samples)
+
+
+def bench_codec(label: str, codec: AudioCodec, prompts: List[bytes], args) -> dict:
+    t0 = time.process_time()
+    blobs = [codec.encode(pcm, SAMPLE_RATE, frame_ms=FRAME_MS) for pcm in prompts]
+    encode_sec = time.process_time() - t0
+    audio_sec = sum(len(pcm) for pcm in prompts) / (SAMPLE_RATE * 2)
+    bytes_per_sec = sum(len(b) for b in blobs) / audio_sec
+
+    first_frame_us = []
+    for blob in blobs:
+        t0 = time.perf_counter()
+        reader = codec_for(blob)
+        _, decoder = reader.open_stream(blob)
+        next(iter(decoder.feed(memoryview(blob)[reader.header_size:])))
+        first_frame_us.append((time.perf_counter() - t0) * 1e6)
+
+    # Одновременные звонки: у каждого свой декодер, за шаг каждый выдаёт один фрейм
+    streams = []
+    for i in range(args.calls):
+        blob = blobs[i % len(blobs)]
+        reader = codec_for(blob)
+        _, decoder = reader.open_stream(blob)
+        streams.append(iter(decoder.feed(memoryview(blob)[reader.header_size:])))
+    frames = 0
+    t0 = time.process_time()
+    while streams:
+        alive = []
+        for stream in streams:
+            if next(stream, None) is not None:
+                frames += 1
+                alive.append(stream)
+        streams = alive
+    decode_us_per_frame = (time.process_time() - t0) / max(1, frames) * 1e6
+
+    return {
+        "codec": label,
+        "bytes_per_audio_sec": round(bytes_per_sec),
+        "redis_mb_for_prompts": round(bytes_per_sec * args.seconds * args.prompts / 2**20, 2),
+        "encode_ms_per_audio_sec": round(encode_sec / audio_sec * 1000, 3),
+        "first_frame_us_p50": round(sorted(first_frame_us)[len(first_frame_us) // 2], 1),
+        "decode_us_per_frame": round(decode_us_per_frame, 2),
+        "core_share_per_call_pct": round(decode_us_per_frame / (FRAME_MS * 1000) * 100, 4),
+        "calls_per_core": int(FRAME_MS * 1000 / max(decode_us_per_frame, 1e-3)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wav", action="append", default=[], help="WAV prompt to use instead of synthetic audio (repeatable)")
+    parser.add_argument("--prompts", type=int, default=400, help="Prompt count for the Redis memory projection")
+    parser.add_argument("--seconds", type=float, default=4.0, help="Length of each prompt")
+    parser.add_argument("--calls", type=int, default=100, help="Concurrent playbacks in the decode benchmark")
+    parser.add_argument("--bitrates", type=str, default="12000,16000,24000", help="Opus bitrates, bit/s")
+    args = parser.parse_args()
+
+    if args.wav:
+        prompts = []
+        for path in args.wav:
+            pcm, sample_rate, sample_width, channels = pcm_from_wav_file(path)
+            if (sample_rate, sample_width, channels) != (SAMPLE_RATE, 2, 1):
+                sys.exit(f"{path}: expected 8 kHz s16 mono, got {sample_rate} Hz / {sample_width * 8} bit / {channels} ch")
+            prompts.append(pcm)
+    else:
+        prompts = [synth_voice(args.seconds, seed) for seed in range(8)]
+
+    results = [bench_codec("pcm1", PCM, prompts, args)]
+    for bitrate in (int(b) for b in args.bitrates.split(",") if b):
+        results.append(bench_codec(f"opus_{bitrate // 1000}k", OpusCodec(bitrate=bitrate), prompts, args))
+
+    for row in results:
+        print(json.dumps({"event": "audio_codec_benchmark", "calls": args.calls, **row}), flush=True)
+    base = results[0]
+    print(json.dumps({
+        row["codec"]: {
+            "memory_ratio": round(base["bytes_per_audio_sec"] / row["bytes_per_audio_sec"], 2),
+            "redis_mb_saved": round(base["redis_mb_for_prompts"] - row["redis_mb_for_prompts"], 2),
+            "decode_cpu_pct_per_100_calls": round(row["core_share_per_call_pct"] * 100, 2),
+        }
+        for row in results[1:]
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
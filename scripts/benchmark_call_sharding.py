@@ -0,0 +1,172 @@
+"""
+Бенчмарк шардинга звонков по процессам: сколько звонков держит узел при разном числе воркеров.
+
+STT, LLM и TTS замоканы синтетическим звонком, который на каждом ходу делает
+ту же CPU-работу, что и настоящий пайплайн (разбор JSON partial-результатов,
+скоринг интентов numpy, разбор SSE-чанков LLM, base64-декод аудио TTS),
+а сетевые задержки имитирует `asyncio.sleep`. Admission в каждом воркере
+отсекает звонки по лагу event loop, так что число принятых звонков и есть ёмкость узла.
+
+    python scripts/benchmark_call_sharding.py --workers 1,2,4 --calls 2000 --arrival-rate 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from webapi.call_host import AdmissionConfig, CallHost, CallRejected
+from webapi.supervisor import CallAssignment, Supervisor, WorkerSpec
+
+logging.basicConfig(level=logging.WARNING, format='%(message)s')
+
+FRAME_BYTES = 320  # 20 мс PCM 8 кГц
+TTS_AUDIO_B64 = base64.b64encode(os.urandom(FRAME_BYTES * 5)).decode()  # чанк TTS ~100 мс
+INTENT_MATRIX = np.random.default_rng(0).standard_normal((200, 312)).astype(np.float32)
+
+
+class SyntheticCall:
+    """Звонок с замоканными STT/LLM/TTS: CPU-работа настоящая, сеть — `asyncio.sleep`."""
+
+    def __init__(self, turns: int, partials_per_turn: int, llm_tokens: int, tts_chunks: int):
+        self.turns = turns
+        self.partials_per_turn = partials_per_turn
+        self.llm_tokens = llm_tokens
+        self.tts_chunks = tts_chunks
+
+    async def run(self, inbound_stream, outbound_stream):
+        rng = np.random.default_rng()
+        for turn in range(self.turns):
+            # STT: partial-результаты приходят каждые ~100 мс, каждый — JSON
+            for i in range(self.partials_per_turn):
+                await asyncio.sleep(0.1)
+                json.loads(json.dumps({"alternatives": [{"text": "да хочу оформить " * 3, "confidence": 0.9}], "final": False}))
+
+            # Интент: эмбеддинг приходит из модели, скоринг — numpy
+            query = rng.standard_normal(INTENT_MATRIX.shape[1]).astype(np.float32)
+            scores = INTENT_MATRIX @ query
+            np.argpartition(-scores, 2)[:2]
+
+            # LLM: SSE-чанки с JSON внутри
+            await asyncio.sleep(0.3)
+            for _ in range(self.llm_tokens):
+                line = 'data: {"choices": [{"delta": {"content": "слово "}}]}'
+                json.loads(line[6:])
+                await asyncio.sleep(0)
+
+            # TTS: base64-аудио, которое декодируется и режется на фреймы
+            await asyncio.sleep(0.15)
+            for _ in range(self.tts_chunks):
+                audio = base64.b64decode(TTS_AUDIO_B64)
+                for offset in range(0, len(audio), FRAME_BYTES):
+                    audio[offset:offset + FRAME_BYTES]
+                await asyncio.sleep(0.1)
+
+
+async def build_synthetic_host(max_loop_lag_ms: float, turns: int, partials: int, llm_tokens: int, tts_chunks: int) -> CallHost:
+    async def factory(call_id: str) -> SyntheticCall:
+        return SyntheticCall(turns, partials, llm_tokens, tts_chunks)
+
+    return CallHost(
+        factory,
+        AdmissionConfig(max_calls=10_000, max_loop_lag_p95_ms=max_loop_lag_ms, max_queued_calls=0),
+    )
+
+
+async def open_null_transport(assignment: CallAssignment):
+    return None, None
+
+
+async def run_for_workers(workers: int, args) -> dict:
+    spec = WorkerSpec(
+        host_factory=functools.partial(
+            build_synthetic_host, args.max_loop_lag_ms, args.turns, args.partials, args.llm_tokens, args.tts_chunks
+        ),
+        transport_factory=open_null_transport,
+        report_interval_sec=0.25,
+    )
+    supervisor = Supervisor(spec, workers=workers)
+    await supervisor.start()
+    await supervisor.wait_ready()
+
+    statuses: Counter = Counter()
+    peak_active = 0
+
+    async def one_call(i: int):
+        try:
+            statuses[await supervisor.run_call(f"bench-{workers}-{i}")] += 1
+        except CallRejected as e:
+            statuses[f"rejected:{e.reason}"] += 1
+
+    async def sample_load():
+        nonlocal peak_active
+        while True:
+            active = sum(s["in_flight"] for s in supervisor.stats())
+            peak_active = max(peak_active, active)
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.create_task(sample_load())
+    t_start = time.monotonic()
+    calls = []
+    for i in range(args.calls):
+        calls.append(asyncio.create_task(one_call(i)))
+        await asyncio.sleep(1 / args.arrival_rate)
+    await asyncio.gather(*calls)
+    elapsed = time.monotonic() - t_start
+    sampler.cancel()
+
+    worker_stats = supervisor.stats()
+    await supervisor.stop()
+
+    lag = [s["health"]["loop_lag_p95_ms"] for s in worker_stats if s["health"]]
+    cpu = [s["health"]["cpu_time_sec"] for s in worker_stats if s["health"]]
+    return {
+        "workers": workers,
+        "offered_calls": args.calls,
+        "completed_calls": statuses.get("done", 0),
+        "rejected_calls": sum(v for k, v in statuses.items() if k.startswith("rejected")),
+        "peak_concurrent_calls": peak_active,
+        "calls_per_sec": round(statuses.get("done", 0) / elapsed, 2),
+        "max_worker_loop_lag_p95_ms": round(max(lag), 2) if lag else None,
+        "cpu_sec_per_call": round(sum(cpu) / max(1, statuses.get("done", 0)), 4),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=str, default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--calls", type=int, default=1000, help="Calls offered per run")
+    parser.add_argument("--arrival-rate", type=float, default=100.0, help="New calls per second")
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--partials", type=int, default=8)
+    parser.add_argument("--llm-tokens", type=int, default=40)
+    parser.add_argument("--tts-chunks", type=int, default=20)
+    parser.add_argument("--max-loop-lag-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    results = []
+    for workers in [int(w) for w in args.workers.split(",")]:
+        result = await run_for_workers(workers, args)
+        results.append(result)
+        print(json.dumps({"event": "sharding_run", **result}), flush=True)
+
+    base = results[0]["peak_concurrent_calls"] / results[0]["workers"] if results[0]["peak_concurrent_calls"] else 0
+    for r in results:
+        ideal = base * r["workers"]
+        r["scaling_efficiency"] = round(r["peak_concurrent_calls"] / ideal, 2) if ideal else None
+    print(json.dumps({"event": "summary", "cpu_count": os.cpu_count(), "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+"""
+Бенчмарк микробатчинга эмбеддингов (intent_classifier/batcher.py) против текущего пути,
+где каждый embed() — отдельный инференс батчем из одной фразы через asyncio.to_thread.
+
+Для каждого числа одновременных звонков из --concurrency каждый «звонок» подряд делает
+--requests вызовов embed() с одной фразой из configs/intents.json. Меряются пропускная
+способность (эмбеддингов в секунду) и p50/p95 задержки вызова; для батчера — ещё
+средний размер батча и p95 ожидания в очереди.
+
+    python scripts/benchmark_embed_batching.py --model-path models/our_model
+    python scripts/benchmark_embed_batching.py --synthetic   # без модели: CPU-нагрузка numpy с той же формой затрат
+
+В режиме --synthetic инференс заменён матричным умножением в потоке с фиксированной
+стоимостью вызова и стоимостью на текст (--synthetic-call-ms, --synthetic-text-ms):
+форма выигрыша та же, абсолютные числа — только для реальной модели.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from intent_classifier.batcher import EmbeddingBatcher
+
+
+def load_phrases(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        intents = json.load(f)
+    phrases = [item["response"] for data in intents.values() for item in data.get("description", []) if item.get("response")]
+    return phrases or ["да, конечно"]
+
+
+class SyntheticModel:
+    """Стоимость инференса = фиксированная часть + часть на каждый текст, как у ONNX на CPU."""
+
+    def __init__(self, call_ms: float, text_ms: float, dim: int = 384):
+        self.dim = dim
+        self._weights = np.random.default_rng(0).standard_normal((dim, dim)).astype(np.float32)
+        self._call_iters = self._calibrate(call_ms)
+        self._text_iters = self._calibrate(text_ms)
+
+    def _calibrate(self, ms: float) -> int:
+        x = np.ones((16, self.dim), dtype=np.float32)
+        t0 = time.perf_counter()
+        for _ in range(50):
+            x @ self._weights
+        per_iter_ms = (time.perf_counter() - t0) / 50 * 1000
+        return max(0, round(ms / per_iter_ms))
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self._embed_sync, texts)
+
+    def _embed_sync(self, texts: List[str]) -> np.ndarray:
+        x = np.ones((16, self.dim), dtype=np.float32)
+        for _ in range(self._call_iters + self._text_iters * len(texts)):
+            x @ self._weights
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        out[:, 0] = 1.0
+        return out
+
+
+async def run_load(embed: Callable[[List[str]], Awaitable[np.ndarray]], phrases: List[str], calls: int, requests: int) -> dict:
+    latencies: List[float] = []
+
+    async def call(index: int) -> None:
+        for i in range(requests):
+            text = phrases[(index * requests + i) % len(phrases)]
+            t0 = time.perf_counter()
+            rows = await embed([text])
+            latencies.append((time.perf_counter() - t0) * 1000)
+            assert rows.shape[0] == 1
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(calls)))
+    wall = time.perf_counter() - t_start
+    latencies.sort()
+    return {
+        "throughput_per_sec": round(len(latencies) / wall, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-path", type=str, default=None, help="ONNX model dir; default is EMB_MODEL_PATH from .env")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--synthetic", action="store_true", help="Use the synthetic CPU model instead of ONNX")
+    parser.add_argument("--synthetic-call-ms", type=float, default=4.0)
+    parser.add_argument("--synthetic-text-ms", type=float, default=0.5)
+    parser.add_argument("--intents", type=str, default="configs/intents.json")
+    parser.add_argument("--concurrency", type=str, default="1,10,50,100,200")
+    parser.add_argument("--requests", type=int, default=10, help="Sequential embed() calls per simulated call")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        model = SyntheticModel(args.synthetic_call_ms, args.synthetic_text_ms)
+    else:
+        from intent_classifier.model_wrapper import OnnxModelWrapper
+
+        load_dotenv()
+        model_path = args.model_path or os.getenv("EMB_MODEL_PATH")
+        if not model_path:
+            sys.exit("Set --model-path or EMB_MODEL_PATH, or run with --synthetic")
+        model = OnnxModelWrapper(model_path, args.device)
+    phrases = load_phrases(args.intents)
+    await model.embed(phrases[:8])  # прогрев
+
+    summary = {}
+    for calls in (int(c) for c in args.concurrency.split(",") if c):
+        direct = await run_load(model.embed, phrases, calls, args.requests)
+        batcher = EmbeddingBatcher(model.embed, window_ms=args.window_ms, max_batch_size=args.max_batch_size)
+        batched = await run_load(batcher.embed, phrases, calls, args.requests)
+        stats = batcher.stats()
+        await batcher.close()
+        batched.update(mean_batch=stats["batch_size"]["mean"], queue_wait_p95_ms=stats["queue_wait"]["p95_ms"])
+        for path, row in (("direct", direct), ("batched", batched)):
+            print(json.dumps({"event": "embed_batching_benchmark", "calls": calls, "path": path, **row}), flush=True)
+        summary[calls] = {
+            "throughput_gain": round(batched["throughput_per_sec"] / direct["throughput_per_sec"], 2),
+            "p95_direct_ms": direct["p95_ms"],
+            "p95_batched_ms": batched["p95_ms"],
+        }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Микробенчмарк условий `is_required` из goals.json: eval строки (старый путь FlowEngine)
+против выражений, скомпилированных flow_engine.expressions при загрузке целей.
+
+    python scripts/benchmark_expressions.py --iterations 200000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flow_engine.expressions import compile_expression
+
+EXPRESSIONS = [
+    "session.variables.wants_inner_insurance == true",
+    "session.variables.property_value >= 1000000 and not session.variables.has_policy",
+    "session.variables.region in ['msk', 'spb'] or session.variables.is_vip == true",
+]
+
+
+def eval_path(source: str, variables: dict):
+    # Ровно то, что делал FlowEngine: eval строки на каждый поиск параметра, ошибка -> False
+    try:
+        return eval(source, {}, {"session": {"variables": variables}})
+    except Exception:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    variables = {"wants_inner_insurance": True, "property_value": 2_500_000, "region": "spb"}
+    rows = []
+    for source in EXPRESSIONS:
+        compiled = compile_expression(source)
+        code = compile(source, "<bench>", "eval")
+        n = args.iterations
+        eval_ns = timeit.timeit(lambda: eval_path(source, variables), number=n) / n * 1e9
+        code_ns = timeit.timeit(lambda: _eval_code(code, variables), number=n) / n * 1e9
+        compiled_ns = timeit.timeit(lambda: compiled({"session": {"variables": variables}}), number=n) / n * 1e9
+        row = {
+            "expression": source,
+            "compiled_result": compiled({"session": {"variables": variables}}),
+            "eval_result": eval_path(source, variables),
+            "eval_source_ns": round(eval_ns, 1),
+            "eval_bytecode_ns": round(code_ns, 1),
+            "compiled_ns": round(compiled_ns, 1),
+            "speedup_vs_eval_source": round(eval_ns / compiled_ns, 1),
+        }
+        rows.append(row)
+        print(json.dumps({"event": "expression_benchmark", **row}, ensure_ascii=False), flush=True)
+
+    load_us = timeit.timeit(lambda: [compile_expression(s) for s in EXPRESSIONS], number=1000) / 1000 / len(EXPRESSIONS) * 1e6
+    print(json.dumps({"event": "summary", "compile_us_per_expression": round(load_us, 1), "results": rows}, ensure_ascii=False, indent=2))
+
+
+def _eval_code(code, variables: dict):
+    try:
+        return eval(code, {}, {"session": {"variables": variables}})
+    except Exception:
+        return False
+
+
+if __name__ == "__main__":
+    main()
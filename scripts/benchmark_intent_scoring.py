@@ -0,0 +1,99 @@
+"""
+Бенчмарк скоринга интентов без инференса: прежний путь (словарь центроидов, np.dot в цикле
+и полная сортировка) против матрицы центроидов IntentRepository (CentroidView + выбор двух лучших).
+
+Центроиды синтетические: --intents интентов размерности --dim, стейты ждут --expected
+интентов каждый (0 — все интенты). Для каждого сочетания печатается мкс на ход для
+обоих путей и мкс на фразу при скоринге пачкой --batch фраз; лидер и второй сверяются.
+
+    python scripts/benchmark_intent_scoring.py --intents 50,500,5000 --expected 8,64,0
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Sequence
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from intent_classifier.repository import IntentRepository
+
+
+def legacy_top2(repo: IntentRepository, query: np.ndarray, expected: Sequence[str]):
+    candidate_vectors = repo.get_intent_vectors(expected)
+    scores = {intent_id: np.dot(query, centroid) for intent_id, centroid in candidate_vectors.items()}
+    sorted_scores = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return sorted_scores[0][0], sorted_scores[1][0] if len(sorted_scores) > 1 else None
+
+
+def per_call_us(fn, queries: np.ndarray, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            fn(query)
+    return (time.perf_counter() - t0) / (repeat * len(queries)) * 1e6
+
+
+def bench(intents: int, expected: int, args) -> dict:
+    rng = np.random.default_rng(intents)
+    repo = IntentRepository()
+    centroids = rng.standard_normal((intents, args.dim)).astype(np.float32)
+    repo.centroids = {f"intent_{i}": centroids[i] for i in range(intents)}
+    repo.build_index()
+    ids = list(repo.centroids)
+    k = intents if expected <= 0 else min(expected, intents)
+    states: List[tuple] = [tuple(rng.choice(ids, size=k, replace=False)) for _ in range(args.states)]
+    repo.precompute_views(states)
+
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    state = states[0]
+
+    for query in queries:
+        top = repo.top_intents(query, state)
+        assert (top.leader, top.second) == legacy_top2(repo, query, state)
+    for top, query in zip(repo.top_intents_batch(queries, state), queries):
+        assert (top.leader, top.second) == legacy_top2(repo, query, state)
+
+    legacy_us = per_call_us(lambda q: legacy_top2(repo, q, state), queries, args.repeat)
+    matrix_us = per_call_us(lambda q: repo.top_intents(q, state), queries, args.repeat)
+    batches = [queries[i:i + args.batch] for i in range(0, len(queries), args.batch)]
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for batch in batches:
+            repo.top_intents_batch(batch, state)
+    batch_us = (time.perf_counter() - t0) / (args.repeat * len(queries)) * 1e6
+    return {
+        "intents": intents,
+        "expected": k,
+        "legacy_us": round(legacy_us, 2),
+        "matrix_us": round(matrix_us, 2),
+        "batch_us_per_query": round(batch_us, 2),
+        "speedup": round(legacy_us / matrix_us, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--intents", type=str, default="50,500,5000", help="Total intents in the repository")
+    parser.add_argument("--expected", type=str, default="8,64,0", help="Expected intents per state; 0 = all")
+    parser.add_argument("--dim", type=int, default=312)
+    parser.add_argument("--states", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for intents in (int(n) for n in args.intents.split(",") if n):
+        for expected in (int(k) for k in args.expected.split(",") if k):
+            row = bench(intents, expected, args)
+            print(json.dumps({"event": "intent_scoring_benchmark", **row}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
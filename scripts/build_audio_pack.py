@@ -0,0 +1,97 @@
+"""
+Собирает локальный пак статического аудио (cache/audio_pack.py) для карты диалога.
+
+Ключи берутся из плейлистов карты (плюс --extra-key, например филлеры), аудио —
+из Redis (по умолчанию) или из манифеста JSON {ключ: путь к WAV}.
+
+    python scripts/build_audio_pack.py --out output/audio_pack.apk
+    python scripts/build_audio_pack.py --manifest configs/audio_manifest.json --out output/audio_pack.apk
+
+Ключи, которых нет в источнике, печатаются и в пак не попадают: их будет отдавать Redis.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cache.audio_format import encode_pcm, pcm_from_wav_file
+from cache.audio_pack import build_audio_pack
+from flow_engine.analysis import playlist_cache_keys
+from flow_engine.compiled import load_dialogue_model
+
+
+async def blobs_from_redis(keys: List[str]) -> Tuple[List[Tuple[str, bytes]], List[str]]:
+    from cache.cache import RedisCacheManager
+
+    cache = RedisCacheManager()
+    await cache.connect()
+    blobs, missing = [], []
+    try:
+        for key in keys:
+            audio = await cache.get_audio(key)
+            if audio is None:
+                missing.append(key)
+                continue
+            blobs.append((key, encode_pcm(
+                audio.data, audio.sample_rate, audio.sample_width, audio.channels, round(audio.frame_ms)
+            )))
+    finally:
+        await cache.close()
+    return blobs, missing
+
+
+def blobs_from_manifest(keys: List[str], manifest: Dict[str, str]) -> Tuple[List[Tuple[str, bytes]], List[str]]:
+    blobs, missing = [], []
+    for key in keys:
+        path = manifest.get(key)
+        if not path or not os.path.exists(path):
+            missing.append(key)
+            continue
+        pcm, sample_rate, sample_width, channels = pcm_from_wav_file(path)
+        blobs.append((key, encode_pcm(pcm, sample_rate, sample_width, channels)))
+    return blobs, missing
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--goals", type=str, default="configs/goals.json")
+    parser.add_argument("--dialogue-map", type=str, default="configs/dialogue_flow_with_playlists.json")
+    parser.add_argument("--extra-key", action="append", default=[], help="Additional key to pack (repeatable)")
+    parser.add_argument("--manifest", type=str, default=None, help="JSON {key: wav path}; default is to read from Redis")
+    parser.add_argument("--out", type=str, default="output/audio_pack.apk")
+    args = parser.parse_args()
+
+    t_start = time.perf_counter()
+    model = load_dialogue_model(args.goals, args.dialogue_map)
+    keys = list(dict.fromkeys([*sorted(playlist_cache_keys(model)), *args.extra_key]))
+
+    if args.manifest:
+        with open(args.manifest, "r", encoding="utf-8") as f:
+            blobs, missing = blobs_from_manifest(keys, json.load(f))
+    else:
+        blobs, missing = asyncio.run(blobs_from_redis(keys))
+
+    result = build_audio_pack(
+        args.out, blobs, metadata={"dialogue_map": os.path.abspath(args.dialogue_map), "source": args.manifest or "redis"}
+    )
+    for key in missing:
+        print(json.dumps({"event": "audio_pack_key_missing", "key": key}, ensure_ascii=False))
+    print(json.dumps({
+        "event": "audio_pack_built",
+        "path": args.out,
+        "keys": result["keys"],
+        "missing": len(missing),
+        "bytes": result["bytes"],
+        "elapsed_ms": round((time.perf_counter() - t_start) * 1000, 1),
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Локальная замена HTTP API ElevenLabs для офлайн-прогонов (prerender_audio.py, нагрузочные тесты).
+
+Отвечает на POST /v1/text-to-speech/{voice_id}/stream тем же, что и настоящий сервис
+с output_format=pcm_<rate>: потоком сырого s16 mono PCM. Аудио детерминировано —
+тон зависит от голоса и текста, длительность от длины текста, — поэтому повторный
+синтез того же текста даёт те же байты. Зависимостей, кроме стандартной библиотеки, нет.
+
+    python scripts/fake_tts_server.py --port 8765 --first-byte-ms 150 --fail-rate 0.1
+    python scripts/prerender_audio.py --tts-url http://127.0.0.1:8765
+
+--fail-rate отвечает 503 на долю запросов (проверка повторов), --drop-rate обрывает
+поток на середине (проверка, что недокачанное аудио не попадает в кэш).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import struct
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+PATH_RE = re.compile(r"^/v1/text-to-speech/([^/]+)/stream$")
+CHUNK_BYTES = 4096
+MS_PER_CHAR = 60
+
+
+def log(event: str, **fields):
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False), flush=True)
+
+
+def synth(voice_id: str, text: str, sample_rate: int, speed: float = 1.0) -> bytes:
+    seed = int.from_bytes(hashlib.sha256(f"{voice_id}|{text}".encode("utf-8")).digest()[:4], "little")
+    tone_hz = 150 + seed % 250
+    n = int(sample_rate * len(text) * MS_PER_CHAR / 1000 / max(speed, 0.1))
+    step = 2 * math.pi * tone_hz / sample_rate
+    return struct.pack(f"<{n}h", *(int(6000 * math.sin(step * i)) for i in range(n)))
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", "0")))
+    return method, target, headers, body
+
+
+async def write_response(writer: asyncio.StreamWriter, status: int, reason: str, body: bytes) -> None:
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+
+class FakeTTSServer:
+    def __init__(self, first_byte_ms: float, realtime: float, fail_rate: float, drop_rate: float, seed: int):
+        self.first_byte_ms = first_byte_ms
+        self.realtime = realtime
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # keep-alive: httpx шлёт запросы одного клиента по одному соединению
+            while (request := await read_request(reader)) is not None:
+                if not await self.respond(writer, *request):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer: asyncio.StreamWriter, method: str, target: str, headers: Dict[str, str], body: bytes) -> bool:
+        """Возвращает False, если соединение надо закрыть."""
+        self.requests += 1
+        url = urlsplit(target)
+        match = PATH_RE.match(url.path)
+        if method != "POST" or match is None:
+            await write_response(writer, 404, "Not Found", b'{"detail": "not found"}')
+            return True
+        output_format = parse_qs(url.query).get("output_format", ["pcm_8000"])[0]
+        kind, _, rate = output_format.partition("_")
+        if kind != "pcm" or not rate.isdigit():
+            await write_response(writer, 400, "Bad Request", b'{"detail": "only pcm_<rate> is supported"}')
+            return True
+        payload = json.loads(body or b"{}")
+        text = payload.get("text", "")
+        if self.rng.random() < self.fail_rate:
+            log("fake_tts_fail", text_length=len(text))
+            await write_response(writer, 503, "Service Unavailable", b'{"detail": "overloaded"}')
+            return True
+
+        speed = float(payload.get("voice_settings", {}).get("speed", 1.0))
+        pcm = synth(match.group(1), text, int(rate), speed)
+        drop_at = len(pcm) // 2 if self.rng.random() < self.drop_rate else None
+        await asyncio.sleep(self.first_byte_ms / 1000)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: audio/pcm\r\nTransfer-Encoding: chunked\r\n\r\n")
+        bytes_per_sec = int(rate) * 2
+        for offset in range(0, len(pcm), CHUNK_BYTES):
+            if drop_at is not None and offset >= drop_at:
+                log("fake_tts_drop", text_length=len(text), sent=offset)
+                return False
+            chunk = pcm[offset:offset + CHUNK_BYTES]
+            writer.write(f"{len(chunk):x}\r\n".encode("latin-1") + chunk + b"\r\n")
+            await writer.drain()
+            if self.realtime:
+                await asyncio.sleep(len(chunk) / bytes_per_sec / self.realtime)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        log("fake_tts_done", voice_id=match.group(1), text_length=len(text), bytes=len(pcm))
+        return True
+
+
+async def serve(args) -> None:
+    fake = FakeTTSServer(args.first_byte_ms, args.realtime, args.fail_rate, args.drop_rate, args.seed)
+    server = await asyncio.start_server(fake.handle, args.host, args.port)
+    log("fake_tts_listening", url=f"http://{args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-byte-ms", type=float, default=150.0)
+    parser.add_argument("--realtime", type=float, default=0.0, help="Stream at N x realtime; 0 = as fast as possible")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Share of streams cut off halfway")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -46,6 +46,25 @@ def generate_playlists(dialogue_flow: dict) -> dict:
     
     return dialogue_flow
 
+def static_texts(dialogue_flow: dict) -> dict:
+    """
+    Text of every cache key that generate_playlists derives from templates:
+    {key: text}. Used by scripts/prerender_audio.py to synthesize them.
+    """
+    texts = {}
+    for state_name, state_data in dialogue_flow.items():
+        template = state_data.get("system_response", {}).get("template")
+        if not template:
+            continue
+        if not re.search(r"\{\{.*?\}\}", template):
+            key = state_data["system_response"].get("redis_key", f"static:{state_name}")
+            texts[key] = template.strip()
+            continue
+        for i, static_part in enumerate(re.split(r"\{\{.*?\}\}", template)):
+            if static_part:
+                texts[f"static:{state_name}_part_{i}"] = static_part.strip()
+    return texts
+
 if __name__ == "__main__":
     with open("configs/dialogue_flow.json", "r", encoding="utf-8") as f:
         dialogue_data = json.load(f)
@@ -0,0 +1,208 @@
+"""
+Массовая загрузка статического аудио в Redis.
+
+Файлы декодируются и упаковываются в PCM1 (cache/audio_format.py) в пуле процессов,
+результаты пишутся в Redis несколькими конвейерами параллельно. Очереди ограничены,
+поэтому в памяти одновременно не больше нескольких пачек аудио.
+
+Запуск идемпотентен: sha256 содержимого WAV (вместе с размером фрейма и кодеком) хранится
+в хэше Redis `audio:ingest:hashes`, неизменившиеся файлы, ключи которых есть в Redis,
+пропускаются без декодирования.
+С `--codec opus` реплики хранятся сжатыми (cache/codecs.py); смена кодека перезаливает все ключи.
+
+    python scripts/ingest_static_audio.py --manifest configs/audio_manifest.json
+    python scripts/ingest_static_audio.py --wav-dir prompts/ --dialogue-map configs/dialogue_flow_with_playlists.json
+
+Манифест — JSON {ключ: путь к WAV}; с --wav-dir ключ `audio:ask_x` ищется как
+`audio:ask_x.wav` или `audio_ask_x.wav`.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cache.audio_format import pcm_from_wav_file
+from cache.codecs import get_codec
+from cache.cache import AUDIO_INVALIDATION_CHANNEL
+from infra.redis_config import RedisConfig
+
+HASHES_KEY = "audio:ingest:hashes"
+
+
+def log(event: str, **fields):
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False), flush=True)
+
+
+def codec_spec(codec: str, bitrate: int) -> str:
+    # Всё, от чего зависит блоб, кроме самого WAV: попадает в digest
+    return "pcm1" if codec == "pcm" else f"ops1:{bitrate}"
+
+
+def encode_file(
+    key: str, path: str, known_digest: Optional[str], frame_ms: int, codec: str = "pcm", bitrate: int = 16000
+) -> Tuple[str, str, Optional[bytes]]:
+    """Выполняется в процессе пула. Возвращает (ключ, digest, блоб или None, если файл не менялся)."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw + f"|{codec_spec(codec, bitrate)}|{frame_ms}".encode()).hexdigest()
+    if digest == known_digest:
+        return key, digest, None
+    try:
+        with wave.open(path, "rb") as w:
+            params = (w.getframerate(), w.getsampwidth(), w.getnchannels())
+            pcm = w.readframes(w.getnframes())
+    except (wave.Error, EOFError):
+        # Нестандартный WAV (float, extensible и т.п.) — через pydub, как load_and_set_audio
+        pcm, *params = pcm_from_wav_file(path)
+    sample_rate, sample_width, channels = params
+    options = {"bitrate": bitrate} if codec == "opus" else {}
+    encoder = get_codec(codec, **options)
+    if not encoder.supports(sample_rate, sample_width, frame_ms):
+        encoder = get_codec("pcm")  # как RedisCacheManager: формат, который кодек не держит, — в PCM1
+    return key, digest, encoder.encode(pcm, sample_rate, sample_width, channels, frame_ms)
+
+
+def resolve_sources(args) -> Tuple[Dict[str, str], List[str]]:
+    if args.manifest:
+        with open(args.manifest, "r", encoding="utf-8") as f:
+            return json.load(f), []
+
+    from flow_engine.analysis import playlist_cache_keys
+    from flow_engine.compiled import load_dialogue_model
+
+    model = load_dialogue_model(args.goals, args.dialogue_map)
+    sources, missing = {}, []
+    for key in sorted(playlist_cache_keys(model)):
+        for name in (f"{key}.wav", f"{key.replace(':', '_')}.wav"):
+            path = os.path.join(args.wav_dir, name)
+            if os.path.exists(path):
+                sources[key] = path
+                break
+        else:
+            missing.append(key)
+    return sources, missing
+
+
+async def ingest(args) -> Dict[str, int]:
+    sources, missing = resolve_sources(args)
+    for key in missing:
+        log("audio_source_missing", key=key)
+
+    client = RedisConfig().build()
+    await client.ping()
+    known = {} if args.force else {k.decode(): v.decode() for k, v in (await client.hgetall(HASHES_KEY)).items()}
+    # Ключ мог быть удалён, истечь или пропасть при FLUSH, а хэш остаться: такой ключ заливаем заново
+    candidates = [key for key in sources if key in known]
+    if candidates:
+        async with client.pipeline(transaction=False) as pipe:
+            for key in candidates:
+                pipe.exists(key)
+            present = await pipe.execute()
+        for key, exists in zip(candidates, present):
+            if not exists:
+                del known[key]
+
+    totals = {"keys": len(sources), "written": 0, "unchanged": 0, "failed": 0, "bytes": 0}
+    results: asyncio.Queue = asyncio.Queue(maxsize=args.batch * args.connections * 2)
+    in_flight = asyncio.Semaphore(args.workers * 4)
+    loop = asyncio.get_running_loop()
+
+    async def writer() -> None:
+        while True:
+            batch = [await results.get()]
+            while len(batch) < args.batch and not results.empty():
+                batch.append(results.get_nowait())
+            sentinels = batch.count(None)
+            batch = [item for item in batch if item is not None]
+            for _ in range(sentinels - 1):
+                results.put_nowait(None)  # чужие сигналы остановки возвращаем другим писателям
+            if batch:
+                try:
+                    async with client.pipeline(transaction=False) as pipe:
+                        for key, digest, blob in batch:
+                            # Хэш пишется после SET: оборванный запуск просто перезальёт ключ в следующий раз
+                            pipe.set(key, blob)
+                            pipe.hset(HASHES_KEY, key, digest)
+                            pipe.publish(AUDIO_INVALIDATION_CHANNEL, key)
+                        await pipe.execute()
+                except redis.RedisError as e:
+                    totals["failed"] += len(batch)
+                    log("audio_ingest_write_failed", keys=[key for key, _, _ in batch], error=str(e))
+                else:
+                    totals["written"] += len(batch)
+                    totals["bytes"] += sum(len(blob) for _, _, blob in batch)
+            if sentinels:
+                return
+
+    async def encode(pool: ProcessPoolExecutor, key: str, path: str) -> None:
+        try:
+            result = await loop.run_in_executor(
+                pool, encode_file, key, path, known.get(key), args.frame_ms, args.codec, args.bitrate
+            )
+        except Exception as e:
+            totals["failed"] += 1
+            log("audio_ingest_failed", key=key, path=path, error=str(e))
+            return
+        finally:
+            in_flight.release()
+        if result[2] is None:
+            totals["unchanged"] += 1
+        else:
+            await results.put(result)
+
+    writers = [asyncio.create_task(writer()) for _ in range(args.connections)]
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            tasks = []
+            for key, path in sources.items():
+                await in_flight.acquire()
+                tasks.append(asyncio.create_task(encode(pool, key, path)))
+            await asyncio.gather(*tasks)
+        for _ in writers:
+            await results.put(None)
+        await asyncio.gather(*writers)
+    finally:
+        for task in writers:
+            task.cancel()
+        await client.aclose()
+    totals["missing"] = len(missing)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", type=str, help="JSON {key: wav path}")
+    source.add_argument("--wav-dir", type=str, help="Directory with <key>.wav files for the dialogue map keys")
+    parser.add_argument("--goals", type=str, default="configs/goals.json")
+    parser.add_argument("--dialogue-map", type=str, default="configs/dialogue_flow_with_playlists.json")
+    parser.add_argument("--frame-ms", type=int, default=20)
+    parser.add_argument("--codec", choices=["pcm", "opus"], default="pcm", help="Storage codec (cache/codecs.py)")
+    parser.add_argument("--bitrate", type=int, default=16000, help="Opus bitrate per channel, bit/s")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Decoder processes")
+    parser.add_argument("--connections", type=int, default=4, help="Parallel Redis pipelines")
+    parser.add_argument("--batch", type=int, default=32, help="Keys per pipeline round trip")
+    parser.add_argument("--force", action="store_true", help="Re-ingest even if the content hash is unchanged")
+    args = parser.parse_args()
+
+    t_start = time.perf_counter()
+    totals = asyncio.run(ingest(args))
+    log("audio_ingest_done", elapsed_sec=round(time.perf_counter() - t_start, 2), **totals)
+    if totals["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Миграция аудио в Redis со старого формата (List из WAV-чанков по 20 мс) на PCM1:
+один String с заголовком и сырым PCM (cache/audio_format.py).
+
+    python scripts/migrate_audio_cache.py --pattern 'static:*' --dry-run
+    python scripts/migrate_audio_cache.py --pattern '*'
+
+Ключи других типов не трогаются. Для каждого ключа печатается MEMORY USAGE до и после.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import wave
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cache.audio_format import AudioFormatError, encode_pcm, pcm_from_wav_chunks
+from infra.redis_config import RedisConfig
+
+
+def log(event: str, **fields):
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False), flush=True)
+
+
+async def migrate_key(client, key: bytes, frame_ms: int, dry_run: bool) -> dict:
+    before = await client.memory_usage(key, samples=0)
+    # WATCH до чтения: если ключ перезапишут, пока мы его конвертируем, EXEC не пройдёт
+    async with client.pipeline(transaction=True) as pipe:
+        await pipe.watch(key)
+        chunks = await pipe.lrange(key, 0, -1)
+        pcm, sample_rate, sample_width, channels = pcm_from_wav_chunks(chunks)
+        blob = encode_pcm(pcm, sample_rate, sample_width, channels, frame_ms)
+        row = {"key": key.decode(errors="replace"), "chunks": len(chunks), "memory_before": before, "blob_bytes": len(blob)}
+        if dry_run:
+            return row
+        pipe.multi()
+        pipe.set(key, blob)
+        await pipe.execute()
+    row["memory_after"] = await client.memory_usage(key, samples=0)
+    return row
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pattern", type=str, default="*", help="SCAN MATCH pattern")
+    parser.add_argument("--frame-ms", type=int, default=20)
+    parser.add_argument("--scan-count", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    import redis.asyncio as redis
+
+    client = RedisConfig().build()
+    await client.ping()
+    totals = {"migrated": 0, "failed": 0, "memory_before": 0, "memory_after": 0}
+    try:
+        async for key in client.scan_iter(match=args.pattern, count=args.scan_count, _type="list"):
+            try:
+                row = await migrate_key(client, key, args.frame_ms, args.dry_run)
+            except (AudioFormatError, wave.Error, EOFError) as e:
+                totals["failed"] += 1
+                log("audio_key_skipped", key=key.decode(errors="replace"), error=str(e))
+                continue
+            except redis.WatchError:
+                totals["failed"] += 1
+                log("audio_key_changed_concurrently", key=key.decode(errors="replace"))
+                continue
+            totals["migrated"] += 1
+            totals["memory_before"] += row["memory_before"] or 0
+            totals["memory_after"] += row.get("memory_after") or 0
+            log("audio_key_dry_run" if args.dry_run else "audio_key_migrated", **row)
+    finally:
+        await client.aclose()
+    log("migration_done", dry_run=args.dry_run, **totals)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
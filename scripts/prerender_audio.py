@@ -0,0 +1,211 @@
+"""
+Офлайн-синтез всего статического аудио: реплики карты диалога и ответы FAQ.
+
+Что рендерится:
+- тексты шаблонов карты — ключи, которые порождает generate_playlists.py
+  (`redis_key` / `static:<стейт>` и `static:<стейт>_part_i` для шаблонов с переменными);
+- ответы FAQ из бэкапа интентов — под ключом кэша синтеза (tts_manager/result_cache.py),
+  поэтому в разговоре TTSResultCache отдаёт их без обращения к TTS; пишутся без TTL
+  и вне бюджета вытеснения;
+- --texts JSON {ключ: текст} — ключи плейлистов, текста которых в карте нет
+  (собранные вручную плейлисты summary_*, филлеры).
+
+Каждый текст синтезируется через TTSManager (тот же запрос, голос и настройки, что
+в разговоре) не более чем в --concurrency потоков, с повторами при ошибках TTS.
+Записывается только полностью полученное аудио. Хэш содержимого (голос, настройки,
+текст) хранится в `audio:render:hashes`: неизменившиеся тексты, ключи которых есть
+в Redis, пропускаются.
+
+    python scripts/prerender_audio.py --texts configs/prerender_texts.json
+    python scripts/fake_tts_server.py --port 8765 &
+    python scripts/prerender_audio.py --tts-url http://127.0.0.1:8765   # офлайн, без ElevenLabs
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cache.cache import RedisCacheManager
+from cache.codecs import get_codec
+from flow_engine.analysis import playlist_cache_keys
+from flow_engine.compiled import load_dialogue_model
+from scripts.generate_playlists import static_texts
+from tts_manager.config import load_tts_config
+from tts_manager.connection_pool import TTSConnectionError, TTSConnectionPool, TTSProtocolError
+from tts_manager.manager import TTSManager
+from tts_manager.result_cache import KEY_PREFIX, _pcm_sample_rate, normalize_text, tts_cache_key
+
+HASHES_KEY = "audio:render:hashes"
+
+
+def log(event: str, **fields):
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False), flush=True)
+
+
+@dataclass(frozen=True)
+class RenderJob:
+    key: str
+    text: str
+    source: str   # map | faq | texts
+    digest: str
+
+
+def collect_jobs(args, cfg) -> Tuple[List[RenderJob], List[str]]:
+    """Задания на синтез и ключи плейлистов, для которых нет текста."""
+    with open(args.dialogue_map, "r", encoding="utf-8") as f:
+        dialogue_flow = json.load(f)
+    texts: Dict[str, Tuple[str, str]] = {key: (text, "map") for key, text in static_texts(dialogue_flow).items()}
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts.update({key: (text, "texts") for key, text in json.load(f).items()})
+
+    model = load_dialogue_model(args.goals, args.dialogue_map)
+    referenced = playlist_cache_keys(model)
+    missing = sorted(key for key in referenced if not texts.get(key, ("",))[0].strip())
+
+    def job(key: str, text: str, source: str) -> RenderJob:
+        # Ключ кэша синтеза уже хэширует голос, модель, настройки и нормализованный текст
+        return RenderJob(key, text, source, tts_cache_key(cfg, text)[len(KEY_PREFIX):])
+
+    # Только то, что реально звучит: тексты шаблонов, на которые не ссылается ни один плейлист, не рендерим
+    jobs = [job(key, text, source) for key, (text, source) in texts.items() if key in referenced and text.strip()]
+
+    if args.intents_backup and os.path.exists(args.intents_backup):
+        with open(args.intents_backup, "rb") as f:
+            faq = pickle.load(f).get("faq", {})
+        answers = {normalize_text(entry.get("answer") or "") for entry in faq.values()}
+        jobs.extend(job(tts_cache_key(cfg, answer), answer, "faq") for answer in sorted(answers) if answer)
+    return jobs, missing
+
+
+async def synthesize(manager: TTSManager, text: str, retries: int, backoff_sec: float) -> bytes:
+    for attempt in range(retries + 1):
+        parts = []
+        try:
+            async for chunk in manager.stream_static_text(text):
+                parts.append(chunk)
+            pcm = b"".join(parts)
+            if not pcm:
+                raise TTSProtocolError("empty audio")
+            return pcm
+        except (TTSConnectionError, TTSProtocolError) as e:
+            if attempt == retries:
+                raise
+            delay = backoff_sec * 2 ** attempt
+            log("prerender_retry", call_id=manager.call_id, attempt=attempt + 1, delay_sec=delay, error=str(e))
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+async def render(args) -> Dict[str, int]:
+    cfg = load_tts_config(args.tts_config)
+    if args.tts_url:
+        cfg.http_base_url = args.tts_url
+    sample_rate = _pcm_sample_rate(cfg.http_output_format)
+    if sample_rate is None:
+        raise SystemExit(f"http_output_format must be pcm_<rate> to store audio, got '{cfg.http_output_format}'")
+
+    jobs, missing = collect_jobs(args, cfg)
+    for key in missing:
+        log("prerender_text_missing", key=key, hint="add it to --texts")
+
+    cache = RedisCacheManager(codec=get_codec(args.codec))
+    await cache.connect()
+    client = cache.redis_client
+    totals = {"jobs": len(jobs), "rendered": 0, "unchanged": 0, "failed": 0, "bytes": 0, "missing_text": len(missing)}
+    try:
+        known = {} if args.force else {k.decode(): v.decode() for k, v in (await client.hgetall(HASHES_KEY)).items()}
+        async with client.pipeline(transaction=False) as pipe:
+            for job in jobs:
+                pipe.exists(job.key)
+            present = await pipe.execute()
+        # Ключ мог быть удалён или вытеснен: тогда рендерим заново, даже если хэш совпал
+        todo = []
+        for job, exists in zip(jobs, present):
+            if exists and known.get(job.key) == job.digest:
+                totals["unchanged"] += 1
+            else:
+                todo.append(job)
+        log("prerender_plan", total=len(jobs), todo=len(todo), unchanged=totals["unchanged"])
+        if args.dry_run:
+            for job in todo:
+                log("prerender_would_render", key=job.key, source=job.source, text=job.text)
+            return totals
+
+        pool = TTSConnectionPool(
+            cfg, max_connections=args.concurrency, enable_warming=False, proxy_url=args.proxy_url
+        )
+        await pool.start()
+        queue: asyncio.Queue = asyncio.Queue()
+        for job in todo:
+            queue.put_nowait(job)
+
+        async def worker(slot: int) -> None:
+            # Свой call_id на воркер: пул держит по HTTP-соединению на звонок
+            manager = TTSManager(cfg, pool, call_id=f"prerender-{slot}")
+            while not queue.empty():
+                job = queue.get_nowait()
+                t_start = time.perf_counter()
+                try:
+                    pcm = await synthesize(manager, job.text, args.retries, args.backoff_sec)
+                except (TTSConnectionError, TTSProtocolError) as e:
+                    totals["failed"] += 1
+                    log("prerender_failed", key=job.key, source=job.source, error=str(e))
+                    continue
+                if len(pcm) % 2:
+                    pcm = pcm[:-1]
+                if not await cache.set_audio_pcm(job.key, pcm, sample_rate=sample_rate):
+                    totals["failed"] += 1
+                    log("prerender_failed", key=job.key, source=job.source, error="cache write failed")
+                    continue
+                # Хэш — после записи аудио: оборванный запуск перерендерит ключ в следующий раз
+                await client.hset(HASHES_KEY, job.key, job.digest)
+                totals["rendered"] += 1
+                totals["bytes"] += len(pcm)
+                log("prerender_done", key=job.key, source=job.source, bytes=len(pcm),
+                    audio_sec=round(len(pcm) / (sample_rate * 2), 2), ms=round((time.perf_counter() - t_start) * 1000, 1))
+
+        try:
+            await asyncio.gather(*(worker(slot) for slot in range(max(1, args.concurrency))))
+        finally:
+            await pool.close()
+    finally:
+        await cache.close()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--goals", type=str, default="configs/goals.json")
+    parser.add_argument("--dialogue-map", type=str, default="configs/dialogue_flow_with_playlists.json")
+    parser.add_argument("--intents-backup", type=str, default="configs/intents_backup.pkl", help="Source of FAQ answers")
+    parser.add_argument("--texts", type=str, default=None, help="JSON {key: text} for playlist keys without a template")
+    parser.add_argument("--tts-config", type=str, default="configs/tts_config.yml")
+    parser.add_argument("--tts-url", type=str, default=None, help="Override http_base_url, e.g. scripts/fake_tts_server.py")
+    parser.add_argument("--proxy-url", type=str, default=None)
+    parser.add_argument("--codec", choices=["pcm", "opus"], default="pcm", help="Storage codec (cache/codecs.py)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel TTS requests")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff-sec", type=float, default=0.5)
+    parser.add_argument("--force", action="store_true", help="Re-render even if the content hash is unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be rendered")
+    args = parser.parse_args()
+
+    t_start = time.perf_counter()
+    totals = asyncio.run(render(args))
+    log("prerender_finished", elapsed_sec=round(time.perf_counter() - t_start, 2), **totals)
+    if totals["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
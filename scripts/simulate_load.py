@@ -0,0 +1,80 @@
+"""
+Нагрузочный прогон звонков через настоящий Orchestrator без сети.
+
+Задержки STT/LLM/TTS/Redis берутся из распределений, подогнанных под reports/.
+Для каждого уровня конкурентности печатает перцентили хода, лаг event loop и CPU на звонок.
+
+    python scripts/simulate_load.py --concurrency 10,50,100,200 --turns 6
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flow_engine.engine import FlowEngine
+from infra.metrics import END_TO_END
+from orchestrator.simulation import load_profile, simulate_calls
+
+logging.basicConfig(level=logging.WARNING, format='%(message)s')
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=str, default="10,50,100", help="Comma-separated concurrent call counts")
+    parser.add_argument("--turns", type=int, default=6, help="User turns per call")
+    parser.add_argument("--unscripted-rate", type=float, default=0.15, help="Share of turns that go to LLM")
+    parser.add_argument("--arrival-window-sec", type=float, default=2.0)
+    parser.add_argument("--reports", type=str, default="reports")
+    parser.add_argument("--goals", type=str, default="configs/goals.json")
+    parser.add_argument("--dialogue-map", type=str, default="configs/dialogue_flow_with_playlists.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--show-profile", action="store_true")
+    args = parser.parse_args()
+
+    profile = load_profile(args.reports)
+    if args.show_profile:
+        print(json.dumps({"event": "latency_profile", **profile.describe()}, ensure_ascii=False, indent=2))
+    flow_engine = FlowEngine(args.goals, args.dialogue_map)
+
+    rows = []
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        # Оркестратор печатает отладку в stdout; в отчёт она не нужна
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = await simulate_calls(
+                concurrency,
+                flow_engine,
+                profile,
+                turns=args.turns,
+                unscripted_rate=args.unscripted_rate,
+                arrival_window_sec=args.arrival_window_sec,
+                seed=args.seed,
+            )
+        e2e = result.latency.get(END_TO_END, {})
+        row = {
+            "concurrency": concurrency,
+            "failed_calls": result.failed_calls,
+            "turns_measured": e2e.get("count", 0),
+            "e2e_p50_ms": e2e.get("p50_ms"),
+            "e2e_p95_ms": e2e.get("p95_ms"),
+            "e2e_p99_ms": e2e.get("p99_ms"),
+            "loop_lag_p95_ms": result.loop_lag_ms["p95"],
+            "loop_lag_p99_ms": result.loop_lag_ms["p99"],
+            "cpu_ms_per_call": result.cpu_ms_per_call,
+            "wall_sec": result.wall_sec,
+        }
+        rows.append(row)
+        print(json.dumps({"event": "simulation_level", **row, "stages": result.latency}, ensure_ascii=False), flush=True)
+
+    print(json.dumps({"event": "summary", "levels": rows}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
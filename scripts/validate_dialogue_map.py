@@ -0,0 +1,127 @@
+"""
+Статический анализ карты диалога и целей.
+
+Находит недостижимые стейты, переходы в несуществующие стейты, параметры целей
+с несуществующим `dialogue_state_to_ask`, битые элементы плейлистов, циклы без выхода
+и (с --check-redis) ключи аудио, которых нет в Redis. Строит таблицу стейтов,
+достижимых за k ходов, и ключей аудио, которые для них стоит держать горячими.
+
+    python scripts/validate_dialogue_map.py --within-turns 2 --reachability-out output/hot_audio.json
+    python scripts/validate_dialogue_map.py --check-redis --json
+
+Код выхода 1, если есть ошибки (с --strict — и предупреждения).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from dataclasses import asdict
+from typing import Iterable, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flow_engine.analysis import ERROR, DialogueGraph, Issue, analyze, hot_cache_keys
+from flow_engine.compiled import load_dialogue_model
+
+
+async def find_missing_cache_keys(keys: Iterable[str]) -> List[str]:
+    from cache.cache import RedisCacheManager
+
+    keys = list(keys)
+    cache = RedisCacheManager()
+    await cache.connect()
+    try:
+        async with cache.redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.exists(key)
+            exists = await pipe.execute()
+    finally:
+        await cache.close()
+    return [key for key, found in zip(keys, exists) if not found]
+
+
+def print_text_report(report, elapsed_ms: float) -> None:
+    print(f"{report.states} states, {report.transitions} transitions, "
+          f"{len(report.cache_keys)} cache keys, analyzed in {elapsed_ms:.1f} ms")
+    grouped = defaultdict(list)
+    for issue in report.issues:
+        grouped[(issue.severity, issue.kind)].append(issue)
+    for (severity, kind), issues in sorted(grouped.items(), key=lambda item: (item[0][0] != ERROR, item[0][1])):
+        print(f"\n{severity.upper()} {kind} ({len(issues)})")
+        for issue in issues:
+            print(f"  {issue.where}" + (f": {issue.detail}" if issue.detail else ""))
+    if not report.issues:
+        print("No issues found.")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--goals", type=str, default="configs/goals.json")
+    parser.add_argument("--dialogue-map", type=str, default="configs/dialogue_flow_with_playlists.json")
+    parser.add_argument("--initial-state", type=str, default="start_greeting")
+    parser.add_argument("--within-turns", type=int, default=2, help="Depth of the reachability table")
+    parser.add_argument("--reachability-out", type=str, default=None, help="Write state -> reachable states / hot audio keys JSON here")
+    parser.add_argument("--check-redis", action="store_true", help="Check that playlist cache keys exist in Redis")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--strict", action="store_true", help="Fail on warnings too")
+    args = parser.parse_args()
+
+    t_start = time.perf_counter()
+    model = load_dialogue_model(args.goals, args.dialogue_map)
+    report = analyze(model, initial_state=args.initial_state)
+    graph = DialogueGraph(model)
+    within = graph.within_turns(args.within_turns)
+    hot = hot_cache_keys(model, within)
+    elapsed_ms = (time.perf_counter() - t_start) * 1000
+
+    if args.check_redis:
+        try:
+            missing = asyncio.run(find_missing_cache_keys(sorted(report.cache_keys)))
+        except Exception as e:
+            print(f"Redis check failed: {e}", file=sys.stderr)
+            sys.exit(2)
+        for key in missing:
+            states = ", ".join(report.cache_keys[key])
+            report.issues.append(Issue("missing_cache_key", ERROR, key, f"played in {states}"))
+
+    if args.reachability_out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.reachability_out)), exist_ok=True)
+        with open(args.reachability_out, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "within_turns": args.within_turns,
+                    "states": {s: {"reachable": list(within[s]), "hot_cache_keys": list(hot[s])} for s in within},
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    if args.json:
+        print(json.dumps(
+            {
+                "states": report.states,
+                "transitions": report.transitions,
+                "analyzed_ms": round(elapsed_ms, 2),
+                "issues": [asdict(i) for i in report.issues],
+                "cache_keys": report.cache_keys,
+            },
+            ensure_ascii=False,
+            indent=2,
+        ))
+    else:
+        print_text_report(report, elapsed_ms)
+        if args.reachability_out:
+            print(f"\nReachability table ({args.within_turns} turns) written to {args.reachability_out}")
+
+    failed = report.errors or (args.strict and report.issues)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -131,6 +131,10 @@ class ConnectionManager:
         """Release a connection back to the pool."""
         await self._pool.release(connection_id)
     
+    def saturation(self) -> float:
+        """Fraction of the pool currently in use (warmup probes included)."""
+        return self._pool.saturation()
+    
     async def close(self):
         """Close the connection manager and all connections."""
         self._is_running = False
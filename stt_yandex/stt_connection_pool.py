@@ -182,6 +182,11 @@ class STTConnectionPool:
                         return conn_id, conn
                 await asyncio.sleep(0.1)
     
+    def saturation(self) -> float:
+        """Fraction of max_connections currently handed out to streams."""
+        in_use = sum(1 for conn in self._connections.values() if conn.in_use)
+        return in_use / self.max_connections if self.max_connections else 1.0
+
     async def release(self, connection_id: str) -> None:
         """Releases a connection back to the pool."""
         async with self._lock:
@@ -47,6 +47,7 @@ class YandexSTTStreamer:
         self._connection = None
         self._send_task: Optional[asyncio.Task] = None
         self._receive_task: Optional[asyncio.Task] = None
+        self._audio_started_at: Optional[float] = None  # time.monotonic() отправки первого чанка
         self._trace_id = uuid.uuid4().hex
         
         jlog(logging.INFO, "stt_conn_init", trace_id=self._trace_id)
@@ -112,6 +113,8 @@ class YandexSTTStreamer:
                     break
                     
                 t_chunk_send = time.monotonic()
+                if self._audio_started_at is None:
+                    self._audio_started_at = t_chunk_send
                 yield stt_pb2.StreamingRequest(chunk=stt_pb2.AudioChunk(data=chunk))
                 t_chunk_sent = time.monotonic()
                 
@@ -164,6 +167,12 @@ class YandexSTTStreamer:
             
         jlog(logging.INFO, "stt_stopped", trace_id=self._trace_id)
 
+    def _speech_started_at(self, alternatives) -> Optional[float]:
+        # Аудио звонка идёт в реальном времени: смещение в аудио переводится в time.monotonic()
+        if not alternatives or self._audio_started_at is None:
+            return None
+        return self._audio_started_at + alternatives[0].start_time_ms / 1000
+
     async def _receive_responses(
         self,
         stream: grpc.aio.StreamStreamCall,
@@ -177,20 +186,28 @@ class YandexSTTStreamer:
                 
                 if event_type == "partial":
                     text = response.partial.alternatives[0].text if response.partial.alternatives else ""
-                    resp = STTResponse(text, False, 0.5, utter_idx)
+                    resp = STTResponse(
+                        text, False, 0.5, utter_idx, received_at=t_parse_start,
+                        speech_started_at=self._speech_started_at(response.partial.alternatives),
+                    )
                     t_parse_end = time.monotonic()
                     jlog(logging.DEBUG, "stt_partial_parsed", 
                          trace_id=self._trace_id,
+                         utterance_index=utter_idx,
                          parse_duration_ms=round((t_parse_end - t_parse_start) * 1000, 2),
                          text_len=len(text))
                     await response_queue.put((resp, None))
                     
                 elif event_type == "final":
                     text = response.final.alternatives[0].text if response.final.alternatives else ""
-                    resp = STTResponse(text, True, 1.0, utter_idx)
+                    resp = STTResponse(
+                        text, True, 1.0, utter_idx, received_at=t_parse_start,
+                        speech_started_at=self._speech_started_at(response.final.alternatives),
+                    )
                     t_parse_end = time.monotonic()
                     jlog(logging.DEBUG, "stt_final_parsed",
                          trace_id=self._trace_id,
+                         utterance_index=utter_idx,
                          parse_duration_ms=round((t_parse_end - t_parse_start) * 1000, 2),
                          text_len=len(text))
                     await response_queue.put((resp, None))
@@ -198,7 +215,7 @@ class YandexSTTStreamer:
                     
                 elif event_type == "final_refinement":
                     text = response.final_refinement.normalized_text.alternatives[0].text if response.final_refinement.normalized_text.alternatives else ""
-                    resp = STTResponse(text, True, 1.0, utter_idx - 1)
+                    resp = STTResponse(text, True, 1.0, utter_idx - 1, received_at=t_parse_start)
                     t_parse_end = time.monotonic()
                     jlog(logging.DEBUG, "stt_refinement_parsed",
                          trace_id=self._trace_id,
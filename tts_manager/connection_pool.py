@@ -328,19 +328,48 @@ class TTSConnectionPool:
             _jlog("ws_connection_created", conn_id=conn_id)
             return websocket
     
+    def saturation(self) -> float:
+        """Доля max_connections, занятая активными звонками"""
+        if not self.max_connections:
+            return 1.0
+        return len(self.active_connection_ids) / self.max_connections
+
+    @staticmethod
+    def _connection_id(call_id: str, connection_type: ConnectionType) -> str:
+        """ID соединения звонка в пуле (совпадает с get_http_connection / get_websocket_connection)"""
+        prefix = "ws" if connection_type == ConnectionType.WEBSOCKET else "http"
+        return f"{prefix}_{call_id}"
+    
     async def release_connection(self, call_id: str, connection_type: ConnectionType):
         """Освобождает соединение для звонка"""
         if not self.enable_connection_pooling:
             _jlog("connection_released_direct", call_id=call_id, type=connection_type.value)
             return
             
-        conn_id = f"{connection_type.value}_{call_id}"
+        conn_id = self._connection_id(call_id, connection_type)
         
         async with self._lock:
             if conn_id in self.active_connection_ids:
                 self.active_connection_ids.remove(conn_id)
                 _jlog("connection_released", conn_id=conn_id)
     
+    async def discard_connection(self, call_id: str, connection_type: ConnectionType) -> bool:
+        """Закрывает и удаляет соединение звонка из пула (например, после прерванной генерации)"""
+        if not self.enable_connection_pooling:
+            return False
+
+        conn_id = self._connection_id(call_id, connection_type)
+
+        async with self._lock:
+            pooled_conn = self.connections.pop(conn_id, None)
+            self.active_connection_ids.discard(conn_id)
+
+        if pooled_conn is None:
+            return False
+        await self._close_connection(pooled_conn)
+        _jlog("connection_discarded", conn_id=conn_id)
+        return True
+    
     async def _create_websocket_connection(self) -> WebSocketClientProtocol:
         """Создает новое WebSocket соединение"""
         url = self._build_websocket_url()
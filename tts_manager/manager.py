@@ -3,13 +3,16 @@ import base64
 import json
 import logging
 import time
-from typing import AsyncGenerator, Tuple
+from typing import AsyncGenerator, List, Optional, Tuple
 
 import httpx
 from websockets.legacy.client import WebSocketClientProtocol
 
+from infra import metrics
+
 from .config import TTSConfig
 from .connection_pool import TTSConnectionPool, ConnectionType, TTSConnectionError, TTSProtocolError
+from .result_cache import TTSResultCache
 
 log = logging.getLogger("tts_manager")
 
@@ -22,13 +25,30 @@ def _jlog(event: str, **fields):
 class TTSManager:
     """Менеджер TTS с гибридной логикой (HTTP + WebSocket)"""
     
-    def __init__(self, cfg: TTSConfig, connection_pool: TTSConnectionPool, call_id: str):
+    def __init__(
+        self,
+        cfg: TTSConfig,
+        connection_pool: TTSConnectionPool,
+        call_id: str,
+        result_cache: Optional[TTSResultCache] = None,
+    ):
         self.config = cfg
         self.connection_pool = connection_pool
         self.call_id = call_id
+        self.result_cache = result_cache
+        self._ws_connection: Optional[WebSocketClientProtocol] = None
+        self._ws_tasks: List[asyncio.Task] = []
         
     async def stream_static_text(self, text: str) -> AsyncGenerator[bytes, None]:
-        """HTTP streaming для статических фраз"""
+        """HTTP streaming для статических фраз; с `result_cache` повторный текст отдаётся из кэша"""
+        if self.result_cache is None:
+            async for chunk in self._stream_http(text):
+                yield chunk
+            return
+        async for chunk in self.result_cache.stream(text, self._stream_http, call_id=self.call_id):
+            yield chunk
+
+    async def _stream_http(self, text: str) -> AsyncGenerator[bytes, None]:
         _jlog("http_request_start", text_length=len(text), call_id=self.call_id)
         request_start = time.perf_counter()
         
@@ -75,8 +95,10 @@ class TTSManager:
                     
                     async for chunk in response.aiter_bytes():
                         if not first_byte_received:
+                            metrics.mark("tts_first_byte")
                             first_byte_ms = (time.perf_counter() - request_start) * 1000
-                            _jlog("http_first_byte", ms=round(first_byte_ms, 2))
+                            _jlog("http_first_byte", ms=round(first_byte_ms, 2), call_id=self.call_id,
+                                  trace_id=metrics.current_trace_id())
                             first_byte_received = True
                         
                         total_bytes += len(chunk)
@@ -112,11 +134,37 @@ class TTSManager:
         # Запускаем фоновые задачи
         send_task = asyncio.create_task(self._ws_send_task(websocket, text_input_queue))
         receive_task = asyncio.create_task(self._ws_receive_task(websocket, audio_output_queue))
+        self._ws_connection = websocket
+        self._ws_tasks = [send_task, receive_task]
         
         _jlog("ws_stream_started", call_id=self.call_id)
         
         return text_input_queue, audio_output_queue
     
+    async def abort_llm_stream(self):
+        """
+        Прерывает текущий WebSocket-стрим (barge-in): останавливает отправку и приём,
+        а недоговорённое соединение выбрасывает из пула, чтобы следующий ход получил чистое.
+        """
+        tasks = [t for t in self._ws_tasks if not t.done()]
+        websocket = self._ws_connection
+        self._ws_tasks = []
+        self._ws_connection = None
+        if not tasks:
+            return
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        discarded = await self.connection_pool.discard_connection(self.call_id, ConnectionType.WEBSOCKET)
+        if not discarded and websocket is not None:
+            try:
+                await websocket.close()
+            except Exception as e:
+                _jlog("ws_close_error", error=str(e), call_id=self.call_id)
+        _jlog("ws_stream_aborted", call_id=self.call_id)
+
     async def _ws_send_task(self, websocket: WebSocketClientProtocol, text_queue: asyncio.Queue[str]):
         """Фоновая задача для отправки текста через WebSocket"""
         first_chunk = True
@@ -164,7 +212,9 @@ class TTSManager:
                     
                     if not first_audio_received:
                         first_audio_time = time.perf_counter()
-                        _jlog("ws_first_audio", bytes=len(audio_bytes), call_id=self.call_id)
+                        metrics.mark("tts_first_byte")
+                        _jlog("ws_first_audio", bytes=len(audio_bytes), call_id=self.call_id,
+                              trace_id=metrics.current_trace_id())
                         first_audio_received = True
                     
                     total_bytes += len(audio_bytes)
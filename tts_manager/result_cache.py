@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import unicodedata
+from typing import AsyncIterator, Callable, Optional, Set
+
+from cache.cache import AUDIO_INVALIDATION_CHANNEL
+from domain.interfaces.cache import AbstractCache, CacheNamespace
+from infra import metrics
+
+from .config import TTSConfig
+
+log = logging.getLogger("tts_manager.result_cache")
+
+KEY_PREFIX = CacheNamespace.TTS_RESULT.prefix
+INDEX_KEY = "tts:index"             # ZSET ключ -> время записи
+SIZES_KEY = "tts:index:sizes"       # HASH ключ -> байт
+TOTAL_KEY = "tts:index:bytes"       # суммарный размер проиндексированных записей
+
+# Регистрирует запись и возвращает ключи, которые надо удалить: истёкшие по TTL
+# и самые старые сверх бюджета. Атомарно, поэтому узлы не считают бюджет вразнобой.
+_REGISTER_AND_EVICT = """
+local function forget(k)
+  local size = tonumber(redis.call('HGET', KEYS[2], k) or '0')
+  redis.call('HDEL', KEYS[2], k)
+  redis.call('ZREM', KEYS[1], k)
+  redis.call('DECRBY', KEYS[3], size)
+end
+if ARGV[1] ~= '' then
+  local old = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+  redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+  redis.call('INCRBY', KEYS[3], tonumber(ARGV[2]) - old)
+  redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+end
+for _, k in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[4])) do forget(k) end
+local evicted = {}
+while tonumber(redis.call('GET', KEYS[3]) or '0') > tonumber(ARGV[5]) do
+  local oldest = redis.call('ZRANGE', KEYS[1], 0, 0)
+  if #oldest == 0 then break end
+  forget(oldest[1])
+  table.insert(evicted, oldest[1])
+end
+return evicted
+"""
+
+
+def _jlog(event: str, **fields):
+    log.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+
+def normalize_text(text: str) -> str:
+    """Тексты, которые звучат одинаково, дают один ключ: NFC, схлопнутые пробелы."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def tts_cache_key(cfg: TTSConfig, text: str) -> str:
+    """Ключ синтеза: всё, что влияет на звук, — голос, модель, настройки, формат и текст."""
+    fingerprint = json.dumps(
+        {
+            "voice_id": cfg.voice_id,
+            "model_id": cfg.model_id,
+            "voice_settings": {
+                "stability": cfg.voice_stability,
+                "similarity_boost": cfg.voice_similarity_boost,
+                "speed": cfg.voice_speed,
+            },
+            "output_format": cfg.http_output_format,
+            "optimize_streaming_latency": cfg.optimize_streaming_latency,
+            "language_code": cfg.language_code,
+            "text": normalize_text(text),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return KEY_PREFIX + hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+def _pcm_sample_rate(output_format: str) -> Optional[int]:
+    # "pcm_8000" -> 8000; mp3/ulaw и прочее в PCM1 не ложится и не кэшируется
+    kind, _, rate = output_format.partition("_")
+    return int(rate) if kind == "pcm" and rate.isdigit() else None
+
+
+class TTSResultCache:
+    """
+    Write-through кэш синтезированного аудио для `TTSManager.stream_static_text`.
+
+    Попадание отдаёт фреймы из кэша сразу (через L1 — без сети). Промах проксирует
+    поток TTS и параллельно копит его; если поток дошёл до конца (не прерван
+    перебиванием), аудио пишется в кэш фоновой задачей. Записи живут `ttl_sec`,
+    а при наличии `redis_client` суммарный объём ограничен `max_bytes`:
+    самые старые записи удаляются первыми.
+    """
+
+    def __init__(
+        self,
+        cache: AbstractCache,
+        cfg: TTSConfig,
+        ttl_sec: int = 7 * 24 * 3600,
+        max_bytes: int = 512 * 1024 * 1024,
+        max_item_bytes: int = 2 * 1024 * 1024,
+        redis_client=None,
+    ):
+        self.cache = cache
+        self.cfg = cfg
+        self.ttl_sec = ttl_sec
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.redis_client = redis_client
+        self.sample_rate = _pcm_sample_rate(cfg.http_output_format)
+        self._evict_script = redis_client.register_script(_REGISTER_AND_EVICT) if redis_client is not None else None
+        self._pending: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate is not None
+
+    def key_for(self, text: str) -> str:
+        return tts_cache_key(self.cfg, text)
+
+    async def stream(self, text: str, synthesize: Callable[[str], AsyncIterator[bytes]], call_id: str = "") -> AsyncIterator[bytes]:
+        if not self.enabled:
+            async for chunk in synthesize(text):
+                yield chunk
+            return
+
+        key = self.key_for(text)
+        t_start = time.perf_counter()
+        audio = await self.cache.get_audio(key)
+        if audio is not None:
+            self.hits += 1
+            metrics.mark("tts_first_byte")
+            _jlog("tts_cache_hit", key=key, call_id=call_id, frames=audio.frame_count,
+                  lookup_ms=round((time.perf_counter() - t_start) * 1000, 3))
+            for frame in audio.iter_frames():
+                yield frame
+            return
+
+        self.misses += 1
+        parts = []
+        size = 0
+        completed = False
+        try:
+            async for chunk in synthesize(text):
+                if size <= self.max_item_bytes:
+                    parts.append(bytes(chunk))
+                    size += len(chunk)
+                yield chunk
+            completed = True
+        finally:
+            # Оборванный поток (перебивание, ошибка TTS) не кэшируем: в нём не весь текст
+            if completed and 0 < size <= self.max_item_bytes:
+                task = asyncio.create_task(self._store(key, b"".join(parts), call_id))
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+
+    async def _store(self, key: str, pcm: bytes, call_id: str) -> None:
+        if len(pcm) % 2:
+            pcm = pcm[:-1]  # s16: полусэмпл в хвосте — обрыв потока на границе байта
+        ok = await self.cache.set_audio_pcm(key, pcm, sample_rate=self.sample_rate, ttl_seconds=self.ttl_sec)
+        if not ok:
+            return
+        self.stored += 1
+        evicted = []
+        if self._evict_script is not None:
+            now = time.time()
+            try:
+                evicted = await self._evict_script(
+                    keys=[INDEX_KEY, SIZES_KEY, TOTAL_KEY],
+                    args=[key, len(pcm), now, now - self.ttl_sec, self.max_bytes],
+                )
+                if evicted:
+                    async with self.redis_client.pipeline(transaction=False) as pipe:
+                        pipe.delete(*evicted)
+                        for evicted_key in evicted:
+                            pipe.publish(AUDIO_INVALIDATION_CHANNEL, evicted_key)
+                        await pipe.execute()
+                    self.evicted += len(evicted)
+            except Exception as e:
+                _jlog("tts_cache_evict_error", key=key, error=str(e))
+        _jlog("tts_cache_stored", key=key, call_id=call_id, bytes=len(pcm), evicted=len(evicted))
+
+    async def close(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "stored": self.stored, "evicted": self.evicted}
@@ -0,0 +1,422 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import yaml
+
+from cache.audio_pack import AudioPackCache
+from cache.cache import RedisCacheManager
+from cache.codecs import get_codec
+from cache.l1 import L1AudioCache
+from domain.interfaces.cache import AbstractCache
+from domain.stt_models import STTConfig
+from flow_engine.analysis import playlist_cache_keys
+from flow_engine.engine import FlowEngine
+from infra.metrics import EventLoopLagMonitor
+from intent_classifier.classifier import IntentClassifier
+from intent_classifier.entity_extractors import BooleanExtractor, SimpleNumericExtractor
+from intent_classifier.model_manager import ModelManager
+from llm.connection import LLMConnectionManagerImpl
+from llm.manager import ConversationManager
+from orchestrator.orchestrator import Orchestrator, create_orchestrator_instance
+from stt_yandex.connection_manager import ConnectionManager
+from stt_yandex.stt_yandex import YandexSTTStreamer
+from tts_manager.config import TTSConfig, load_tts_config
+from tts_manager.connection_pool import TTSConnectionPool
+from tts_manager.manager import TTSManager
+from tts_manager.result_cache import TTSResultCache
+from webapi.config_registry import ConfigPaths, ConfigRegistry
+from webapi.voice_node.config import config as voice_node_config
+
+logger = logging.getLogger("webapi.call_host")
+
+
+def jlog(event: str, **fields):
+    logger.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+
+OrchestratorFactory = Callable[[str], Awaitable[Orchestrator]]
+
+
+class CallRejected(RuntimeError):
+    """Звонок не принят: узел на пределе и очередь ожидания не помогла."""
+
+    def __init__(self, call_id: str, reason: str):
+        super().__init__(f"call {call_id} rejected: {reason}")
+        self.call_id = call_id
+        self.reason = reason
+
+
+@dataclass
+class AdmissionConfig:
+    max_calls: int = 200
+    max_loop_lag_p95_ms: float = 20.0
+    max_pool_saturation: float = 0.9
+    max_queued_calls: int = 20
+    queue_timeout_sec: float = 2.0
+    recheck_interval_sec: float = 0.05
+
+
+@dataclass
+class HostStats:
+    active_calls: int
+    queued_calls: int
+    loop_lag_p95_ms: float
+    saturation: Dict[str, float]
+    admitted: int
+    rejected: Dict[str, int] = field(default_factory=dict)
+
+
+class AdmissionController:
+    """
+    Решает, можно ли принять ещё один звонок, до того как вырастет задержка.
+
+    Сигналы: жёсткий лимит звонков, p95 лага event loop и заполненность
+    общих пулов (STT/TTS). Если узел занят, звонок ждёт в ограниченной FIFO-очереди
+    не дольше `queue_timeout_sec`, затем получает `CallRejected`.
+    """
+
+    def __init__(
+        self,
+        config: AdmissionConfig,
+        lag_monitor: EventLoopLagMonitor,
+        saturation_probes: Optional[Dict[str, Callable[[], float]]] = None,
+    ):
+        self.config = config
+        self.lag_monitor = lag_monitor
+        self.saturation_probes = saturation_probes or {}
+        self._waiters: Deque[str] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def saturation(self) -> Dict[str, float]:
+        return {name: round(probe(), 3) for name, probe in self.saturation_probes.items()}
+
+    def check(self, active_calls: int) -> Optional[str]:
+        """Причина отказа или None, если звонок можно принять прямо сейчас."""
+        if active_calls >= self.config.max_calls:
+            return "max_calls"
+        if self.lag_monitor.percentile(95) > self.config.max_loop_lag_p95_ms:
+            return "loop_lag"
+        for name, probe in self.saturation_probes.items():
+            if probe() >= self.config.max_pool_saturation:
+                return f"{name}_saturated"
+        return None
+
+    async def admit(self, call_id: str, active_calls: Callable[[], int]) -> float:
+        """Ждёт свободного места и возвращает время ожидания в мс."""
+        reason = self.check(active_calls())
+        if reason is None and not self._waiters:
+            return 0.0
+        if len(self._waiters) >= self.config.max_queued_calls:
+            raise CallRejected(call_id, "queue_full")
+
+        t_start = time.monotonic()
+        deadline = t_start + self.config.queue_timeout_sec
+        self._waiters.append(call_id)
+        try:
+            while True:
+                # Только голова очереди занимает освободившееся место, чтобы новые звонки не обгоняли ждущих
+                if self._waiters[0] == call_id:
+                    reason = self.check(active_calls())
+                    if reason is None:
+                        return round((time.monotonic() - t_start) * 1000, 2)
+                if time.monotonic() >= deadline:
+                    raise CallRejected(call_id, reason or "queue_timeout")
+                await asyncio.sleep(self.config.recheck_interval_sec)
+        finally:
+            self._waiters.remove(call_id)
+
+
+class CallHost:
+    """
+    Хост множества звонков в одном event loop.
+
+    Каждый звонок получает свой `Orchestrator` от фабрики, а тяжёлые ресурсы
+    (модель эмбеддингов, пулы STT/TTS, HTTP-клиент LLM, Redis) общие — см. `SharedResources`.
+    """
+
+    def __init__(
+        self,
+        orchestrator_factory: OrchestratorFactory,
+        admission_config: Optional[AdmissionConfig] = None,
+        saturation_probes: Optional[Dict[str, Callable[[], float]]] = None,
+        lag_monitor: Optional[EventLoopLagMonitor] = None,
+        on_close: Optional[Callable[[], Awaitable[None]]] = None,
+        on_call_end: Optional[Callable[[Orchestrator], None]] = None,
+    ):
+        self.orchestrator_factory = orchestrator_factory
+        self._on_close = on_close
+        self._on_call_end = on_call_end
+        self.lag_monitor = lag_monitor or EventLoopLagMonitor()
+        self.admission = AdmissionController(
+            admission_config or AdmissionConfig(), self.lag_monitor, saturation_probes
+        )
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._admitted = 0
+        self._rejected: Counter = Counter()
+        self._closing = False
+
+    @classmethod
+    def from_shared_resources(
+        cls,
+        resources: SharedResources,
+        admission_config: Optional[AdmissionConfig] = None,
+    ) -> CallHost:
+        return cls(
+            resources.create_orchestrator,
+            admission_config=admission_config,
+            saturation_probes=resources.saturation_probes(),
+            on_close=resources.close,
+            on_call_end=resources.release_orchestrator,
+        )
+
+    @property
+    def active_calls(self) -> int:
+        return len(self._calls)
+
+    def start(self) -> None:
+        self.lag_monitor.start()
+
+    def stats(self) -> HostStats:
+        return HostStats(
+            active_calls=self.active_calls,
+            queued_calls=self.admission.queued,
+            loop_lag_p95_ms=round(self.lag_monitor.percentile(95), 3),
+            saturation=self.admission.saturation(),
+            admitted=self._admitted,
+            rejected=dict(self._rejected),
+        )
+
+    async def handle_call(self, call_id: str, inbound_stream, outbound_stream) -> None:
+        """Проводит звонок целиком. Бросает `CallRejected`, если узел не может его принять."""
+        if self._closing:
+            self._reject(call_id, "host_closing")
+        if call_id in self._calls:
+            self._reject(call_id, "duplicate_call_id")
+        try:
+            waited_ms = await self.admission.admit(call_id, lambda: self.active_calls)
+        except CallRejected as e:
+            self._reject(call_id, e.reason)
+
+        self._calls[call_id] = asyncio.current_task()
+        self._admitted += 1
+        t_start = time.monotonic()
+        jlog("call_admitted", call_id=call_id, waited_ms=waited_ms, active_calls=self.active_calls)
+        orchestrator = None
+        try:
+            orchestrator = await self.orchestrator_factory(call_id)
+            await orchestrator.run(inbound_stream, outbound_stream)
+        finally:
+            self._calls.pop(call_id, None)
+            if orchestrator is not None and self._on_call_end:
+                self._on_call_end(orchestrator)
+            jlog(
+                "call_finished",
+                call_id=call_id,
+                duration_ms=round((time.monotonic() - t_start) * 1000, 2),
+                active_calls=self.active_calls,
+            )
+
+    def _reject(self, call_id: str, reason: str) -> None:
+        self._rejected[reason] += 1
+        stats = self.stats()
+        jlog(
+            "call_rejected",
+            call_id=call_id,
+            reason=reason,
+            active_calls=stats.active_calls,
+            loop_lag_p95_ms=stats.loop_lag_p95_ms,
+            saturation=stats.saturation,
+        )
+        raise CallRejected(call_id, reason)
+
+    async def close(self, drain_timeout_sec: float = 30.0) -> None:
+        """Перестаёт принимать звонки, ждёт текущие и отменяет оставшиеся по таймауту."""
+        self._closing = True
+        calls = list(self._calls.values())
+        if calls:
+            _, pending = await asyncio.wait(calls, timeout=drain_timeout_sec)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self.lag_monitor.stop()
+        if self._on_close:
+            await self._on_close()
+        jlog("call_host_closed", admitted=self._admitted, rejected=dict(self._rejected))
+
+
+@dataclass
+class SharedResources:
+    """Ресурсы, которые создаются один раз на процесс и разделяются всеми звонками."""
+    cache: AbstractCache
+    config_registry: ConfigRegistry
+    llm_config: Dict[str, Any]
+    prompts: Dict[str, Any]
+    llm_connection: LLMConnectionManagerImpl
+    stt_config: STTConfig
+    iam_token: str
+    folder_id: str
+    tts_config: TTSConfig
+    tts_pool: TTSConnectionPool
+    tts_result_cache: TTSResultCache
+    neutral_fillers_keys: List[str]
+    non_secure_response: str
+
+    @property
+    def flow_engine(self) -> FlowEngine:
+        return self.config_registry.current.flow_engine
+
+    @property
+    def intent_classifier(self) -> IntentClassifier:
+        return self.config_registry.current.intent_classifier
+
+    @classmethod
+    async def create(
+        cls,
+        model_path: str,
+        configs_dir: str = "configs",
+        intents_backup: str = "intents_backup.pkl",
+        dialogue_map_file: str = "dialogue_flow_with_playlists.json",
+        goals_file: str = "goals.json",
+        device: str = "cpu",
+        classifier_config: Optional[Dict[str, Any]] = None,
+        stt_max_connections: int = 100,
+        tts_max_connections: int = 100,
+        tts_proxy_url: Optional[str] = None,
+        neutral_fillers_keys: Optional[List[str]] = None,
+        non_secure_response: str = "",
+        config_poll_interval_sec: float = 2.0,
+        audio_l1_max_bytes: int = 64 * 1024 * 1024,
+        preload_audio: bool = True,
+        audio_pack_path: Optional[str] = None,
+        tts_cache_ttl_sec: int = 7 * 24 * 3600,
+        tts_cache_max_bytes: int = 512 * 1024 * 1024,
+        audio_codec: str = "pcm",
+    ) -> SharedResources:
+        def path(name: str) -> str:
+            return os.path.join(configs_dir, name)
+
+        # Статика — из mmap-пака (общий для воркеров через page cache), остальное — из L1, Redis — только на промах
+        # audio_codec влияет только на запись (результаты TTS); читаются ключи в любом кодеке.
+        # get_codec падает сразу, если для opus нет libopus, а синглтон Redis — если кодек уже задан другой
+        l1_cache = L1AudioCache(RedisCacheManager(codec=get_codec(audio_codec)), max_bytes=audio_l1_max_bytes)
+        pack = AudioPackCache(audio_pack_path, fallback=l1_cache) if audio_pack_path else None
+        cache: AbstractCache = pack if pack is not None else l1_cache
+        await cache.connect()
+
+        # Карта диалога, цели и векторы интентов перечитываются на лету; ONNX-модель грузится один раз
+        classifier_config = classifier_config or {"thresholds": {"confidence": 0.4, "gap": 0.05}, "faq": {"confidence": 0.55}}
+        extractors = {"simple_numeric": SimpleNumericExtractor(), "boolean": BooleanExtractor()}
+        config_registry = ConfigRegistry(
+            ConfigPaths(goals=path(goals_file), dialogue_map=path(dialogue_map_file), intents_backup=path(intents_backup)),
+            classifier_factory=lambda repo: IntentClassifier(model_path, repo, classifier_config, extractors, device=device),
+            poll_interval_sec=config_poll_interval_sec,
+        )
+        await config_registry.start()
+        # Эмбеддинги частых фраз общие для узлов: промах LRU сначала идёт в Redis, потом в модель
+        ModelManager.get_instance().attach_redis(l1_cache.backend.redis_client)
+        if preload_audio:
+            keys = [*playlist_cache_keys(config_registry.current.flow_engine.model), *(neutral_fillers_keys or [])]
+            await l1_cache.preload([k for k in keys if pack is None or k not in pack])
+
+        with open(path("config.yml"), "r") as f:
+            llm_config = yaml.safe_load(f)
+        with open(path("prompts.yml"), "r") as f:
+            prompts = yaml.safe_load(f)
+        llm_section = llm_config["llm"]
+        llm_connection = LLMConnectionManagerImpl(
+            api_key=llm_section["api_key"],
+            timeout=llm_section["http_timeout_sec"],
+            keep_alive_interval=llm_section["keep_alive_interval_sec"],
+        )
+        await llm_connection.get_client()
+
+        with open(path("stt_config.yml"), "r") as f:
+            stt_config = STTConfig(**yaml.safe_load(f))
+        iam_token = os.getenv("YC_IAM_TOKEN", "")
+        folder_id = os.getenv("YC_FOLDER_ID", "")
+        YandexSTTStreamer.initialize_pool(stt_config, iam_token, folder_id, max_connections=stt_max_connections)
+
+        tts_config = load_tts_config(path("tts_config.yml"))
+        tts_pool = TTSConnectionPool(tts_config, max_connections=tts_max_connections, proxy_url=tts_proxy_url)
+        await tts_pool.start()
+        # Синтез одинаковых фраз кэшируется в Redis (и L1) с TTL и общим бюджетом по объёму
+        tts_result_cache = TTSResultCache(
+            cache, tts_config, ttl_sec=tts_cache_ttl_sec, max_bytes=tts_cache_max_bytes,
+            redis_client=l1_cache.backend.redis_client,
+        )
+
+        jlog(
+            "shared_resources_ready",
+            stt_max_connections=stt_max_connections,
+            tts_max_connections=tts_max_connections,
+        )
+        return cls(
+            cache=cache,
+            config_registry=config_registry,
+            llm_config=llm_config,
+            prompts=prompts,
+            llm_connection=llm_connection,
+            stt_config=stt_config,
+            iam_token=iam_token,
+            folder_id=folder_id,
+            tts_config=tts_config,
+            tts_pool=tts_pool,
+            tts_result_cache=tts_result_cache,
+            neutral_fillers_keys=neutral_fillers_keys or [],
+            non_secure_response=non_secure_response,
+        )
+
+    def saturation_probes(self) -> Dict[str, Callable[[], float]]:
+        return {
+            "stt": ConnectionManager.get_instance().saturation,
+            "tts": self.tts_pool.saturation,
+        }
+
+    async def create_orchestrator(self, call_id: str) -> Orchestrator:
+        """Фабрика для `CallHost`: на звонок создаются только лёгкие объекты с его состоянием."""
+        llm_manager = ConversationManager(
+            self.llm_config, self.prompts, self.cache, call_id, connection_manager=self.llm_connection
+        )
+        await llm_manager.initialize()
+        # Звонок до конца работает с версией конфигов, актуальной на момент его начала
+        config = self.config_registry.current
+        orchestrator = await create_orchestrator_instance(
+            call_id=call_id,
+            flow_engine=config.flow_engine,
+            intent_classifier=config.intent_classifier,
+            llm_manager=llm_manager,
+            tts_manager=TTSManager(self.tts_config, self.tts_pool, call_id, result_cache=self.tts_result_cache),
+            stt_streamer=YandexSTTStreamer(self.stt_config, self.iam_token, self.folder_id),
+            cache=self.cache,
+            neutral_fillers_keys=self.neutral_fillers_keys,
+            non_secure_response=self.non_secure_response,
+            dialogue_map=config.dialogue_map,
+            bytes_per_frame=voice_node_config.bytes_per_frame,
+        )
+        config.attach(orchestrator)
+        return orchestrator
+
+    def release_orchestrator(self, orchestrator: Orchestrator) -> None:
+        """Звонок завершён: его версия конфигов больше не занята им и может быть выведена."""
+        self.config_registry.detach(orchestrator)
+
+    async def close(self) -> None:
+        await self.config_registry.stop()
+        await self.tts_result_cache.close()
+        await self.tts_pool.close()
+        await YandexSTTStreamer.close_pool()
+        await self.llm_connection.shutdown()
+        await ModelManager.close()
+        await self.cache.close()
+        jlog("shared_resources_closed")
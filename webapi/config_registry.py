@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from flow_engine.analysis import analyze
+from flow_engine.compiled import CompiledDialogueModel
+from flow_engine.engine import FlowEngine
+from flow_engine.utils import load_json_config
+from infra import metrics
+from intent_classifier.classifier import IntentClassifier
+from intent_classifier.repository import IntentRepository
+
+logger = logging.getLogger("webapi.config_registry")
+
+
+def jlog(event: str, **fields):
+    logger.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+
+Fingerprint = Tuple[Tuple[str, int, int], ...]
+
+
+@dataclass(frozen=True)
+class ConfigPaths:
+    goals: str
+    dialogue_map: str
+    intents_backup: str
+
+    def all(self) -> Tuple[str, ...]:
+        return (self.goals, self.dialogue_map, self.intents_backup)
+
+
+def fingerprint(paths: ConfigPaths) -> Fingerprint:
+    """(путь, mtime_ns, размер) для каждого файла; отсутствующий файл даёт (-1, -1)."""
+    result = []
+    for path in paths.all():
+        try:
+            st = os.stat(path)
+            result.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            result.append((path, -1, -1))
+    return tuple(result)
+
+
+@dataclass
+class ConfigVersion:
+    """Одна скомпилированная версия конфигов. Звонок держит свою версию до конца."""
+    version: int
+    flow_engine: FlowEngine
+    intent_classifier: IntentClassifier
+    fingerprint: Fingerprint
+    compile_ms: float = 0.0
+    created_at: float = field(default_factory=time.time)
+    _calls: Set[object] = field(default_factory=set, repr=False)
+
+    @property
+    def dialogue_map(self):
+        return self.flow_engine.dialogue_map
+
+    def attach(self, call_object) -> None:
+        """Привязывает объект звонка (оркестратор): версия занята, пока звонок не вызовет `detach`."""
+        self._calls.add(call_object)
+
+    def detach(self, call_object) -> None:
+        self._calls.discard(call_object)
+
+    @property
+    def active_calls(self) -> int:
+        return len(self._calls)
+
+
+class ConfigRegistry:
+    """
+    Версионированные конфиги диалога: goals.json, карта диалога и бэкап интентов.
+
+    Фоновая задача раз в `poll_interval_sec` сверяет mtime/размер файлов и при изменении
+    компилирует новую версию в отдельном потоке (JSON, модель диалога, pickle с векторами),
+    после чего атомарно подменяет `current`. Новые звонки берут новую версию, текущие
+    доигрывают со своей. ONNX-модель, пулы STT/TTS и клиент LLM не трогаются:
+    новый `IntentClassifier` переиспользует уже запущенный `ModelManager`.
+    Если новая версия не компилируется, остаётся прежняя.
+    """
+
+    def __init__(
+        self,
+        paths: ConfigPaths,
+        classifier_factory: Callable[[IntentRepository], IntentClassifier],
+        poll_interval_sec: float = 2.0,
+        settle_sec: float = 0.5,
+    ):
+        self.paths = paths
+        self.classifier_factory = classifier_factory
+        self.poll_interval_sec = poll_interval_sec
+        # Файл могут писать по частям: ждём, пока fingerprint перестанет меняться
+        self.settle_sec = settle_sec
+        self._current: Optional[ConfigVersion] = None
+        self._retiring: List[ConfigVersion] = []
+        self._failed_fingerprint: Optional[Fingerprint] = None  # не пересобираем сломанные файлы, пока их не поправят
+        self._next_version = 1
+        self._reload_lock = asyncio.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+        self.reloads = 0
+        self.failed_reloads = 0
+
+    @property
+    def current(self) -> ConfigVersion:
+        if self._current is None:
+            raise RuntimeError("ConfigRegistry is not started")
+        return self._current
+
+    async def start(self) -> ConfigVersion:
+        if self._current is None:
+            await self.reload(force=True)
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch_loop())
+        return self.current
+
+    async def stop(self) -> None:
+        if self._watch_task:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+    def _compile(self, paths: ConfigPaths) -> Tuple[CompiledDialogueModel, IntentRepository, int]:
+        # Выполняется в потоке: разбор JSON, компиляция выражений, загрузка векторов интентов
+        model = CompiledDialogueModel(load_json_config(paths.goals), load_json_config(paths.dialogue_map))
+        repo = IntentRepository()
+        repo.load_from_backup(paths.intents_backup)
+        repo.precompute_views(state.expected_intents for state in model.states.values())
+        analysis_errors = len(analyze(model).errors)
+        return model, repo, analysis_errors
+
+    async def reload(self, force: bool = False) -> Optional[ConfigVersion]:
+        """Компилирует и публикует новую версию, если файлы изменились. Возвращает её или None."""
+        async with self._reload_lock:
+            fp = await asyncio.to_thread(fingerprint, self.paths)
+            if not force and self._current is not None and fp in (self._current.fingerprint, self._failed_fingerprint):
+                return None
+
+            t_compile = time.monotonic()
+            try:
+                model, repo, analysis_errors = await asyncio.to_thread(self._compile, self.paths)
+                classifier = self.classifier_factory(repo)
+            except Exception as e:
+                self.failed_reloads += 1
+                self._failed_fingerprint = fp
+                jlog("config_reload_failed", error=str(e), version=self._current.version if self._current else None)
+                if self._current is None:
+                    raise
+                return None
+            compile_ms = round((time.monotonic() - t_compile) * 1000, 2)
+
+            new_version = ConfigVersion(
+                version=self._next_version,
+                flow_engine=FlowEngine.from_model(model),
+                intent_classifier=classifier,
+                fingerprint=fp,
+                compile_ms=compile_ms,
+            )
+            self._next_version += 1
+
+            t_swap = time.perf_counter()
+            previous, self._current = self._current, new_version
+            swap_ms = round((time.perf_counter() - t_swap) * 1000, 4)
+
+            if previous is not None:
+                self._retiring.append(previous)
+                self.reloads += 1
+            metrics.latency_registry.record("config_compile", compile_ms)
+            metrics.latency_registry.record("config_swap", swap_ms)
+            changed = [p for (p, *old), (_, *new) in zip(previous.fingerprint, fp) if old != new] if previous else list(self.paths.all())
+            jlog(
+                "config_reloaded",
+                version=new_version.version,
+                previous_version=previous.version if previous else None,
+                changed=changed,
+                compile_ms=compile_ms,
+                swap_ms=swap_ms,
+                states=len(model.states),
+                intents=len(repo.centroids),
+                analysis_errors=analysis_errors,
+                calls_on_previous=previous.active_calls if previous else 0,
+            )
+            return new_version
+
+    def detach(self, call_object) -> None:
+        """Звонок завершён: отвязывает его от версии, на которой он начался."""
+        for version in (self._current, *self._retiring):
+            if version is not None:
+                version.detach(call_object)
+
+    def _collect_retired(self) -> None:
+        for version in list(self._retiring):
+            if version.active_calls == 0:
+                self._retiring.remove(version)
+                jlog("config_version_retired", version=version.version,
+                     lifetime_sec=round(time.time() - version.created_at, 1))
+
+    async def _watch_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval_sec)
+            try:
+                self._collect_retired()
+                fp = await asyncio.to_thread(fingerprint, self.paths)
+                if fp in (self.current.fingerprint, self._failed_fingerprint):
+                    continue
+                await asyncio.sleep(self.settle_sec)
+                if await asyncio.to_thread(fingerprint, self.paths) != fp:
+                    continue  # ещё пишется, проверим на следующем круге
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                jlog("config_watch_error", error=str(e))
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "version": self._current.version if self._current else None,
+            "active_calls": self._current.active_calls if self._current else 0,
+            "retiring_versions": {v.version: v.active_calls for v in self._retiring},
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+        }
@@ -0,0 +1,125 @@
+"""
+Точка входа узла: супервизор и N процессов-воркеров, в каждом свой `CallHost`.
+
+    python -m webapi.main --workers 4 --transport mypkg.sip:open_call
+
+Звонки приходят по управляющему TCP-сокету построчно в JSON:
+`{"call_id": "...", "payload": {...}}` -> `{"call_id": "...", "status": "done"}` по завершении.
+`--transport` — асинхронная функция `(CallAssignment) -> (inbound, outbound)`, открывающая медиапотоки звонка.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import functools
+import importlib
+import json
+import logging
+import os
+import signal
+
+from dotenv import load_dotenv
+
+from webapi.call_host import AdmissionConfig, CallHost, CallRejected, SharedResources
+from webapi.supervisor import CallAssignment, Supervisor, WorkerSpec
+
+logger = logging.getLogger("webapi.main")
+
+
+def jlog(event: str, **fields):
+    logger.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+
+def _resolve(path: str):
+    module_name, attr = path.split(":", 1)
+    return getattr(importlib.import_module(module_name), attr)
+
+
+async def build_call_host(model_path: str, configs_dir: str, max_calls: int) -> CallHost:
+    resources = await SharedResources.create(model_path=model_path, configs_dir=configs_dir)
+    return CallHost.from_shared_resources(resources, AdmissionConfig(max_calls=max_calls))
+
+
+async def open_transport(transport_path: str, assignment: CallAssignment):
+    return await _resolve(transport_path)(assignment)
+
+
+async def serve_control(supervisor: Supervisor, host: str, port: int) -> asyncio.AbstractServer:
+    async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        tasks = set()
+
+        async def reply(message: dict):
+            writer.write((json.dumps(message) + "\n").encode())
+            await writer.drain()
+
+        async def run(request: dict):
+            call_id = request["call_id"]
+            try:
+                message = {"call_id": call_id, "status": await supervisor.run_call(call_id, request.get("payload"))}
+            except CallRejected as e:
+                message = {"call_id": call_id, "error": e.reason}
+            except Exception as e:
+                jlog("control_call_error", call_id=call_id, error=str(e))
+                message = {"call_id": call_id, "error": "internal_error"}
+            await reply(message)
+
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    request = None
+                if not isinstance(request, dict) or not isinstance(request.get("call_id"), str):
+                    await reply({"error": "bad_request"})
+                    continue
+                task = asyncio.create_task(run(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle_client, host, port)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--max-calls-per-worker", type=int, default=200)
+    parser.add_argument("--transport", type=str, required=True, help="module:function opening call media streams")
+    parser.add_argument("--configs-dir", type=str, default="configs")
+    parser.add_argument("--control-host", type=str, default="127.0.0.1")
+    parser.add_argument("--control-port", type=int, default=8765)
+    args = parser.parse_args()
+
+    load_dotenv()
+    model_path = os.getenv("EMB_MODEL_PATH")
+    if not model_path:
+        jlog("error", message="EMB_MODEL_PATH not set in .env")
+        return
+
+    spec = WorkerSpec(
+        host_factory=functools.partial(build_call_host, model_path, args.configs_dir, args.max_calls_per_worker),
+        transport_factory=functools.partial(open_transport, args.transport),
+    )
+    supervisor = Supervisor(spec, workers=args.workers)
+    await supervisor.start()
+    await supervisor.wait_ready()
+
+    server = await serve_control(supervisor, args.control_host, args.control_port)
+    jlog("node_ready", workers=args.workers, control_port=args.control_port)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    server.close()
+    await server.wait_closed()
+    await supervisor.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    asyncio.run(main())
@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from webapi.call_host import CallHost, CallRejected
+
+logger = logging.getLogger("webapi.supervisor")
+
+
+def jlog(event: str, **fields):
+    logger.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+
+@dataclass
+class CallAssignment:
+    call_id: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class WorkerSpec:
+    """
+    Что запускать внутри воркера. Обе фабрики должны быть функциями верхнего
+    уровня модуля (или `functools.partial` от них), чтобы пережить pickle при старте процесса.
+
+    host_factory: строит `CallHost` со своими общими ресурсами в event loop воркера.
+    transport_factory: по назначению звонка открывает его медиапотоки (inbound, outbound).
+    """
+    host_factory: Callable[[], Awaitable[CallHost]]
+    transport_factory: Callable[[CallAssignment], Awaitable[Tuple[Any, Any]]]
+    report_interval_sec: float = 0.5
+    drain_timeout_sec: float = 30.0
+
+
+@dataclass
+class WorkerHealth:
+    worker_id: int
+    pid: int
+    active_calls: int
+    queued_calls: int
+    loop_lag_p95_ms: float
+    saturation: Dict[str, float]
+    admitted: int
+    rejected: Dict[str, int]
+    cpu_time_sec: float
+    reported_at: float
+
+
+# --- Воркер ---
+
+def worker_main(worker_id: int, spec: WorkerSpec, inbox: mp.Queue, reports: mp.Queue) -> None:
+    """Точка входа процесса-воркера: свой event loop, свой `CallHost`."""
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    asyncio.run(_worker_loop(worker_id, spec, inbox, reports))
+
+
+async def _worker_loop(worker_id: int, spec: WorkerSpec, inbox: mp.Queue, reports: mp.Queue) -> None:
+    host = await spec.host_factory()
+    host.start()
+    calls: Set[asyncio.Task] = set()
+
+    def report_health() -> None:
+        stats = host.stats()
+        health = WorkerHealth(
+            worker_id=worker_id,
+            pid=os.getpid(),
+            active_calls=stats.active_calls,
+            queued_calls=stats.queued_calls,
+            loop_lag_p95_ms=stats.loop_lag_p95_ms,
+            saturation=stats.saturation,
+            admitted=stats.admitted,
+            rejected=stats.rejected,
+            cpu_time_sec=round(time.process_time(), 3),
+            reported_at=time.time(),
+        )
+        reports.put(("health", asdict(health)))
+
+    async def reporter() -> None:
+        while True:
+            report_health()
+            await asyncio.sleep(spec.report_interval_sec)
+
+    async def run_call(assignment: CallAssignment) -> None:
+        status = "done"
+        try:
+            inbound_stream, outbound_stream = await spec.transport_factory(assignment)
+            await host.handle_call(assignment.call_id, inbound_stream, outbound_stream)
+        except CallRejected as e:
+            status = f"rejected:{e.reason}"
+        except asyncio.CancelledError:
+            status = "cancelled"
+        except Exception as e:
+            status = "error"
+            jlog("worker_call_error", worker_id=worker_id, call_id=assignment.call_id, error=str(e))
+        reports.put(("call_done", worker_id, assignment.call_id, status))
+
+    reporter_task = asyncio.create_task(reporter())
+    jlog("worker_started", worker_id=worker_id, pid=os.getpid())
+    try:
+        while True:
+            assignment = await asyncio.to_thread(inbox.get)
+            if assignment is None:
+                break
+            task = asyncio.create_task(run_call(assignment))
+            calls.add(task)
+            task.add_done_callback(calls.discard)
+    finally:
+        await host.close(drain_timeout_sec=spec.drain_timeout_sec)
+        if calls:
+            await asyncio.gather(*calls, return_exceptions=True)
+        reporter_task.cancel()
+        await asyncio.gather(reporter_task, return_exceptions=True)
+        report_health()
+        jlog("worker_stopped", worker_id=worker_id)
+
+
+# --- Супервизор ---
+
+@dataclass
+class WorkerHandle:
+    worker_id: int
+    process: mp.Process
+    inbox: mp.Queue
+    in_flight: Set[str] = field(default_factory=set)
+    health: Optional[WorkerHealth] = None
+    restarts: int = 0
+
+
+class Supervisor:
+    """
+    Держит N процессов-воркеров, в каждом — свой `CallHost` и свой GIL.
+
+    Новый звонок уходит на наименее загруженный живой воркер: по числу звонков,
+    которые супервизор сам туда отправил и ещё не получил `call_done`
+    (это точнее периодических отчётов), при равенстве — по лагу event loop
+    из последнего отчёта. Отказ admission на воркере — повод попробовать следующий.
+    Упавший воркер перезапускается, его звонки завершаются со статусом `worker_died`.
+    """
+
+    def __init__(
+        self,
+        spec: WorkerSpec,
+        workers: Optional[int] = None,
+        start_method: str = "spawn",
+        stale_after_sec: float = 5.0,
+    ):
+        self.spec = spec
+        self.workers_count = workers or os.cpu_count() or 1
+        self.stale_after_sec = stale_after_sec
+        self._ctx = mp.get_context(start_method)
+        self._reports: mp.Queue = self._ctx.Queue()
+        self._workers: Dict[int, WorkerHandle] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._collector: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def _spawn(self, worker_id: int) -> WorkerHandle:
+        inbox = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=worker_main,
+            args=(worker_id, self.spec, inbox, self._reports),
+            name=f"call-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        return WorkerHandle(worker_id=worker_id, process=process, inbox=inbox)
+
+    async def start(self) -> None:
+        for worker_id in range(self.workers_count):
+            self._workers[worker_id] = self._spawn(worker_id)
+        self._collector = asyncio.create_task(self._collect_reports())
+        jlog("supervisor_started", workers=self.workers_count)
+
+    def _healthy(self, handle: WorkerHandle) -> bool:
+        if not handle.process.is_alive() or handle.health is None:
+            return False
+        return time.time() - handle.health.reported_at < self.stale_after_sec
+
+    def _pick_worker(self, exclude: Set[int]) -> Optional[WorkerHandle]:
+        candidates = [
+            h for h in self._workers.values() if h.worker_id not in exclude and self._healthy(h)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda h: (len(h.in_flight), h.health.loop_lag_p95_ms))
+
+    async def wait_ready(self, timeout_sec: float = 60.0) -> None:
+        """Ждёт первого отчёта о здоровье от каждого воркера (загрузка моделей и пулов)."""
+        deadline = time.monotonic() + timeout_sec
+        while not all(self._healthy(h) for h in self._workers.values()):
+            if time.monotonic() >= deadline:
+                raise TimeoutError("workers did not report health in time")
+            await asyncio.sleep(0.05)
+
+    async def run_call(self, call_id: str, payload: Optional[Dict[str, Any]] = None) -> str:
+        """Назначает звонок воркеру и ждёт его завершения. Возвращает итоговый статус."""
+        tried: Set[int] = set()
+        while True:
+            if self._stopping:
+                raise CallRejected(call_id, "supervisor_stopping")
+            handle = self._pick_worker(tried)
+            if handle is None:
+                jlog("call_rejected", call_id=call_id, reason="no_worker", tried=sorted(tried))
+                raise CallRejected(call_id, "no_worker")
+            tried.add(handle.worker_id)
+
+            done = asyncio.get_running_loop().create_future()
+            self._pending[call_id] = done
+            handle.in_flight.add(call_id)
+            handle.inbox.put(CallAssignment(call_id=call_id, payload=payload or {}))
+            try:
+                status = await done
+            finally:
+                handle.in_flight.discard(call_id)
+                self._pending.pop(call_id, None)
+
+            if not status.startswith("rejected:"):
+                return status
+            jlog("call_rerouted", call_id=call_id, worker_id=handle.worker_id, status=status)
+
+    async def _collect_reports(self) -> None:
+        while True:
+            try:
+                message = await asyncio.to_thread(self._reports.get, True, 0.2)
+            except queue.Empty:
+                message = None
+            if message is not None:
+                self._handle_report(message)
+            if not self._stopping:
+                self._restart_dead_workers()
+
+    def _handle_report(self, message: Tuple) -> None:
+        kind = message[0]
+        if kind == "health":
+            health = WorkerHealth(**message[1])
+            handle = self._workers.get(health.worker_id)
+            if handle and handle.process.pid == health.pid:
+                handle.health = health
+        elif kind == "call_done":
+            _, worker_id, call_id, status = message
+            future = self._pending.get(call_id)
+            if future and not future.done():
+                future.set_result(status)
+
+    def _restart_dead_workers(self) -> None:
+        for worker_id, handle in list(self._workers.items()):
+            if handle.process.is_alive():
+                continue
+            jlog(
+                "worker_died",
+                worker_id=worker_id,
+                exitcode=handle.process.exitcode,
+                lost_calls=len(handle.in_flight),
+            )
+            for call_id in list(handle.in_flight):
+                future = self._pending.get(call_id)
+                if future and not future.done():
+                    future.set_result("worker_died")
+            replacement = self._spawn(worker_id)
+            replacement.restarts = handle.restarts + 1
+            self._workers[worker_id] = replacement
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "worker_id": h.worker_id,
+                "alive": h.process.is_alive(),
+                "in_flight": len(h.in_flight),
+                "restarts": h.restarts,
+                "health": asdict(h.health) if h.health else None,
+            }
+            for h in self._workers.values()
+        ]
+
+    async def stop(self, timeout_sec: float = 35.0) -> None:
+        """Останавливает приём звонков, даёт воркерам доиграть текущие и завершает процессы."""
+        self._stopping = True
+        for handle in self._workers.values():
+            handle.inbox.put(None)
+        deadline = time.monotonic() + timeout_sec
+        for handle in self._workers.values():
+            await asyncio.to_thread(handle.process.join, max(0.0, deadline - time.monotonic()))
+            if handle.process.is_alive():
+                handle.process.terminate()
+        if self._collector:
+            self._collector.cancel()
+            await asyncio.gather(self._collector, return_exceptions=True)
+        jlog("supervisor_stopped", workers=self.stats())